@@ -0,0 +1,320 @@
+#! usr/bin/env python
+"""Benchmarks loading, and optionally drawing, every file in svgs/.
+
+For each file, loads the document `--repeat` times and records the fastest
+time spent in each phase of loading (see glsvg.svg_timing), the peak python
+heap while loading according to tracemalloc, and the vertices and triangles of
+the geometry it draws. None of this needs a GL context. With --gl, documents
+are also uploaded and drawn in a headless GL context, through EGL or, with
+PYOPENGL_PLATFORM=osmesa, OSMesa. That adds the upload phases, the time to draw
+a frame on the CPU and the GPU, and what a frame draws.
+
+    python benchmarks/corpus.py [svg directory] [--repeat N] [--gl] [--json results.json]
+                                [--baseline baseline.json] [--threshold 0.1]
+
+--json writes the results. Pass that file as --baseline to a later run, for
+example on another revision, to list every metric which changed by more than
+the threshold. The exit status is 1 if any got worse.
+"""
+import os
+import sys
+import gc
+import json
+import time
+import platform
+import argparse
+import tracemalloc
+
+if '--gl' in sys.argv:
+    # PyOpenGL picks its platform when it is first imported
+    os.environ.setdefault('PYOPENGL_PLATFORM', 'egl')
+    os.environ.setdefault('EGL_PLATFORM', 'surfaceless')
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import OpenGL.GL as gl
+import glsvg
+from glsvg import gpu_timing
+
+#: Timings closer than this many seconds count as unchanged, whatever their ratio
+MIN_TIME_DIFFERENCE = 0.0005
+
+#: Frames drawn per file with --gl
+N_FRAMES = 20
+
+#: Size of the headless framebuffer documents are drawn into
+VIEWPORT_SIZE = 512
+
+#: Load phases summed into each column of the printed table
+COLUMNS = (('parse', ('xml_parse', 'parse', 'style')),
+           ('flatten', ('tokenize', 'flatten')),
+           ('tessellate', ('tessellate',)),
+           ('stroke', ('stroke',)))
+
+
+def headless_context(width, height):
+    """Makes a GL context without a window current. Returns the objects that
+    have to be kept alive with it."""
+    import ctypes
+    if os.environ.get('PYOPENGL_PLATFORM') == 'osmesa':
+        from OpenGL import osmesa
+        context = osmesa.OSMesaCreateContextExt(osmesa.OSMESA_RGBA, 24, 8, 0, None)
+        buf = (ctypes.c_ubyte * (width * height * 4))()
+        if not context or not osmesa.OSMesaMakeCurrent(context, buf, gl.GL_UNSIGNED_BYTE, width, height):
+            raise Exception("Could not create an OSMesa context")
+        return context, buf
+
+    from OpenGL import EGL
+    display = EGL.eglGetDisplay(EGL.EGL_DEFAULT_DISPLAY)
+    major, minor = EGL.EGLint(), EGL.EGLint()
+    if not EGL.eglInitialize(display, ctypes.pointer(major), ctypes.pointer(minor)):
+        raise Exception("Could not initialize EGL")
+    attributes = (EGL.EGLint * 15)(
+        EGL.EGL_SURFACE_TYPE, EGL.EGL_PBUFFER_BIT,
+        EGL.EGL_RED_SIZE, 8, EGL.EGL_GREEN_SIZE, 8, EGL.EGL_BLUE_SIZE, 8,
+        EGL.EGL_DEPTH_SIZE, 24, EGL.EGL_STENCIL_SIZE, 8,
+        EGL.EGL_RENDERABLE_TYPE, EGL.EGL_OPENGL_BIT, EGL.EGL_NONE)
+    config = EGL.EGLConfig()
+    n_configs = EGL.EGLint()
+    if not EGL.eglChooseConfig(display, attributes, ctypes.pointer(config), 1, ctypes.pointer(n_configs)) \
+            or not n_configs.value:
+        raise Exception("No EGL config with an RGBA8 pbuffer and a stencil buffer")
+    size = (EGL.EGLint * 5)(EGL.EGL_WIDTH, width, EGL.EGL_HEIGHT, height, EGL.EGL_NONE)
+    surface = EGL.eglCreatePbufferSurface(display, config, size)
+    EGL.eglBindAPI(EGL.EGL_OPENGL_API)
+    context = EGL.eglCreateContext(display, config, EGL.EGL_NO_CONTEXT, None)
+    if not EGL.eglMakeCurrent(display, surface, surface, context):
+        raise Exception("Could not make the EGL context current")
+    return display, surface, context
+
+
+def setup_projection(width, height):
+    # top-left is (0, 0), as in SVG
+    gl.glViewport(0, 0, width, height)
+    gl.glMatrixMode(gl.GL_PROJECTION)
+    gl.glLoadIdentity()
+    gl.glOrtho(0, width, height, 0, -1, 1)
+    gl.glMatrixMode(gl.GL_MODELVIEW)
+    gl.glLoadIdentity()
+    gl.glClearColor(1.0, 1.0, 1.0, 1.0)
+
+
+def release(doc):
+    if doc.is_uploaded:
+        doc.release()
+
+
+def count_geometry(doc):
+    """Counts the paths the document draws, and the triangles and vertices of their geometry"""
+    counts = dict.fromkeys(('paths', 'fill_triangles', 'stroke_triangles', 'vertices'), 0)
+    for matrix, element in doc.draw_list():
+        geometry = getattr(element, 'geometry', None)
+        if geometry is None:
+            continue
+        counts['paths'] += 1
+        counts['fill_triangles'] += geometry.n_fill_triangles
+        if geometry.stroke_geometry:
+            counts['stroke_triangles'] += geometry.n_stroke_triangles
+        if geometry.fill_vertices:
+            counts['vertices'] += len(geometry.fill_vertices) // 2
+        for loop_index, primitives in geometry.stroke_geometry or ():
+            counts['vertices'] += sum(len(vertices) for mode, vertices in primitives) // 2
+    return counts
+
+
+def benchmark_draw(doc):
+    """Draws the document scaled to the viewport N_FRAMES times. Returns the
+    average times and counts of a frame."""
+    scale = 1
+    if doc.width and doc.height:
+        scale = min(VIEWPORT_SIZE / doc.width, VIEWPORT_SIZE / doc.height)
+
+    # the first frame pays for lazily created resources; let its GPU times come in too
+    doc.draw(0, 0, scale=scale)
+    gpu_timing.end_frame()
+    gl.glFinish()
+    gpu_timing.end_frame()
+    doc.stats.reset()
+
+    start = time.perf_counter()
+    for i in range(N_FRAMES):
+        doc.draw(0, 0, scale=scale)
+        gpu_timing.end_frame()
+    gl.glFinish()
+    frame_time = (time.perf_counter() - start) / N_FRAMES
+    gpu_timing.end_frame()
+
+    stats = doc.stats
+    result = {'frame_time': frame_time,
+              'draw_time': stats.cpu_time / N_FRAMES,
+              'draw_calls': stats.draw_calls // N_FRAMES,
+              'draw_triangles': stats.triangles // N_FRAMES}
+    if gpu_timing.timer:
+        result['gpu_draw_time'] = stats.gpu_time / N_FRAMES
+    return result
+
+
+def benchmark_file(filename, config, repeat, use_gl):
+    # peak heap on a load of its own, as tracemalloc slows everything down
+    gc.collect()
+    tracemalloc.start()
+    doc = glsvg.SVGDoc(filename, config=config, upload=use_gl)
+    peak_memory = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    phases = {}
+    load_time = None
+    for i in range(repeat):
+        # geometry is only cached while documents use it, so every load builds it afresh
+        release(doc)
+        doc = None
+        gc.collect()
+
+        start = time.perf_counter()
+        doc = glsvg.SVGDoc(filename, config=config, upload=use_gl)
+        seconds = time.perf_counter() - start
+        load_time = seconds if load_time is None else min(load_time, seconds)
+        for name, seconds in doc.load_timings.totals.items():
+            phases[name] = min(phases.get(name, seconds), seconds)
+
+    result = {'load_time': load_time, 'phases': phases, 'peak_memory': peak_memory}
+    result.update(count_geometry(doc))
+    if use_gl:
+        result.update(benchmark_draw(doc))
+    release(doc)
+    return result
+
+
+def add_totals(totals, result):
+    for name, value in result.items():
+        if isinstance(value, dict):
+            add_totals(totals.setdefault(name, {}), value)
+        elif name == 'peak_memory':
+            totals[name] = max(totals.get(name, 0), value)
+        else:
+            totals[name] = totals.get(name, 0) + value
+
+
+def metrics(result, prefix=''):
+    """Yields (name, value) for every number in `result`, with nested names joined by dots"""
+    for name, value in sorted(result.items()):
+        if isinstance(value, dict):
+            for metric in metrics(value, prefix + name + '.'):
+                yield metric
+        elif isinstance(value, (int, float)):
+            yield prefix + name, value
+
+
+def is_time(metric):
+    return metric.startswith('phases.') or metric.endswith('_time')
+
+
+def compare(results, baseline, threshold):
+    """Returns the (file, metric, old, new) of every metric that got worse by more
+    than `threshold`, and of every one that got better, as two lists. Everything
+    measured is better lower."""
+    regressions, improvements = [], []
+    pairs = [(name, baseline['files'].get(name), result) for name, result in sorted(results['files'].items())]
+    pairs.append(('(total)', baseline.get('totals'), results['totals']))
+    for name, old, new in pairs:
+        if not old or 'error' in old or 'error' in new:
+            continue
+        old_metrics = dict(metrics(old))
+        for metric, new_value in metrics(new):
+            old_value = old_metrics.get(metric)
+            if old_value is None or old_value == new_value:
+                continue
+            if is_time(metric) and abs(new_value - old_value) < MIN_TIME_DIFFERENCE:
+                continue
+            if new_value > old_value * (1 + threshold):
+                regressions.append((name, metric, old_value, new_value))
+            elif new_value < old_value * (1 - threshold):
+                improvements.append((name, metric, old_value, new_value))
+    return regressions, improvements
+
+
+def print_results(results):
+    print('%-30s %9s %9s %9s %10s %9s %9s %10s %9s' % (
+        'file', 'load ms', 'parse ms', 'flatten', 'tessellate', 'stroke', 'peak KB', 'triangles', 'vertices'))
+    rows = sorted(results['files'].items()) + [('(total)', results['totals'])]
+    for name, result in rows:
+        if 'error' in result:
+            print('%-30s failed: %s' % (name, result['error']))
+            continue
+        phases = result.get('phases', {})
+        columns = [sum(phases.get(phase, 0.0) for phase in column_phases) * 1000
+                   for column, column_phases in COLUMNS]
+        print('%-30s %9.2f %9.2f %9.2f %10.2f %9.2f %9d %10d %9d' % tuple(
+            [name[:30], result.get('load_time', 0.0) * 1000] + columns +
+            [result.get('peak_memory', 0) // 1024,
+             result.get('fill_triangles', 0) + result.get('stroke_triangles', 0),
+             result.get('vertices', 0)]))
+
+
+def print_changes(title, changes):
+    if not changes:
+        return
+    print('\n%s:' % title)
+    for name, metric, old_value, new_value in changes:
+        change = (new_value - old_value) / old_value * 100 if old_value else float('inf')
+        print('  %-30s %-28s %12.6g -> %-12.6g %+.1f%%' % (name[:30], metric, old_value, new_value, change))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks loading and drawing a directory of SVG files.')
+    parser.add_argument('svg_dir', nargs='?', default=os.path.join(os.path.dirname(__file__), '..', 'svgs'))
+    parser.add_argument('--repeat', type=int, default=3, help='loads per file; the fastest counts')
+    parser.add_argument('--gl', action='store_true', help='also upload and draw in a headless GL context')
+    parser.add_argument('--json', help='write the results to this file')
+    parser.add_argument('--baseline', help='compare against results written by an earlier --json')
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help='relative change below which metrics count as unchanged (default 0.1)')
+    args = parser.parse_args()
+
+    filenames = sorted(f for f in os.listdir(args.svg_dir) if f.endswith('.svg') or f.endswith('.svgz'))
+
+    if args.gl:
+        # keeps the context, and OSMesa's color buffer, alive until main returns
+        context = headless_context(VIEWPORT_SIZE, VIEWPORT_SIZE)
+        setup_projection(VIEWPORT_SIZE, VIEWPORT_SIZE)
+        config = glsvg.SVGConfig()
+        if gpu_timing.is_supported():
+            gpu_timing.enable()
+    else:
+        # no GL context is needed to parse and build geometry
+        config = glsvg.SVGConfig(stencil_bits=8)
+    config.collect_timings = True
+
+    results = {'meta': {'python': platform.python_version(),
+                        'platform': platform.platform(),
+                        'renderer': gl.glGetString(gl.GL_RENDERER).decode() if args.gl else None,
+                        'repeat': args.repeat,
+                        'frames': N_FRAMES if args.gl else 0},
+               'files': {},
+               'totals': {}}
+    for name in filenames:
+        try:
+            result = benchmark_file(os.path.join(args.svg_dir, name), config, args.repeat, args.gl)
+        except Exception as ex:
+            results['files'][name] = {'error': repr(ex)}
+            continue
+        results['files'][name] = result
+        add_totals(results['totals'], result)
+
+    print_results(results)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=1, sort_keys=True)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions, improvements = compare(results, baseline, args.threshold)
+        print_changes('Better than %s' % args.baseline, improvements)
+        print_changes('Worse than %s' % args.baseline, regressions)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
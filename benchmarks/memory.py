@@ -0,0 +1,88 @@
+#! usr/bin/env python
+"""Measures the memory held by parsed documents.
+
+Parses every file in svgs/ (without uploading to GL), keeps the documents
+alive and reports the python heap they hold according to tracemalloc, along
+with the growth of the resident set size. Run it on two revisions to compare
+object layouts:
+
+    python benchmarks/memory.py [svg directory] [repeat] [--keep-xml]
+
+`repeat` loads the corpus that many times, to approximate large documents.
+`--keep-xml` keeps the XML trees alive, as with `config.release_xml = False`.
+"""
+import os
+import sys
+import gc
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import glsvg
+
+
+def resident_size():
+    """Current resident set size in bytes (Linux only, 0 elsewhere)"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (IOError, OSError, ValueError):
+        return 0
+
+
+def count_elements(doc):
+    count = 0
+    stack = list(doc._paths)
+    while stack:
+        element = stack.pop()
+        count += 1
+        if isinstance(element, glsvg.SVGDoc):
+            stack.extend(element._paths)
+        else:
+            stack.extend(element.children)
+    return count
+
+
+def main():
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    svg_dir = args[0] if args else os.path.join(os.path.dirname(__file__), '..', 'svgs')
+    repeat = int(args[1]) if len(args) > 1 else 1
+    filenames = sorted(os.path.join(svg_dir, f) for f in os.listdir(svg_dir)
+                       if f.endswith('.svg') or f.endswith('.svgz'))
+
+    # no GL context is needed to parse
+    config = glsvg.SVGConfig(stencil_bits=8)
+    config.release_xml = '--keep-xml' not in sys.argv
+
+    gc.collect()
+    rss_before = resident_size()
+    tracemalloc.start()
+    start = time.time()
+
+    docs = []
+    for i in range(repeat):
+        for filename in filenames:
+            try:
+                doc = glsvg.SVGDoc(filename, config=config, upload=False)
+            except Exception as ex:
+                print('%-30s failed: %r' % (os.path.basename(filename), ex))
+                continue
+            docs.append(doc)
+
+    elapsed = time.time() - start
+    gc.collect()
+    heap, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    rss_after = resident_size()
+
+    n_elements = sum(count_elements(doc) for doc in docs)
+    print('documents:     %d' % len(docs))
+    print('elements:      %d' % n_elements)
+    print('parse time:    %.2fs' % elapsed)
+    print('python heap:   %.1f MB (peak %.1f MB)' % (heap / 1e6, peak / 1e6))
+    print('bytes/element: %d' % (heap // max(1, n_elements)))
+    print('resident size: +%.1f MB' % ((rss_after - rss_before) / 1e6))
+
+
+if __name__ == '__main__':
+    main()
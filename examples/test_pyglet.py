@@ -6,7 +6,6 @@ from pyglet.gl import *
 
 sys.path.append(os.path.abspath('../'))
 import glsvg
-import glsvg.graphics
 
 
 class SVGWindow(pyglet.window.Window):
@@ -15,6 +14,7 @@ class SVGWindow(pyglet.window.Window):
         super(SVGWindow, self).__init__(*args, **kwargs)
         self.filename = None
         self.svg = None
+        self.pending_svg = None
         self.fpslabel = pyglet.clock.ClockDisplay()
         self.statslabel = pyglet.text.Label("fill tris: N/A, lines: N/A", color=(0,0,0,255))
         self.statslabel.anchor_y = "top"
@@ -33,6 +33,9 @@ class SVGWindow(pyglet.window.Window):
         glEnable(GL_LINE_SMOOTH)
         glHint(GL_LINE_SMOOTH_HINT, GL_NICEST)
 
+        if glsvg.gpu_timing.is_supported():
+            glsvg.gpu_timing.enable()
+
         self.show_wireframe = False
         self.keys = pyglet.window.key.KeyStateHandler()
         self.push_handlers(self.keys)
@@ -73,9 +76,22 @@ class SVGWindow(pyglet.window.Window):
             next %= len(self.filelist)
         self.filename = os.path.join('../svgs', self.filelist[next])
         print('Parsing ' + self.filename)
-        self.svg = glsvg.SVGDoc(self.filename)
-        self.svg.anchor_x, self.svg.anchor_y = 'center', 'center'
-        self.statslabel.text = "total tris: " + str(glsvg.graphics.triangles_drawn) + ", fill-tris: " + str(self.svg.n_tris) + ", lines: " + str(self.svg.n_lines)
+
+        if not self.svg:
+            # nothing to show yet, so load the first file right away
+            self.svg = glsvg.SVGDoc(self.filename, anchor_x='center', anchor_y='center')
+            self.update_stats()
+        else:
+            # keep drawing the current file while the next one loads in the background
+            self.pending_svg = glsvg.SVGDoc.load_async(self.filename, anchor_x='center', anchor_y='center')
+
+    def update_stats(self):
+        # the stats count what this frame drew; start counting the next one afresh
+        stats = self.svg.stats
+        self.statslabel.text = "tris: %d, draw calls: %d, fill-tris: %d, lines: %d, draw: %.2fms, gpu: %.2fms" % (
+            stats.triangles, stats.draw_calls, self.svg.n_tris, self.svg.n_lines, stats.cpu_time * 1000,
+            stats.gpu_time * 1000)
+        stats.reset()
 
     def on_key_press(self, symbol, modifiers):
         if symbol == pyglet.window.key.RIGHT:
@@ -86,6 +102,17 @@ class SVGWindow(pyglet.window.Window):
             self.show_wireframe = not self.show_wireframe
 
     def tick(self, dt):
+        glsvg.poll_uploads()
+        if self.pending_svg and self.pending_svg.done():
+            error = self.pending_svg.exception()
+            if error:
+                # keep showing the current file
+                print('Failed to load %s: %r' % (self.filename, error))
+            else:
+                self.svg = self.pending_svg.result()
+                self.update_stats()
+            self.pending_svg = None
+
         if self.keys[pyglet.window.key.W]:
             self.draw_y += 80 * dt
         if self.keys[pyglet.window.key.S]:
@@ -122,6 +149,9 @@ class SVGWindow(pyglet.window.Window):
 
         glTranslatef(-self.offset_x, -self.offset_y, 0)
         self.svg.draw(self.draw_x, self.draw_y, scale=self.zoom, angle=self.angle)
+        # brings in the GPU times of the last frame or two
+        glsvg.gpu_timing.end_frame()
+        self.update_stats()
 
         #draw patterns
         i = 0
@@ -3,3 +3,11 @@ __all__ = ['svg']
 from .svg import SVGDoc, SVGConfig
 from .svg_path import SVGPath, SVGGroup, SVGUse
 from .svg_style import SVGStyle
+from .svg_loader import load_many, load_async, poll_uploads, UploadScheduler
+from .svg_registry import get, SVGInstance, SVGRegistry
+from .svg_elements import register_element_handler, ElementHandler
+from .svg_cost import estimate_cost, SVGCost
+from .svg_timing import LoadTimings
+from .svg_profile import ElementProfile, ElementCost
+from .render_stats import RenderStats
+from . import gpu_timing
@@ -0,0 +1,26 @@
+"""Command line tools:
+
+    python -m glsvg cost [--json] [--bezier-points N] [--circle-points N] file.svg ...
+"""
+
+import sys
+
+from . import svg_cost
+
+#: Subcommand name -> main(argv) function
+COMMANDS = {
+    'cost': svg_cost.main,
+}
+
+
+def main(argv=None):
+    if argv is None:
+        argv = sys.argv[1:]
+    if not argv or argv[0] not in COMMANDS:
+        sys.stderr.write('usage: python -m glsvg {{{0}}} ...\n'.format(','.join(sorted(COMMANDS))))
+        return 2
+    return COMMANDS[argv[0]](argv[1:])
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -17,13 +17,24 @@ class DisplayList:
     def __call__(self):
         gl.glCallList(self.display_list_id)
 
+    def delete(self):
+        if self.display_list_id:
+            gl.glDeleteLists(self.display_list_id, 1)
+            self.display_list_id = 0
+
 class DisplayListGenerator:
+    #: Number of display lists being compiled. GL commands issued meanwhile are
+    #: recorded, not executed.
+    compiling = 0
+
     def __enter__(self):
         dl = DisplayList()
         gl.glNewList(dl.display_list_id, gl.GL_COMPILE)
+        DisplayListGenerator.compiling += 1
         return dl
 
     def __exit__(self, type, value, traceback):
+        DisplayListGenerator.compiling -= 1
         gl.glEndList()
 
 class ViewportAs:
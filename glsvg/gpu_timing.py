@@ -0,0 +1,189 @@
+"""Times render passes on the GPU with GL_TIME_ELAPSED queries.
+
+GPU timing is off until `enable` is called with a GL context current. Then
+each document draw, and each fill, stroke, gradient, pattern and render target
+pass drawn outside a display list, is timed with a query. Only one
+GL_TIME_ELAPSED query can run at a time, so a pass that starts inside another
+pauses it: every phase counts only its own time. The exception is rendering
+into a render target, such as a pattern's texture, which counts as a whole
+under `render_target`.
+
+Query results are read back once they are available, a frame or two later,
+without waiting for the GPU. They go into `RenderStats.gpu_times` of the stats
+that were being collected into when the pass was drawn, usually `SVGDoc.stats`.
+Call `end_frame` once a frame, after drawing:
+
+    glsvg.gpu_timing.enable()
+    ...
+    doc.draw(x, y)
+    glsvg.gpu_timing.end_frame()
+    overlay.show(doc.stats.gpu_times)
+
+Display lists can't hold queries, so drawing uploaded documents only times
+`draw` as a whole. For a breakdown by pass, draw with `SVGDoc.render`.
+Drivers which defer rendering, such as Mesa's llvmpipe, may run a pass's work
+after its query ended, so the breakdown by pass is approximate there.
+"""
+
+import collections
+import ctypes
+
+import OpenGL.GL as gl
+
+from glsvg import render_stats
+from .glutils import DisplayListGenerator
+
+#: The passes that are timed
+PHASES = ('draw', 'fill', 'stroke', 'gradient', 'pattern', 'render_target')
+
+# passes which count the passes drawn inside them as their own
+_WHOLE_PASSES = ('render_target',)
+
+#: The GPUTimer in use, or None when GPU timing is off
+timer = None
+
+
+class GPUTimer(object):
+    """Issues GL_TIME_ELAPSED queries around render passes and collects their
+    results without stalling. Must be used from the GL thread."""
+
+    def __init__(self):
+        # query names ready for reuse
+        self._free = []
+        # (query, phase, stats) issued in the current frame
+        self._frame = []
+        # earlier frames whose results haven't all come back, oldest first
+        self._pending = collections.deque()
+        # [phase, stats] of the passes being timed, innermost last
+        self._stack = []
+        self._result = ctypes.c_uint64(0)
+        # Mesa's llvmpipe reports the time since boot for the first query that
+        # draws anything in a context, so the first frame's results are dropped
+        self._skip_frame = True
+
+    def begin(self, phase, stats):
+        """Starts timing `phase`, counting into `stats`, pausing the pass being timed"""
+        if self._stack:
+            outer = self._stack[-1]
+            if outer[0] in _WHOLE_PASSES:
+                self._stack.append(outer)
+                return
+            self._end_query()
+        self._stack.append((phase, stats))
+        self._begin_query()
+
+    def end(self):
+        """Stops timing the innermost pass, resuming the one it paused"""
+        inner = self._stack.pop()
+        if self._stack and self._stack[-1] is inner:
+            return
+        self._end_query()
+        if self._stack:
+            self._begin_query()
+
+    def _begin_query(self):
+        query = self._free.pop() if self._free else gl.glGenQueries(1)[0]
+        phase, stats = self._stack[-1]
+        gl.glBeginQuery(gl.GL_TIME_ELAPSED, query)
+        self._frame.append((query, phase, stats))
+
+    def _end_query(self):
+        gl.glEndQuery(gl.GL_TIME_ELAPSED)
+
+    def end_frame(self):
+        """Ends the current frame, and adds the results of earlier frames that have
+        come back to their stats"""
+        if self._frame:
+            self._pending.append(self._frame)
+            self._frame = []
+        while self._pending and self._available(self._pending[0]):
+            self._collect(self._pending.popleft())
+
+    def _available(self, frame):
+        # queries complete in order, so the last one tells for the frame
+        gl.glGetQueryObjectui64v(frame[-1][0], gl.GL_QUERY_RESULT_AVAILABLE, ctypes.byref(self._result))
+        return bool(self._result.value)
+
+    def _collect(self, frame):
+        skip, self._skip_frame = self._skip_frame, False
+        for query, phase, stats in frame:
+            gl.glGetQueryObjectui64v(query, gl.GL_QUERY_RESULT, ctypes.byref(self._result))
+            if not skip:
+                stats.add_gpu_time(phase, self._result.value * 1e-9)
+            self._free.append(query)
+
+    def delete(self):
+        """Deletes all queries. Results that haven't come back are dropped."""
+        queries = list(self._free)
+        for frame in list(self._pending) + [self._frame]:
+            queries.extend(query for query, phase, stats in frame)
+        if queries:
+            gl.glDeleteQueries(len(queries), queries)
+        self._free = []
+        self._frame = []
+        self._pending.clear()
+
+
+class _Pass(object):
+    __slots__ = ('timer', 'phase')
+
+    def __init__(self, timer, phase):
+        self.timer = timer
+        self.phase = phase
+
+    def __enter__(self):
+        self.timer.begin(self.phase, render_stats.current)
+        return self
+
+    def __exit__(self, *exc_info):
+        self.timer.end()
+        return False
+
+
+class _NoPass(object):
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+_no_pass = _NoPass()
+
+
+def timed_pass(phase):
+    """Returns a context manager which times the GL commands issued in it under
+    `phase`. Does nothing if GPU timing is off, or while a display list is compiled."""
+    if timer is None or DisplayListGenerator.compiling:
+        return _no_pass
+    return _Pass(timer, phase)
+
+
+def is_supported():
+    """Whether the current GL context has timer queries (GL 3.3 or ARB_timer_query)"""
+    return bool(gl.glGenQueries) and bool(gl.glGetQueryObjectui64v)
+
+
+def enable():
+    """Turns on GPU timing for the current GL context"""
+    global timer
+    if not is_supported():
+        raise Exception("GL_TIME_ELAPSED queries are not supported by this GL context")
+    if timer is None:
+        timer = GPUTimer()
+
+
+def disable():
+    """Turns GPU timing off and deletes its queries"""
+    global timer
+    if timer is not None:
+        timer.delete()
+        timer = None
+
+
+def end_frame():
+    """Ends a frame of GPU timing, see GPUTimer.end_frame. Does nothing if GPU
+    timing is off."""
+    if timer is not None:
+        timer.end_frame()
@@ -52,6 +52,10 @@ class GradientContainer(dict):
     def update(self, *args, **kwargs):
         raise NotImplementedError('update not done for GradientContainer')
 
+    def __reduce__(self):
+        # pending callbacks only matter while parsing, so they are not pickled
+        return GradientContainer, (dict(self),)
+
     def __setitem__(self, key, val):
         dict.__setitem__(self, key, val)
         callbacks = self.callback_dict.get(key, [])
@@ -61,17 +65,20 @@ class GradientContainer(dict):
     
 class Gradient(object):
     def __init__(self, element, svg):
+        #: The XML element, or None once released
         self.element = element
+        self._params_resolved = False
         self.stops = {}
-        for e in element.getiterator():
+        for e in element.iter():
             if e.tag.endswith('stop'):
                 style = parse_style(e.get('style', ''))
                 color = parse_color(e.get('stop-color'))
                 if 'stop-color' in style:
                     color = parse_color(style['stop-color'])
-                color[3] = int(float(e.get('stop-opacity', '1')) * 255)
+                alpha = int(float(e.get('stop-opacity', '1')) * 255)
                 if 'stop-opacity' in style:
-                    color[3] = int(float(style['stop-opacity']) * 255)
+                    alpha = int(float(style['stop-opacity']) * 255)
+                color = color[:3] + (alpha,)
                 offset = parse_float(e.get('offset'))
                 self.stops[offset] = color
         self.stops = sorted(self.stops.items())
@@ -117,6 +124,16 @@ class Gradient(object):
                 v = str(my_v)
             if v:
                 setattr(self, param, v)
+        self._params_resolved = True
+
+    def release_element(self):
+        """Drops the XML element. If the gradient inherits from a gradient that
+        hasn't been defined, its own attributes are applied first."""
+        if self.element is None:
+            return
+        if not self._params_resolved:
+            self.get_params(None)
+        self.element = None
 
     def tardy_gradient_parsed(self, gradient):
         self.get_params(gradient)
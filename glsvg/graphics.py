@@ -1,76 +1,162 @@
 import OpenGL.GL as gl
 import math
+import ctypes
+from array import array
 
-triangles_drawn = 0
+from glsvg import render_stats
 
 
-def clear_stats():
-    global triangles_drawn
-    triangles_drawn = 0
+def n_bytes(data):
+    """Size of a flat array (or list of floats) of vertex data in bytes"""
+    if isinstance(data, list):
+        return len(data) * 4
+    return len(data) * data.itemsize
 
 
-def add_triangle_stats(tris):
-    global triangles_drawn
-    triangles_drawn += tris
+def n_triangles(mode, n_vertices):
+    """Number of triangles drawn from `n_vertices` vertices with the primitive `mode`"""
+    if mode == gl.GL_TRIANGLES:
+        return n_vertices // 3
+    elif mode in (gl.GL_TRIANGLE_STRIP, gl.GL_TRIANGLE_FAN):
+        return max(0, n_vertices - 2)
+    elif mode == gl.GL_QUADS:
+        return n_vertices // 4 * 2
+    return 0
 
 
-def draw_triangle_strip(vertices, color):
-    if color:
-        gl.glColor4ub(*color)
-    n_vertices = len(vertices)/2
-    add_triangle_stats(n_vertices-2)
+def as_gl_array(data, ctype=ctypes.c_float):
+    """Wraps packed data (an array.array or memoryview) in a ctypes array
+    without copying it, so PyOpenGL can pass it straight to GL. Lists are
+    returned unchanged."""
+    if isinstance(data, list):
+        return data
+    return (ctype * len(data)).from_buffer(data)
+
+
+#: GL vertex type and ctypes type by array typecode: floats, or int16 for quantized vertices
+_vertex_types = {
+    'f': (gl.GL_FLOAT, ctypes.c_float),
+    'h': (gl.GL_SHORT, ctypes.c_short),
+}
+
+
+def vertex_pointer(vertices):
+    """Sets a flat float or int16 array of 2d vertices as the vertex array"""
+    if isinstance(vertices, list):
+        gl.glVertexPointer(2, gl.GL_FLOAT, 0, vertices)
+        return
+    typecode = vertices.typecode if isinstance(vertices, array) else vertices.format
+    vertex_type, ctype = _vertex_types[typecode]
+    gl.glVertexPointer(2, vertex_type, 0, as_gl_array(vertices, ctype))
+
+
+def draw_vertices(mode, vertices):
+    """Draws a flat list of 2d vertices with the current color"""
+    n_vertices = len(vertices) // 2
+    render_stats.count_draw(n_triangles(mode, n_vertices), n_vertices, n_bytes(vertices))
+    render_stats.count_state_changes(2)
     gl.glEnableClientState(gl.GL_VERTEX_ARRAY)
-    gl.glVertexPointer(2, gl.GL_FLOAT, 0, vertices)
-    gl.glDrawArrays(gl.GL_TRIANGLE_STRIP, 0, len(vertices) // 2)
+    vertex_pointer(vertices)
+    gl.glDrawArrays(mode, 0, len(vertices) // 2)
     gl.glDisableClientState(gl.GL_VERTEX_ARRAY)
 
 
-def draw_round_cap(center, radius, angle):
-    n_vertices = 1
-    v = [center.x, center.y]
+#: GL index type and ctypes type by index size in bytes
+_index_types = {
+    2: (gl.GL_UNSIGNED_SHORT, ctypes.c_ushort),
+    4: (gl.GL_UNSIGNED_INT, ctypes.c_uint),
+}
+
+
+def draw_indexed(mode, vertices, indices):
+    """Draws a flat array of 2d vertices, indexed by a uint16 or uint32 array, with
+    the current color"""
+    render_stats.count_draw(n_triangles(mode, len(indices)), len(vertices) // 2,
+                            n_bytes(vertices) + n_bytes(indices))
+    render_stats.count_state_changes(2)
+    index_type, ctype = _index_types[indices.itemsize]
+    gl.glEnableClientState(gl.GL_VERTEX_ARRAY)
+    vertex_pointer(vertices)
+    gl.glDrawElements(mode, len(indices), index_type, as_gl_array(indices, ctype))
+    gl.glDisableClientState(gl.GL_VERTEX_ARRAY)
+
+
+def draw_primitive(mode, vertices, color):
+    """Draws a triangle strip or fan from a flat list of 2d vertices"""
+    if color:
+        gl.glColor4ub(*color)
+    draw_vertices(mode, vertices)
+
+
+def draw_triangle_strip(vertices, color):
+    draw_primitive(gl.GL_TRIANGLE_STRIP, vertices, color)
+
+
+def round_cap_vertices(center, radius, angle):
+    """Returns the triangle fan for a round line cap as a flat vertex array"""
+    v = array('f', [center.x, center.y])
 
     for theta in range(-90, 91, 10):
         at = theta*(math.pi/180) + angle
         x = math.cos(at) * radius + center.x
         y = math.sin(at) * radius + center.y
-        n_vertices += 1
         v.append(x)
         v.append(y)
+    return v
 
-    gl.glEnableClientState(gl.GL_VERTEX_ARRAY)
-    gl.glVertexPointer(2, gl.GL_FLOAT, 0, v)
-    gl.glDrawArrays(gl.GL_TRIANGLE_FAN, 0, len(v) // 2)
-    gl.glDisableClientState(gl.GL_VERTEX_ARRAY)
 
-    add_triangle_stats(n_vertices-1)
+def draw_round_cap(center, radius, angle):
+    draw_primitive(gl.GL_TRIANGLE_FAN, round_cap_vertices(center, radius, angle), None)
 
 
-def draw_colored_triangles(tris, colors):
-    add_triangle_stats(len(tris)/6)
+def draw_colored_triangles(tris, colors, indices=None):
+    """Draws triangles with a color per vertex. With `indices`, `tris` holds the
+    distinct vertices and every three indices form a triangle."""
+    _count_triangles(tris, indices, n_bytes(colors))
+    render_stats.count_state_changes(4)
     gl.glEnableClientState(gl.GL_VERTEX_ARRAY)
     gl.glEnableClientState(gl.GL_COLOR_ARRAY)
-    gl.glColorPointer(4, gl.GL_UNSIGNED_BYTE, 0, colors)
-    gl.glVertexPointer(2, gl.GL_FLOAT, 0, tris)
-    gl.glDrawArrays(gl.GL_TRIANGLES, 0, len(tris) // 2)
+    gl.glColorPointer(4, gl.GL_UNSIGNED_BYTE, 0, as_gl_array(colors, ctypes.c_ubyte))
+    gl.glVertexPointer(2, gl.GL_FLOAT, 0, as_gl_array(tris))
+    _draw_triangles(tris, indices)
     gl.glDisableClientState(gl.GL_VERTEX_ARRAY)
     gl.glDisableClientState(gl.GL_COLOR_ARRAY)
 
 
-def draw_textured_triangles(tris, tex_coords):
-    add_triangle_stats(len(tris)/6)
+def draw_textured_triangles(tris, tex_coords, indices=None):
+    """Draws textured triangles. `indices` as in `draw_colored_triangles`."""
+    _count_triangles(tris, indices, n_bytes(tex_coords))
+    render_stats.count_state_changes(6)
     gl.glColor4f(1, 1, 1, 1)
     gl.glEnable(gl.GL_TEXTURE_2D)
     gl.glEnableClientState(gl.GL_VERTEX_ARRAY)
     gl.glEnableClientState(gl.GL_TEXTURE_COORD_ARRAY)
 
-    gl.glVertexPointer(2, gl.GL_FLOAT, 0, tris)
-    gl.glTexCoordPointer(2, gl.GL_FLOAT, 0, tex_coords)
-    gl.glDrawArrays(gl.GL_TRIANGLES, 0, len(tris) // 2)
+    gl.glVertexPointer(2, gl.GL_FLOAT, 0, as_gl_array(tris))
+    gl.glTexCoordPointer(2, gl.GL_FLOAT, 0, as_gl_array(tex_coords))
+    _draw_triangles(tris, indices)
     gl.glDisableClientState(gl.GL_VERTEX_ARRAY)
     gl.glDisableClientState(gl.GL_TEXTURE_COORD_ARRAY)
     gl.glDisable(gl.GL_TEXTURE_2D)
 
 
+def _count_triangles(tris, indices, n_attribute_bytes):
+    n_vertices = len(tris) // 2
+    if indices is None:
+        render_stats.count_draw(n_vertices // 3, n_vertices, n_bytes(tris) + n_attribute_bytes)
+    else:
+        render_stats.count_draw(len(indices) // 3, n_vertices,
+                                n_bytes(tris) + n_bytes(indices) + n_attribute_bytes)
+
+
+def _draw_triangles(tris, indices):
+    if indices is None:
+        gl.glDrawArrays(gl.GL_TRIANGLES, 0, len(tris) // 2)
+    else:
+        index_type, ctype = _index_types[indices.itemsize]
+        gl.glDrawElements(gl.GL_TRIANGLES, len(indices), index_type, as_gl_array(indices, ctype))
+
+
 def draw_quad(x, y, w, h):
 
     points = [x, y,
@@ -82,7 +168,8 @@ def draw_quad(x, y, w, h):
                   1, 1,
                   1, 0,
                   0, 0]
-    add_triangle_stats(2)
+    render_stats.count_draw(2, 4, n_bytes(points) + n_bytes(tex_coords))
+    render_stats.count_state_changes(6)
     gl.glColor4f(1, 1, 1, 1)
     gl.glEnable(gl.GL_TEXTURE_2D)
     gl.glEnableClientState(gl.GL_VERTEX_ARRAY)
@@ -1,9 +1,14 @@
 import math
+from array import array
+import OpenGL.GL as gl
 from glsvg import graphics
 from .vector_math import vec2, line_length, radian, intersection
 
 
 class LineSegment(object):
+    __slots__ = ('start', 'end', 'w', 'upper_v', 'lower_v', 'upper_join', 'lower_join',
+                 'connector', 'up_normal', 'dn_normal')
+
     def __init__(self, startp, endp, w=0):
         self.start = startp
         self.end = endp
@@ -276,9 +281,13 @@ def calc_polyline(points, w, line_cap='butt', join_type='miter', miter_limit=4,
     return lines
 
 
-def draw_polyline(points, w, color, line_cap='butt', join_type='miter', miter_limit=4, closed=False, debug=False):
+def polyline_geometry(points, w, line_cap='butt', join_type='miter', miter_limit=4, closed=False):
+    """Builds the triangles for a stroked polyline without drawing them.
+
+    Returns a list of (GL primitive, flat vertex array) tuples: a triangle strip
+    for the line itself, plus a triangle fan for each round cap."""
     if len(points) == 0:
-        return
+        return []
 
     #remove any duplicate points
     unique_points = []
@@ -290,14 +299,14 @@ def draw_polyline(points, w, color, line_cap='butt', join_type='miter', miter_li
     points = unique_points
 
     if len(points) == 1:
-        return
+        return []
 
     if points[0] == points[-1]:
         closed = True
 
     lines = calc_polyline(points, w, line_cap, join_type, miter_limit, closed)
     swap = False
-    vertices = []
+    vertices = array('f')
 
     for line in lines:
         first = line.upper_v if not swap else line.lower_v
@@ -313,11 +322,19 @@ def draw_polyline(points, w, color, line_cap='butt', join_type='miter', miter_li
             if len(first) != len(second):
                 swap = not swap
 
-    graphics.draw_triangle_strip(vertices, color)
+    primitives = [(gl.GL_TRIANGLE_STRIP, vertices)]
 
     if line_cap == 'round' and not closed:
-        graphics.draw_round_cap(lines[0].start, w*0.5, lines[0].angle - math.pi)
-        graphics.draw_round_cap(lines[-1].end, w*0.5, lines[-1].angle)
+        primitives.append((gl.GL_TRIANGLE_FAN,
+                           graphics.round_cap_vertices(lines[0].start, w*0.5, lines[0].angle - math.pi)))
+        primitives.append((gl.GL_TRIANGLE_FAN,
+                           graphics.round_cap_vertices(lines[-1].end, w*0.5, lines[-1].angle)))
+    return primitives
+
+
+def draw_polyline(points, w, color, line_cap='butt', join_type='miter', miter_limit=4, closed=False, debug=False):
+    for mode, vertices in polyline_geometry(points, w, line_cap, join_type, miter_limit, closed):
+        graphics.draw_primitive(mode, vertices, color)
 
 
 def ln_intersection(l1, l2):
@@ -0,0 +1,296 @@
+"""Flattened and tesselated shapes, shared between every path that draws the same one.
+
+Icon sets and tiled scenes repeat the same shapes many times, differing only
+in transform and style. SVGPaths with the same shape data, fill rule, stroke
+parameters and detail settings get the same PathGeometry, so the shape is
+flattened, tesselated and stroked once, and its solid fill and stroke are
+compiled into one display list which every document calls. The display lists
+live as long as an uploaded document uses them: SVGDoc.upload_steps acquires
+each geometry it compiles and SVGDoc.release releases it again.
+"""
+
+import hashlib
+import weakref
+from array import array
+
+import OpenGL.GL as gl
+
+from glsvg import graphics
+from glsvg import render_stats
+from .glutils import DisplayListGenerator
+from .vector_math import Matrix, BoundingBox, vertex_pairs, transform_vertices, \
+    quantization_frame, quantize_vertices, dequantize_vertices
+
+#: The attributes that define each shape's geometry. Elements not listed here
+#: are keyed on all of their attributes.
+SHAPE_ATTRIBUTES = {
+    'path': ('d',),
+    'rect': ('x', 'y', 'width', 'height', 'rx', 'ry'),
+    'polyline': ('points',),
+    'polygon': ('points',),
+    'line': ('x1', 'y1', 'x2', 'y2'),
+    'circle': ('cx', 'cy', 'r'),
+    'ellipse': ('cx', 'cy', 'rx', 'ry'),
+}
+
+#: Geometry by key, for as long as some path uses it
+_geometry_cache = weakref.WeakValueDictionary()
+
+
+def geometry_key(element, config, fill_rule, stroke_style):
+    """Returns a hash of everything the geometry of a path element depends on"""
+    tag = element.tag.rsplit('}', 1)[-1]
+    names = SHAPE_ATTRIBUTES.get(tag)
+    if names is None:
+        attributes = tuple(sorted(element.attrib.items()))
+    else:
+        attributes = tuple(element.get(name) for name in names)
+
+    stroke = None
+    if stroke_style:
+        stroke = (stroke_style.stroke_width,
+                  stroke_style.stroke_linejoin,
+                  stroke_style.stroke_linecap,
+                  stroke_style.stroke_miterlimit,
+                  tuple(stroke_style.stroke_dasharray))
+
+    detail = (config.bezier_points, config.circle_points, config.tolerance, config.simplify_tolerance,
+              config.quantize_vertices)
+    key = (tag, attributes, fill_rule, stroke, detail)
+    return hashlib.sha1(repr(key).encode('utf-8')).hexdigest()
+
+
+def cached_geometry(key):
+    """Returns the live geometry for `key`, or None"""
+    return _geometry_cache.get(key)
+
+
+def intern_geometry(geometry):
+    """Returns the live geometry with the same key as `geometry`, registering
+    `geometry` if there is none. Used for geometry built in another process."""
+    return _geometry_cache.setdefault(geometry.key, geometry)
+
+
+class PathGeometry(object):
+    """The outlines, fill triangles and stroke triangles of one shape"""
+
+    def __init__(self, key, shape, shape_attrs, outlines, fill_rule, stroke_style):
+        #: Hash identifying the geometry, see `geometry_key`
+        self.key = key
+
+        #: The base shape. Possible values: path, rect, circle, ellipse, line, polygon, polyline
+        self.shape = shape
+
+        #: The numeric attributes of the base shape, such as cx, cy and r for a circle
+        self.shape_attrs = shape_attrs
+
+        #: The flattened outlines, as a list of loops of [x, y] points
+        self.outlines = outlines
+
+        #: The rule used to tesselate the fill, or None when there is no fill
+        self.fill_rule = fill_rule
+
+        #: The style whose stroke parameters the stroke is built with, or None
+        self.stroke_style = stroke_style
+
+        #: The distinct vertices of the inner fill, as a flat array of x, y coordinates
+        self.fill_vertices = None
+
+        #: The fill triangles, as three indices into `fill_vertices` each
+        self.fill_indices = None
+
+        #: The stroke triangles, as a list of (outline index, [(GL primitive, vertices)])
+        self.stroke_geometry = None
+
+        #: Whether the fill and stroke triangles have been built
+        self.is_built = False
+
+        #: The (scale_x, scale_y, offset_x, offset_y) frame of the int16 vertex arrays
+        #: once `quantize` has been called, otherwise None with float vertex arrays
+        self.quantization = None
+
+        self._bounding_box = None
+        self._fill_list = None
+        self._stroke_list = None
+        # number of uploaded documents using the display lists
+        self._users = 0
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_fill_list'] = state['_stroke_list'] = None
+        state['_users'] = 0
+        return state
+
+    def job(self):
+        """Returns the picklable arguments for `build_path_geometry`"""
+        return self.outlines, self.shape, self.fill_rule, self.stroke_style
+
+    def set_geometry(self, fill, stroke_geometry):
+        """Sets the geometry built by `build_path_geometry`: the fill as (vertices,
+        indices) or None, and the stroke geometry"""
+        self.fill_vertices, self.fill_indices = fill or (None, None)
+        self.stroke_geometry = stroke_geometry
+        self.is_built = True
+        self._bounding_box = None
+
+    def _vertex_arrays(self):
+        if self.fill_vertices is not None:
+            yield self.fill_vertices
+        for loop_index, primitives in self.stroke_geometry or ():
+            for mode, vertices in primitives:
+                yield vertices
+
+    def quantize(self):
+        """Converts the fill and stroke vertices to int16, relative to the geometry's
+        bounding box. Halves their size; drawing applies the inverse scale and offset
+        with the modelview matrix."""
+        if self.quantization or not self.is_built:
+            return
+        frame = quantization_frame(self._vertex_arrays())
+        if self.fill_vertices is not None:
+            self.fill_vertices = quantize_vertices(self.fill_vertices, frame)
+        if self.stroke_geometry is not None:
+            self.stroke_geometry = [(loop_index, [(mode, quantize_vertices(vertices, frame))
+                                                  for mode, vertices in primitives])
+                                    for loop_index, primitives in self.stroke_geometry]
+        self.quantization = frame
+
+    def positions(self, vertices):
+        """Returns one of the geometry's vertex arrays as float coordinates"""
+        if self.quantization:
+            return dequantize_vertices(vertices, self.quantization)
+        return vertices
+
+    def _dequantization_matrix(self):
+        scale_x, scale_y, offset_x, offset_y = self.quantization
+        return Matrix([scale_x, 0, 0, scale_y, offset_x, offset_y])
+
+    def transformed(self, matrix, deduplicate=True):
+        """Returns a built copy of the geometry with every vertex transformed by
+        `matrix`. With `deduplicate`, copies with equal source and matrix are shared."""
+        key = hashlib.sha1((self.key + repr(matrix.values)).encode('utf-8')).hexdigest()
+        geometry = cached_geometry(key) if deduplicate else None
+        if geometry is not None:
+            return geometry
+
+        outlines = [[list(matrix(p)) for p in loop] for loop in self.outlines]
+        geometry = PathGeometry(key, self.shape, self.shape_attrs, outlines, self.fill_rule, self.stroke_style)
+
+        fill = None
+        if self.fill_vertices is not None:
+            fill = transform_vertices(matrix, self.positions(self.fill_vertices)), self.fill_indices
+        stroke_geometry = None
+        if self.stroke_geometry is not None:
+            stroke_geometry = [(loop_index, [(mode, transform_vertices(matrix, self.positions(vertices)))
+                                             for mode, vertices in primitives])
+                               for loop_index, primitives in self.stroke_geometry]
+        geometry.set_geometry(fill, stroke_geometry)
+        return intern_geometry(geometry) if deduplicate else geometry
+
+    def bounding_box(self):
+        """Returns (min_x, min_y, max_x, max_y)"""
+        if not self._bounding_box:
+            self._bounding_box = BoundingBox()
+
+            if self.fill_vertices:
+                self._bounding_box.expand(vertex_pairs(self.positions(self.fill_vertices)))
+            if self.outlines:
+                for o in self.outlines:
+                    self._bounding_box.expand(o)
+        return self._bounding_box.extents()
+
+    @property
+    def fill(self):
+        """The fill as (vertices, indices), or None"""
+        if self.fill_vertices is None:
+            return None
+        return self.fill_vertices, self.fill_indices
+
+    @property
+    def triangles(self):
+        """The fill triangles expanded into a flat array of x, y coordinates, three
+        vertices per triangle. Built on each access; the geometry only keeps the
+        indexed form."""
+        if self.fill_indices is None:
+            return None
+        vertices = self.positions(self.fill_vertices)
+        triangles = array('f')
+        for i in self.fill_indices:
+            triangles.append(vertices[2 * i])
+            triangles.append(vertices[2 * i + 1])
+        return triangles
+
+    @property
+    def n_fill_triangles(self):
+        return len(self.fill_indices) // 3 if self.fill_indices else 0
+
+    @property
+    def n_stroke_triangles(self):
+        if not self.stroke_geometry:
+            return 0
+        # strips of fewer than 3 vertices draw nothing
+        return sum(max(0, len(vertices) // 2 - 2)
+                   for loop_index, primitives in self.stroke_geometry
+                   for mode, vertices in primitives)
+
+    def compile(self, fill=True, stroke=True):
+        """Compiles the fill and/or stroke, without colors, into display lists
+        shared by every path with this geometry. Must not be called while
+        another display list is being compiled."""
+        if fill and self.fill_indices and not self._fill_list:
+            self._fill_list = self._compile_list(self._draw_fill_vertices)
+
+        if stroke and self.stroke_geometry and not self._stroke_list:
+            self._stroke_list = self._compile_list(self._draw_stroke_vertices)
+
+    def _compile_list(self, draw):
+        with DisplayListGenerator() as display_list:
+            if self.quantization:
+                with self._dequantization_matrix():
+                    draw()
+            else:
+                draw()
+        return display_list
+
+    def acquire(self):
+        """Counts a document that uses the display lists, see `release`"""
+        self._users += 1
+
+    def release(self):
+        """Undoes one `acquire`, and deletes the display lists once no document
+        uses them. Must be called from the GL thread."""
+        self._users = max(0, self._users - 1)
+        if self._users:
+            return
+        for display_list in (self._fill_list, self._stroke_list):
+            if display_list:
+                display_list.delete()
+        self._fill_list = self._stroke_list = None
+
+    def _draw_fill_vertices(self):
+        graphics.draw_indexed(gl.GL_TRIANGLES, self.fill_vertices, self.fill_indices)
+
+    def _draw_stroke_vertices(self):
+        for loop_index, primitives in self.stroke_geometry:
+            for mode, vertices in primitives:
+                graphics.draw_vertices(mode, vertices)
+
+    def draw_fill(self):
+        """Draws the fill with the current color. Returns False if it isn't compiled."""
+        if not self._fill_list:
+            return False
+        render_stats.count_draw(self.n_fill_triangles, len(self.fill_vertices) // 2)
+        self._fill_list()
+        return True
+
+    def draw_stroke(self):
+        """Draws the stroke with the current color. Returns False if it isn't compiled."""
+        if not self._stroke_list:
+            return False
+        n_primitives = n_vertices = 0
+        for loop_index, primitives in self.stroke_geometry:
+            n_primitives += len(primitives)
+            n_vertices += sum(len(vertices) for mode, vertices in primitives) // 2
+        render_stats.count_draw(self.n_stroke_triangles, n_vertices, draw_calls=n_primitives)
+        self._stroke_list()
+        return True
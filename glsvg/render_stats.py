@@ -0,0 +1,148 @@
+"""Counts the GL work done to draw documents.
+
+Everything that issues GL calls counts them into `current`, the RenderStats
+being collected into. Display lists can't be inspected once compiled, so
+SVGDoc counts what each of its display lists draws while compiling it, and
+adds those counts to `SVGDoc.stats` every time it calls the lists. Counting
+is a few integer additions per draw call, cheap enough to leave on.
+
+With GPU timing on (see `gpu_timing`), `gpu_times` also collects the GPU time
+of each render pass, a frame or two after it was drawn.
+
+A per-frame overlay reads and resets each document's stats once a frame:
+
+    overlay.show(doc.stats)
+    doc.stats.reset()
+"""
+
+import time
+
+
+class RenderStats(object):
+    """Counts of GL work, for a frame, a display list or an upload"""
+    __slots__ = ('draws', 'draw_calls', 'triangles', 'vertices', 'shader_binds',
+                 'texture_binds', 'state_changes', 'bytes_uploaded', 'cpu_time', 'gpu_times')
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        """Sets all counts back to 0"""
+        #: Calls to SVGDoc.draw or render
+        self.draws = 0
+        #: glDrawArrays and glDrawElements calls, including those replayed from display lists
+        self.draw_calls = 0
+        #: Triangles drawn
+        self.triangles = 0
+        #: Vertices drawn
+        self.vertices = 0
+        #: Gradient shader programs bound
+        self.shader_binds = 0
+        #: Pattern textures bound
+        self.texture_binds = 0
+        #: Capabilities and client states enabled or disabled, and blend functions set
+        self.state_changes = 0
+        #: Bytes of vertex, index, color and texture coordinate data sent to GL from
+        #: client memory. Drawing compiled display lists sends none.
+        self.bytes_uploaded = 0
+        #: Seconds of CPU time spent in SVGDoc.draw or render
+        self.cpu_time = 0.0
+        #: Seconds of GPU time by render pass, see gpu_timing.PHASES. Only filled
+        #: in while GPU timing is on.
+        self.gpu_times = {}
+
+    def add(self, other):
+        """Adds the counts of `other` to these"""
+        self.draws += other.draws
+        self.draw_calls += other.draw_calls
+        self.triangles += other.triangles
+        self.vertices += other.vertices
+        self.shader_binds += other.shader_binds
+        self.texture_binds += other.texture_binds
+        self.state_changes += other.state_changes
+        self.bytes_uploaded += other.bytes_uploaded
+        self.cpu_time += other.cpu_time
+        for phase, seconds in other.gpu_times.items():
+            self.add_gpu_time(phase, seconds)
+
+    def add_gpu_time(self, phase, seconds):
+        """Adds `seconds` of GPU time to the render pass `phase`"""
+        self.gpu_times[phase] = self.gpu_times.get(phase, 0.0) + seconds
+
+    @property
+    def gpu_time(self):
+        """Seconds of GPU time in all timed render passes"""
+        return sum(self.gpu_times.values())
+
+    def copy(self):
+        stats = RenderStats()
+        stats.add(self)
+        return stats
+
+    def as_dict(self):
+        """Returns the counts as a dict, e.g. for JSON"""
+        d = dict((name, getattr(self, name)) for name in self.__slots__)
+        d['gpu_times'] = dict(self.gpu_times)
+        return d
+
+    def __repr__(self):
+        return ("<RenderStats draw_calls={0} triangles={1} vertices={2} shader_binds={3} "
+                "texture_binds={4} state_changes={5} bytes_uploaded={6} cpu_time={7:.2f}ms "
+                "gpu_time={8:.2f}ms>").format(
+            self.draw_calls, self.triangles, self.vertices, self.shader_binds, self.texture_binds,
+            self.state_changes, self.bytes_uploaded, self.cpu_time * 1000, self.gpu_time * 1000)
+
+
+#: Counts whatever is drawn outside of a document's draw, render or upload, such
+#: as SVGPath.render on its own
+unattributed = RenderStats()
+
+#: The RenderStats that GL work is counted into
+current = unattributed
+
+
+class collecting(object):
+    """Context manager which counts the GL work done in it into `stats`, and
+    the CPU time spent in it if `timed` is set"""
+    __slots__ = ('stats', 'timed', 'previous', 'start')
+
+    def __init__(self, stats, timed=False):
+        self.stats = stats
+        self.timed = timed
+
+    def __enter__(self):
+        global current
+        self.previous = current
+        current = self.stats
+        if self.timed:
+            self.start = time.perf_counter()
+        return self.stats
+
+    def __exit__(self, *exc_info):
+        global current
+        if self.timed:
+            self.stats.cpu_time += time.perf_counter() - self.start
+        current = self.previous
+        return False
+
+
+def count_draw(triangles, vertices, n_bytes=0, draw_calls=1):
+    """Counts `draw_calls` draw calls, of `triangles` triangles and `vertices`
+    vertices in all, which sent `n_bytes` of data from client memory"""
+    stats = current
+    stats.draw_calls += draw_calls
+    stats.triangles += triangles
+    stats.vertices += vertices
+    stats.bytes_uploaded += n_bytes
+
+
+def count_state_changes(n):
+    current.state_changes += n
+
+
+def count_shader_bind():
+    current.shader_binds += 1
+
+
+def count_texture_bind():
+    current.texture_binds += 1
@@ -1,6 +1,8 @@
 __author__ = 'Ian'
 import OpenGL.GL as gl
 from glsvg import graphics
+from glsvg import render_stats
+from glsvg import gpu_timing
 
 
 class Texture2D:
@@ -35,7 +37,11 @@ class Texture2D:
                         None)
         self.unbind()
 
+    def delete(self):
+        gl.glDeleteTextures([self.id])
+
     def bind(self):
+        render_stats.count_texture_bind()
         gl.glBindTexture(gl.GL_TEXTURE_2D, self.id)
 
     def unbind(self):
@@ -60,6 +66,9 @@ class RenderBufferObject:
         gl.glRenderbufferStorage(gl.GL_RENDERBUFFER, gl.GL_DEPTH24_STENCIL8, w, h)
         self.unbind()
 
+    def delete(self):
+        gl.glDeleteRenderbuffers(1, [self.id])
+
     def bind(self):
         gl.glBindRenderbuffer(gl.GL_RENDERBUFFER, self.id)
 
@@ -99,7 +108,7 @@ class RenderTarget:
 
     def blit(self):
         w, h = self.texture.width, self.texture.height
-        with self.texture:
+        with self.texture, gpu_timing.timed_pass('render_target'):
             graphics.draw_quad(0.5, 0.5, w + 0.5, h + 0.5)
 
     def resize(self, w, h):
@@ -107,6 +116,12 @@ class RenderTarget:
         if self.depth_stencil:
             self.depth_stencil.resize(w, h)
 
+    def delete(self):
+        gl.glDeleteFramebuffers(1, [self.id])
+        self.texture.delete()
+        if self.depth_stencil:
+            self.depth_stencil.delete()
+
     def bind(self):
         gl.glBindFramebuffer(gl.GL_FRAMEBUFFER, 0)
         gl.glBindFramebuffer(gl.GL_FRAMEBUFFER, self.id)
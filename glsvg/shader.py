@@ -1,5 +1,7 @@
 import OpenGL.GL as gl
 
+from glsvg import render_stats
+
 active_shader = None
 
 
@@ -86,6 +88,7 @@ class Program(object):
     def use(self):
         global active_shader
         active_shader = self
+        render_stats.count_shader_bind()
         gl.glUseProgram( self.program_object )
         self.set_vars()
 
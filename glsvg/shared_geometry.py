@@ -0,0 +1,120 @@
+"""Moves built path geometry out of worker processes through shared memory.
+
+Pickling large vertex arrays back to the parent costs nearly as much as
+building them. Instead, a worker copies every array of a batch into one
+shared memory block and only sends back small (typecode, offset, length)
+placeholders. The parent maps the block and replaces each placeholder with a
+memoryview into it, which is handed to GL without another copy.
+"""
+
+import os
+from array import array
+from multiprocessing import shared_memory, resource_tracker
+
+#: Byte alignment of each array within a block
+ALIGNMENT = 8
+
+
+class _AttachedBlock(shared_memory.SharedMemory):
+    """A shared memory block that may be dropped while views into it are still
+    alive. The mapping is then released together with the last view.
+
+    The block keeps the default resource tracking: the worker registered it,
+    and `unlink` unregisters it again. With `track=False` (Python 3.13+) that
+    registration would be left behind and reported as leaked."""
+
+    def close(self):
+        try:
+            shared_memory.SharedMemory.close(self)
+        except BufferError:
+            # SharedMemory.close releases its own buffer, then closes the mmap,
+            # which fails while views are exported from it. There is no public
+            # way to let go of a mapping that is still in use, so this drops the
+            # reference to the mmap, which unmaps itself with the last view, and
+            # closes the file descriptor. _mmap and _fd are private to
+            # SharedMemory; this is valid for CPython 3.8 to 3.14, where close()
+            # and __del__ use them as above. Elsewhere the error is raised.
+            if not hasattr(self, '_mmap') or not hasattr(self, '_fd'):
+                raise
+            self._mmap = None
+            if self._fd >= 0:
+                os.close(self._fd)
+                self._fd = -1
+
+
+def prepare_pool():
+    """Must be called before starting a pool whose workers call `share_geometry`.
+
+    Starts the multiprocessing resource tracker in this process so the workers
+    share it. Otherwise each worker starts its own tracker, which unlinks the
+    worker's blocks as soon as it exits, possibly before they are attached."""
+    resource_tracker.ensure_running()
+
+
+def _map_arrays(results, fn):
+    """Applies fn to every vertex and index array in a list of (fill, stroke_geometry)"""
+    mapped = []
+    for fill, stroke_geometry in results:
+        if fill is not None:
+            fill = tuple(fn(data) for data in fill)
+        if stroke_geometry is not None:
+            stroke_geometry = [(loop_index, [(mode, fn(vertices)) for mode, vertices in primitives])
+                               for loop_index, primitives in stroke_geometry]
+        mapped.append((fill, stroke_geometry))
+    return mapped
+
+
+def share_geometry(results):
+    """Worker side. Copies the arrays of a list of (fill, stroke_geometry)
+    results into a new shared memory block.
+
+    Returns the results with each array replaced by a placeholder, and the
+    name of the block (None if there was nothing to share).
+    """
+    arrays = []
+    size = [0]
+
+    def place(data):
+        offset = size[0]
+        n_bytes = len(data) * data.itemsize
+        size[0] += n_bytes + (-n_bytes % ALIGNMENT)
+        arrays.append((offset, data))
+        # arrays attached from another block are memoryviews, which have a format instead
+        typecode = data.typecode if isinstance(data, array) else data.format
+        return typecode, offset, len(data)
+
+    placeholders = _map_arrays(results, place)
+    if not size[0]:
+        return results, None
+
+    block = shared_memory.SharedMemory(create=True, size=size[0])
+    try:
+        for offset, data in arrays:
+            if len(data):
+                view = memoryview(data).cast('B')
+                block.buf[offset:offset + len(view)] = view
+                view.release()
+        name = block.name
+    finally:
+        block.close()
+    return placeholders, name
+
+
+def attach_geometry(placeholders, name):
+    """Parent side. Maps the block written by `share_geometry` and replaces every
+    placeholder with a memoryview into it. The block is unlinked right away; the
+    views keep the memory mapped for as long as they are alive."""
+    if name is None:
+        return placeholders
+
+    block = _AttachedBlock(name=name)
+    block.unlink()
+
+    def view(placeholder):
+        typecode, offset, length = placeholder
+        n_bytes = length * array(typecode).itemsize
+        return block.buf[offset:offset + n_bytes].cast(typecode)
+
+    results = _map_arrays(placeholders, view)
+    block.close()
+    return results
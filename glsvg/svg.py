@@ -9,29 +9,33 @@ Example usage:
 
 import OpenGL.GL as gl
 
-try:
-    import xml.etree.ElementTree
-    from xml.etree.cElementTree import parse
-except:
-    import elementtree.ElementTree
-    from elementtree.ElementTree import parse
-
 import re
 import math
 import string
 import traceback
-import gzip
+import copy
+import itertools
+from concurrent.futures import ProcessPoolExecutor
 
 from .svg_constants import *
 
 from .glutils import *
 from .vector_math import *
-from .svg_parser_utils import parse_color, parse_float, parse_style, parse_list
+from .svg_parser_utils import parse_color, parse_float, parse_style, parse_list, read_svg
 from .gradient import *
 
-from .svg_path import SVGPath, SVGGroup, SVGDefs, SVGUse, SVGMarker, SVGContainer
+from .svg_path import SVGPath, SVGGroup, SVGDefs, SVGUse, SVGMarker, SVGContainer, build_path_geometry, \
+    flatten, render_draw_list
+from .shared_geometry import share_geometry, attach_geometry, prepare_pool
+from .path_geometry import intern_geometry
+from .svg_cost import fit_to_budget
+from .svg_timing import LoadTimings, timed, recording
+from .svg_profile import ElementProfile
 from .svg_pattern import *
+from .svg_elements import ElementHandler, register_element_handler, element_handler, local_name
 from glsvg import graphics
+from .render_stats import RenderStats, collecting, count_state_changes
+from .gpu_timing import timed_pass
 
 from .render_target import CanvasManager
 
@@ -40,12 +44,16 @@ class SVGConfig:
     """Configuration for how to render SVG objects, such as
     the amount of detail allowed for bezier curves and availability of the stencil buffer"""
 
-    def __init__(self):
+    def __init__(self, stencil_bits=None):
 
         self.use_fxaa = True
 
-        #: The number of stencil bits available
-        self.stencil_bits = gl.glGetInteger(gl.GL_STENCIL_BITS)
+        if stencil_bits is None:
+            stencil_bits = gl.glGetInteger(gl.GL_STENCIL_BITS)
+
+        #: The number of stencil bits available. Queried from the current GL context
+        #: unless given explicitly.
+        self.stencil_bits = stencil_bits
 
         #: Whether or not framebuffer objects are allowed
         self.has_framebuffer_objects = True
@@ -62,15 +70,111 @@ class SVGConfig:
         #: The minimum distance at which neighboring points are merged
         self.tolerance = TOLERANCE
 
-    def super_detailed(self):
-        """Returns a much more detailed copy of this config, for patterns"""
+        #: If set, the most triangles a document may be drawn with. Documents choose
+        #: `bezier_points` and `circle_points`, at most the ones configured here, from
+        #: an estimate of their cost (see glsvg.svg_cost), and raise `tolerance` if the
+        #: fewest points are not enough. See `SVGDoc.over_budget`. 0 for no budget.
+        self.triangle_budget = 0
+
+        #: If set, the most fill and stroke vertices a document may have, as with
+        #: `triangle_budget`. 0 for no budget.
+        self.vertex_budget = 0
+
+        #: The error bound for simplifying flattened outlines (Ramer-Douglas-Peucker)
+        #: before they are tesselated and stroked, in user units. Points that stay
+        #: within this distance of the simplified outline are dropped. 0 disables it.
+        self.simplify_tolerance = 0
+
+        #: Whether to drop every reference to the XML tree once a document is parsed.
+        #: Set to False to keep `SVGDoc.root` and `Gradient.element` around.
+        self.release_xml = True
+
+        #: Whether paths with identical shape data share one flattened and tesselated
+        #: geometry, across documents too
+        self.deduplicate_geometry = True
+
+        #: Number of worker processes used to tesselate and stroke the paths of a
+        #: single document. 0 builds them on the calling thread.
+        self.tessellation_workers = 0
+
+        #: Number of draw list entries compiled into each display list. Each chunk
+        #: is one step of an incremental upload (see UploadScheduler).
+        self.upload_chunk_size = 64
+
+        #: Whether a partially uploaded document draws the chunks that are ready.
+        #: If False it draws nothing until its upload has finished.
+        self.draw_partial_uploads = True
+
+        #: Whether to apply each path's transform to its vertices at load time, so
+        #: the document is drawn in a single coordinate space without per-path
+        #: matrix changes. Paths with gradient or pattern fills, markers, paths
+        #: that are definitions, pattern content or drawn more than once (through
+        #: <use>) keep their transform. Changing the transform of a baked element
+        #: after loading has no effect.
+        self.bake_transforms = False
+
+        #: Ids of elements whose transform may change after loading. With
+        #: `bake_transforms`, these elements and their descendants keep their
+        #: transform. A frozenset, so configs stay hashable.
+        self.dynamic_ids = frozenset()
+
+        #: Whether to store fill and stroke vertices as int16 relative to each shape's
+        #: bounding box, with the inverse scale and offset applied by the modelview
+        #: matrix when drawing. Halves the vertex data. Each vertex moves by at most
+        #: 1/65535 of the geometry's bounding box per axis, which can still move an
+        #: edge across a pixel center, so edge pixels may change. Only paths with
+        #: solid paint, and geometry no gradient or pattern path of the document
+        #: shares, are quantized, and never pattern content.
+        self.quantize_vertices = False
+
+        #: Whether documents time the phases of their loading into `SVGDoc.load_timings`,
+        #: see glsvg.svg_timing
+        self.collect_timings = False
+
+        #: Whether the load timings are also broken down per element. Tesselation and
+        #: stroking done in `tessellation_workers` only count towards the totals.
+        self.timings_per_element = False
+
+        #: Called as `timings_callback(doc, timings)` with the load timings of a document
+        #: when it has been parsed without uploading, and whenever its upload finishes.
+        #: Not pickled, so documents loaded in worker processes report from the process
+        #: that uploads them.
+        self.timings_callback = None
+
+        #: Whether documents record what each element costs to build and draw into
+        #: `SVGDoc.element_profile`, see glsvg.svg_profile. Implies load timings per
+        #: element.
+        self.profile_elements = False
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        # callbacks may not be picklable, and only matter in the loading process
+        state['timings_callback'] = None
+        return state
 
-        cfg = SVGConfig()
+    def super_detailed(self):
+        """Returns a much more detailed copy of this config, for patterns. The copy
+        is made once and shared, until a setting of this config changes."""
+        key = self.cache_key()
+        cached = getattr(self, '_super_detailed', None)
+        if cached and cached[0] == key:
+            return cached[1]
+
+        cfg = copy.copy(self)
+        cfg._super_detailed = None
         cfg.bezier_points *= 10
         cfg.circle_points *= 10
         cfg.tolerance /= 100
+        cfg.simplify_tolerance /= 100
+        cfg.quantize_vertices = False
+        self._super_detailed = (key, cfg)
         return cfg
 
+    def cache_key(self):
+        """Returns a hashable key which is equal for configs with the same settings"""
+        return tuple(sorted((name, value) for name, value in vars(self).items()
+                            if not name.startswith('_') and name not in _UNCACHED_SETTINGS))
+
     def __repr__(self):
         return "<SVGConfig stencil_bits={0} fbo={1} circle_points={2} bezier_points={3}>".format(
             self.stencil_bits,
@@ -80,6 +184,10 @@ class SVGConfig:
         )
 
 
+#: Settings which don't change the loaded document, and are left out of cache keys
+_UNCACHED_SETTINGS = ('collect_timings', 'timings_per_element', 'timings_callback', 'profile_elements')
+
+
 class SVGDoc(SVGContainer):
     """
     An SVG image document.
@@ -88,7 +196,8 @@ class SVGDoc(SVGContainer):
     render.
 
     """
-    def __init__(self, filename_or_element, parent=None, anchor_x=0, anchor_y=0, config=None):
+    def __init__(self, filename_or_element, parent=None, anchor_x=0, anchor_y=0, config=None, upload=True,
+                 outer=None):
         """Creates an SVG document from a .svg or .svgz file.
 
         Args:
@@ -100,11 +209,26 @@ class SVGDoc(SVGContainer):
             `anchor_y`: float
                 The vertical anchor position for scaling and rotations. Defaults to 0. The symbolic
                 values 'bottom', 'center' and 'top' are also accepted.
+            `config`: SVGConfig
+                The render configuration. Defaults to a new SVGConfig for the current GL context.
+            `upload`: bool
+                Whether to create the GL resources (pattern textures, display list) right away.
+                Documents parsed without a GL context, for example in a worker process, pass
+                False and call `upload` later from the GL thread.
+            `outer`: SVGDoc
+                For a nested <svg> element, the document it is part of. The nested document
+                shares its config, gradients, patterns and definitions, and is built and
+                uploaded as part of it rather than separately.
         """
 
         SVGContainer.__init__(self, parent)
 
-        if not config:
+        #: The document this one is nested in, or None
+        self.outer = outer
+
+        if outer:
+            self.config = outer.config
+        elif not config:
             self.config = SVGConfig()
         else:
             self.config = config
@@ -132,6 +256,9 @@ class SVGDoc(SVGContainer):
         #: SVG paths
         self._paths = []
 
+        #: Every path in the document, in the order their geometry is built
+        self._geometry_paths = []
+
         #: Maps from pattern id to pattern
         self.patterns = {}
 
@@ -145,28 +272,87 @@ class SVGDoc(SVGContainer):
         self.filename = filename_or_element if isinstance(filename_or_element, str) else None
         self._gradients = GradientContainer()
 
-        if self.filename:
-            is_svg = False
-
-            with open(self.filename, 'rb') as f:
-                is_svg = (f.read(3) == b'\x1f\x8b\x08')
-
-            if is_svg:  # gzip magic numbers
-                with gzip.open(self.filename, 'rb') as f:
-                    self.root = parse(f)._root
+        #: The LoadTimings of the document, if `config.collect_timings` is set
+        self.load_timings = None
+
+        #: The ElementProfile of the document, if `config.profile_elements` is set.
+        #: Measured when the upload finishes.
+        self.element_profile = None
+        if outer:
+            self.load_timings = outer.load_timings
+            self.element_profile = outer.element_profile
+        elif self.config.profile_elements:
+            self.load_timings = LoadTimings(self.filename, per_element=True)
+            self.element_profile = ElementProfile(self.load_timings)
+        elif self.config.collect_timings:
+            self.load_timings = LoadTimings(self.filename, self.config.timings_per_element)
+
+        if outer:
+            self.patterns = outer.patterns
+            self.markers = outer.markers
+            self.defs = outer.defs
+            self._gradients = outer._gradients
+
+        with recording(self.load_timings):
+            if self.filename:
+                with timed(self.load_timings, 'xml_parse'):
+                    self.root = read_svg(self.filename)
             else:
-                with open(self.filename, 'rb') as f:
-                    self.root = parse(f)._root
-        else:
-            self.root = filename_or_element
-
-        self.parse_root(self.root)
-
-        self._generate_disp_list()
+                self.root = filename_or_element
+
+            #: The estimated cost of the document, when it was fit to a budget
+            self.estimated_cost = None
+
+            #: Whether the document was estimated to be over its budget even with the
+            #: least detail. A RuntimeWarning is issued too.
+            self.over_budget = False
+            if not outer and (self.config.triangle_budget or self.config.vertex_budget):
+                self.config, self.estimated_cost, within_budget = fit_to_budget(self.root, self.config)
+                self.over_budget = not within_budget
+
+            self.parse_root(self.root)
+
+            # the outer document releases the tree and builds the geometry of nested ones
+            if not outer:
+                if self.config.release_xml:
+                    self._release_xml()
+                self._build_geometry()
+                if self.config.bake_transforms:
+                    self._bake_transforms()
+                if self.config.quantize_vertices:
+                    self._quantize_vertices()
+
+        #: Compiled display lists, one per chunk of the draw list
+        self.disp_lists = []
+        # what each display list draws, counted while compiling it
+        self._disp_list_stats = []
+        # shared geometries acquired by the upload, by id
+        self._acquired_geometry = {}
+        self._upload_done = False
+
+        #: RenderStats of the draws and renders since the last `stats.reset()`. Reset
+        #: it once a frame for per-frame stats.
+        self.stats = RenderStats()
+
+        #: RenderStats of the GL work done by `upload`
+        self.upload_stats = RenderStats()
+
+        if upload:
+            self.upload()
+        elif not outer:
+            self._report_timings()
 
         self.anchor_x = anchor_x
         self.anchor_y = anchor_y
 
+    @classmethod
+    def load_async(cls, filename, anchor_x=0, anchor_y=0, config=None, executor=None):
+        """Starts loading `filename` in the background and returns a future for
+        the document. `glsvg.poll_uploads()` must be called regularly on the GL
+        thread to finish the upload. See `glsvg.svg_loader.load_async`."""
+        from .svg_loader import load_async
+        return load_async(filename, anchor_x, anchor_y, config, executor)
+
     def parse_root(self, root):
         self._paths = []
 
@@ -189,64 +375,153 @@ class SVGDoc(SVGContainer):
             self.width = w
 
         self.opacity = 1.0
-        for e in root.getchildren():
-            try:
-                self._parse_element(e)
-            except Exception as ex:
-                print('Exception while parsing element ' + str(e))
-                raise
+        self._parse_children(root, None)
+
+    def _release_xml(self):
+        """Drops the references to the XML tree. Gradients still waiting for an
+        href to a gradient that was never defined are resolved without it first."""
+        for gradient in self._gradients.values():
+            gradient.release_element()
+        self._gradients.callback_dict.clear()
+        self.root = None
+
+        for svg_path in self._paths:
+            if isinstance(svg_path, SVGDoc):
+                svg_path._release_xml()
+
+    def _parse_children(self, e, parent):
+        """Parses the descendants of `e` in document order, with an explicit stack
+        rather than recursion so deeply nested documents don't hit the recursion
+        limit. `parent` is the renderable the children of `e` belong to, if any."""
+        timings = self.load_timings
+        stack = [(c, parent) for c in reversed(e)]
+        while stack:
+            e, parent = stack.pop()
+            handler = element_handler(local_name(e.tag))
+            renderable = None
+            if handler:
+                label = timings.element_label(e) if timings else None
+                try:
+                    with timed(timings, 'parse', label):
+                        renderable = handler.parse(self, e, parent)
+                except Exception as ex:
+                    print('Exception while parsing element ', e)
+                    raise
+                if label and isinstance(renderable, SVGPath):
+                    timings.geometry_labels.setdefault(id(renderable.geometry), label)
+                if self.element_profile and renderable is not None:
+                    self.element_profile.add(renderable, label, local_name(e.tag))
+            if not handler or handler.parse_children:
+                stack.extend((c, renderable) for c in reversed(e))
+
+    def _build_geometry(self):
+        """Tesselates and strokes every geometry that isn't built yet. Geometries
+        are independent of each other, so with `config.tessellation_workers` set
+        they are built in batches in a process pool. Each batch sends its vertex
+        arrays back through shared memory; the results come back in order."""
+        geometries = [g for g in self._unique_geometries(self._all_geometry_paths()) if not g.is_built]
+        jobs = [g.job() for g in geometries]
+        timings = self.load_timings
+
+        workers = min(self.config.tessellation_workers, len(jobs))
+        if workers > 1:
+            batch_size = max(1, len(jobs) // (workers * 4))
+            batches = [jobs[i:i + batch_size] for i in range(0, len(jobs), batch_size)]
+            results = []
+            prepare_pool()
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                for placeholders, name, batch_timings in pool.map(
+                        _build_geometry_batch, batches, itertools.repeat(timings is not None)):
+                    results.extend(attach_geometry(placeholders, name))
+                    if batch_timings:
+                        timings.merge(batch_timings)
+        elif timings and timings.per_element:
+            results = []
+            for geometry, job in zip(geometries, jobs):
+                with timings.phase(None, timings.geometry_labels.get(id(geometry))):
+                    results.append(build_path_geometry(job))
+        else:
+            results = [build_path_geometry(job) for job in jobs]
+        if timings:
+            timings.geometry_labels.clear()
+
+        for geometry, (fill, stroke_geometry) in zip(geometries, results):
+            geometry.set_geometry(fill, stroke_geometry)
+
+    def _bake_transforms(self):
+        """Transforms the vertices of every path that is drawn exactly once, with a
+        solid fill and stroke, by the matrix it is drawn with. See
+        `SVGConfig.bake_transforms`."""
+        matrices = {}
+        for matrix, element in self.draw_list():
+            if isinstance(element, SVGPath):
+                matrices.setdefault(element, []).append(matrix)
+
+        dynamic_ids = self.config.dynamic_ids
+        for path, path_matrices in matrices.items():
+            if len(path_matrices) == 1 and path.can_bake_transform(dynamic_ids):
+                path.bake_transform(path_matrices[0])
+
+    def _quantize_vertices(self):
+        """Quantizes the geometry of paths with solid paint, which is what reaches GL
+        as int16. Gradient and pattern paints sample float positions on every render,
+        so geometry which a path with such paint shares is left alone. Geometry is
+        also shared between documents; a gradient or pattern path of another document
+        whose geometry was quantized here still renders correctly, as those paints
+        read their vertices through PathGeometry.positions, which dequantizes them."""
+        paths = self._all_geometry_paths()
+        painted = set(id(path.geometry) for path in paths
+                      if isinstance(path.style.fill, str) or isinstance(path.style.stroke, str))
+        for path in paths:
+            if path.config.quantize_vertices and id(path.geometry) not in painted:
+                path.geometry.quantize()
+
+    def _all_geometry_paths(self):
+        paths = list(self._geometry_paths)
+        for svg_path in self._paths:
+            if isinstance(svg_path, SVGDoc):
+                paths.extend(svg_path._all_geometry_paths())
+        return paths
 
     @staticmethod
-    def _is_path_tag(e):
-        return (e.tag.endswith('path')
-                or e.tag.endswith('rect')
-                or e.tag.endswith('polyline') or e.tag.endswith('polygon')
-                or e.tag.endswith('line')
-                or e.tag.endswith('circle') or e.tag.endswith('ellipse'))
-
-    def _parse_element(self, e, parent=None):
-        renderable = None
-        if self._is_path_tag(e):
-            renderable = SVGPath(self, e, parent)
-            if not parent:
-                self._paths.append(renderable)
-
-            if renderable.id:
-                self.path_lookup[renderable.id] = renderable
-        elif e.tag.endswith('}g') or e.tag == 'g':
-            renderable = SVGGroup(self, e, parent)
-            if renderable.id:
-                self.path_lookup[renderable.id] = renderable
-                self.defs[renderable.id] = renderable
-            if not parent and not renderable.is_def:
-                self._paths.append(renderable)
-        elif e.tag.endswith('svg'):
-            renderable = SVGDoc(e, parent)
-            self._paths.append(renderable)
-        elif e.tag.endswith('marker'):
-            renderable = SVGMarker(self, e, parent)
-        elif e.tag.endswith("text"):
-            self._warn("Text tag not supported")
-        elif e.tag.endswith('linearGradient'):
-            self._gradients[e.get('id')] = LinearGradient(e, self)
-        elif e.tag.endswith('radialGradient'):
-            self._gradients[e.get('id')] = RadialGradient(e, self)
-        elif e.tag.endswith('pattern'):
-            renderable = SVGPattern(self, e, parent)
-            self.patterns[e.get('id')] = renderable
-        elif e.tag.endswith('defs'):
-            renderable = SVGDefs(self, e, parent)
-        elif e.tag.endswith('marker'):
-            renderable = SVGMarker(self, e, parent)
-        elif e.tag.endswith('use'):
-            renderable = SVGUse(self, e, parent)
-            self._paths.append(renderable)
-        for c in e.getchildren():
-            try:
-                self._parse_element(c, renderable)
-            except Exception as ex:
-                print('Exception while parsing element ', c)
-                raise
+    def _unique_geometries(paths):
+        geometries = []
+        seen = set()
+        for path in paths:
+            if id(path.geometry) not in seen:
+                seen.add(id(path.geometry))
+                geometries.append(path.geometry)
+        return geometries
+
+    def _share_geometry(self):
+        """Copies the vertex arrays of every geometry into shared memory and points
+        the paths at copies of their geometry holding placeholders instead. The
+        originals may be shared with other documents, so they are left alone.
+        Returns the name of the block for `_attach_geometry`."""
+        paths = self._all_geometry_paths()
+        geometries = self._unique_geometries(paths)
+        placeholders, name = share_geometry([(g.fill, g.stroke_geometry) for g in geometries])
+
+        shared = {}
+        for geometry, (fill, stroke_geometry) in zip(geometries, placeholders):
+            shared[id(geometry)] = copy.copy(geometry)
+            shared[id(geometry)].set_geometry(fill, stroke_geometry)
+        for path in paths:
+            path.geometry = shared[id(path.geometry)]
+        return name
+
+    def _attach_geometry(self, name):
+        """Replaces the placeholders left by `_share_geometry` with views into shared
+        memory, then switches to the geometries already loaded in this process."""
+        paths = self._all_geometry_paths()
+        geometries = self._unique_geometries(paths)
+        results = attach_geometry([(g.fill, g.stroke_geometry) for g in geometries], name)
+        for geometry, (fill, stroke_geometry) in zip(geometries, results):
+            geometry.set_geometry(fill, stroke_geometry)
+
+        if self.config.deduplicate_geometry:
+            for path in paths:
+                path.geometry = intern_geometry(path.geometry)
 
     def get_path_ids(self):
         """Returns all the path ids"""
@@ -261,14 +536,7 @@ class SVGDoc(SVGContainer):
 
     def _set_anchor_x(self, anchor_x):
         self._anchor_x = anchor_x
-        if self._anchor_x == 'left':
-            self._a_x = 0
-        elif self._anchor_x == 'center':
-            self._a_x = self.width * .5
-        elif self._anchor_x == 'right':
-            self._a_x = self.width
-        else:
-            self._a_x = self._anchor_x
+        self._a_x = anchor_offset_x(anchor_x, self.width)
 
     def _get_anchor_x(self):
         return self._anchor_x
@@ -278,14 +546,7 @@ class SVGDoc(SVGContainer):
 
     def _set_anchor_y(self, anchor_y):
         self._anchor_y = anchor_y
-        if self._anchor_y == 'bottom':
-            self._a_y = 0
-        elif self._anchor_y == 'center':
-            self._a_y = self.height * .5
-        elif self._anchor_y == 'top':
-            self._a_y = self.height
-        else:
-            self._a_y = self.anchor_y
+        self._a_y = anchor_offset_y(anchor_y, self.height)
 
     def _get_anchor_y(self):
         return self._anchor_y
@@ -293,17 +554,140 @@ class SVGDoc(SVGContainer):
     #: Where the document is anchored. Valid values are numerical, or 'top', 'bottom', 'center'
     anchor_y = property(_get_anchor_y, _set_anchor_y)
 
-    def _generate_disp_list(self):
+    @property
+    def is_uploaded(self):
+        """Whether all the GL resources for this document have been created"""
+        if self.outer:
+            return self.outer.is_uploaded
+        return self._upload_done
+
+    @property
+    def disp_list(self):
+        """A callable drawing the whole document, or None until the upload has
+        finished. Kept for callers of the single display list documents used to
+        have: the only entry of `disp_lists`, or a function calling each of them."""
+        if not self._upload_done:
+            return None
+        if len(self.disp_lists) == 1:
+            return self.disp_lists[0]
+
+        def call_lists():
+            for display_list in self.disp_lists:
+                display_list()
+        return call_lists
+
+    def upload(self):
+        """Creates the GL resources (shaders, pattern textures and display lists) for
+        a parsed document. Must be called from the thread that owns the GL context."""
+        for _ in self.upload_steps():
+            pass
+
+    def upload_steps(self):
+        """Generator which creates the GL resources of a parsed document one slice at
+        a time, yielding after each: gradient shader compiles, shared path geometry,
+        pattern textures, definitions and one display list per chunk of
+        `config.upload_chunk_size` draw list entries. Lets UploadScheduler spread an
+        upload over several frames."""
+        if self._upload_done:
+            return
+
+        # the steps are timed and counted one by one, as other code runs between them
+        timings = self.load_timings
+        upload_stats = self.upload_stats
+
+        gradient_types = set(type(g) for g in self._gradients.values())
+        if LinearGradient in gradient_types:
+            with timed(timings, 'compile'):
+                gradient_shaders.linear_shader
+            yield
+        if RadialGradient in gradient_types:
+            with timed(timings, 'compile'):
+                gradient_shaders.radial_shader
+            yield
+
+        # compile the shared geometry, which the display lists below call
+        paths = self._all_geometry_paths()
+        chunk_size = max(1, self.config.upload_chunk_size)
+        for start in range(0, len(paths), chunk_size):
+            with timed(timings, 'compile'), collecting(upload_stats):
+                for path in paths[start:start + chunk_size]:
+                    if id(path.geometry) not in self._acquired_geometry:
+                        self._acquired_geometry[id(path.geometry)] = path.geometry
+                        path.geometry.acquire()
+                    path.compile_geometry()
+            yield
 
         # prepare all the patterns
-        self.prerender_patterns()
+        for pattern in self.patterns.values():
+            with timed(timings, 'pattern', pattern.id if timings and timings.per_element else None), \
+                    collecting(upload_stats):
+                self._enable_blending()
+                pattern.render()
+            yield
 
         # prepare all the predefined paths
-        self.prerender_defs()
+        for d in self.defs.values():
+            with timed(timings, 'compile'), collecting(upload_stats):
+                self._enable_blending()
+                d.render()
+            yield
+
+        draw_list = self.draw_list()
+        for start in range(0, len(draw_list), chunk_size):
+            list_stats = RenderStats()
+            with timed(timings, 'compile'), collecting(list_stats):
+                with DisplayListGenerator() as display_list:
+                    self._render_draw_list(draw_list[start:start + chunk_size])
+            # the data went into the display list; calling it sends nothing
+            upload_stats.bytes_uploaded += list_stats.bytes_uploaded
+            list_stats.bytes_uploaded = 0
+            self.disp_lists.append(display_list)
+            self._disp_list_stats.append(list_stats)
+            yield
+
+        self._upload_done = True
+        if self.element_profile:
+            self.element_profile.measure()
+        self._report_timings()
+
+    def _report_timings(self):
+        if self.load_timings and self.config.timings_callback:
+            self.config.timings_callback(self, self.load_timings)
+
+    def release(self):
+        """Deletes the GL resources created by `upload`. The document stays parsed
+        and can be uploaded again. Must be called from the GL thread."""
+        for display_list in self.disp_lists:
+            display_list.delete()
+        self.disp_lists = []
+        self._disp_list_stats = []
+
+        # shared geometry is deleted once no uploaded document uses it
+        for geometry in self._acquired_geometry.values():
+            geometry.release()
+        self._acquired_geometry = {}
 
-        with DisplayListGenerator() as display_list:
-            self.disp_list = display_list
-            self.render()
+        for pattern in self.patterns.values():
+            pattern.release()
+
+        self._upload_done = False
+
+    def memory_size(self):
+        """Approximate number of bytes held by the document's vertex arrays and,
+        once uploaded, by its display lists and pattern textures."""
+        n_bytes = 0
+        for geometry in self._unique_geometries(self._all_geometry_paths()):
+            for data in geometry.fill or ():
+                n_bytes += len(data) * data.itemsize
+            for loop_index, primitives in geometry.stroke_geometry or ():
+                for mode, vertices in primitives:
+                    n_bytes += len(vertices) * vertices.itemsize
+
+        if self._upload_done:
+            # display lists keep their own copy of the vertices
+            n_bytes *= 2
+            n_bytes += len(self.patterns) * PATTERN_TEX_SIZE * PATTERN_TEX_SIZE * 4
+        return n_bytes
 
     def draw(self, x, y, z=0, angle=0, scale=1):
         """Draws the SVG to screen.
@@ -323,6 +707,16 @@ class SVGDoc(SVGContainer):
                 of two floats (xscale, yscale).
 
         """
+        self._draw(x, y, z, angle, scale, self._a_x, self._a_y)
+
+    def _draw(self, x, y, z, angle, scale, a_x, a_y):
+        stats = self.stats
+        with collecting(stats, timed=True):
+            stats.draws += 1
+            with timed_pass('draw'):
+                self._draw_lists(x, y, z, angle, scale, a_x, a_y)
+
+    def _draw_lists(self, x, y, z, angle, scale, a_x, a_y):
         #CanvasManager.inst().update()
         #bg = CanvasManager.inst().get('BackgroundImage')
 
@@ -335,38 +729,90 @@ class SVGDoc(SVGContainer):
                     gl.glScalef(scale[0], scale[1], 1)
                 except TypeError:
                     gl.glScalef(scale, scale, 1)
-            if self._a_x or self._a_y:
-                gl.glTranslatef(-self._a_x, -self._a_y, 0)
+            if a_x or a_y:
+                gl.glTranslatef(-a_x, -a_y, 0)
 
             #with bg:
             gl.glClear(gl.GL_COLOR_BUFFER_BIT | gl.GL_DEPTH_BUFFER_BIT)
-            self.disp_list()
+            if self._upload_done or self.config.draw_partial_uploads:
+                stats = self.stats
+                for display_list, list_stats in zip(self.disp_lists, self._disp_list_stats):
+                    display_list()
+                    stats.add(list_stats)
         #bg.blit()
 
-    def prerender_defs(self):
-        gl.glEnable(gl.GL_BLEND)
-        gl.glBlendFunc(gl.GL_SRC_ALPHA, gl.GL_ONE_MINUS_SRC_ALPHA)
-
-        for d in self.defs.values():
-            d.render()
-
-    def prerender_patterns(self):
+    @staticmethod
+    def _enable_blending():
+        count_state_changes(2)
         gl.glEnable(gl.GL_BLEND)
         gl.glBlendFunc(gl.GL_SRC_ALPHA, gl.GL_ONE_MINUS_SRC_ALPHA)
 
-        for pattern in self.patterns.values():
-            pattern.render()
-
     def render(self):
         """Render the SVG file without any display lists or transforms. Use draw instead. """
-        gl.glEnable(gl.GL_BLEND)
-        gl.glBlendFunc(gl.GL_SRC_ALPHA, gl.GL_ONE_MINUS_SRC_ALPHA)
+        with collecting(self.stats, timed=True):
+            self.stats.draws += 1
+            with timed_pass('draw'):
+                self._render_draw_list(self.draw_list())
+
+    def draw_list(self):
+        """Returns everything the document draws, in order, as a flat list of
+        (matrix, element) pairs. See SVGRenderableElement.draw_list."""
+        return flatten([self], Matrix.identity())
+
+    def _expand(self, matrix, draw_list, stack):
+        matrix = matrix * Matrix.translation(self.x, self.y)
+        stack.extend((matrix, svg_path) for svg_path in reversed(self._paths))
 
-        graphics.clear_stats()
-        #clear out stencils
-        with Matrix.translation(self.x, self.y):
-            for svg_path in self._paths:
-                svg_path.render()
+    def _render_draw_list(self, draw_list):
+        self._enable_blending()
+        render_draw_list(draw_list)
 
     def _warn(self, message):
         print("Warning: SVG Parser (%s) - %s" % (self.filename, message))
+
+
+def _build_geometry_batch(jobs, collect_timings=False):
+    """Builds a batch of path geometry in a worker process and shares the arrays.
+    Returns the shared geometry and, if `collect_timings` is set, its LoadTimings."""
+    timings = LoadTimings() if collect_timings else None
+    with recording(timings):
+        results = [build_path_geometry(job) for job in jobs]
+    return share_geometry(results) + (timings,)
+
+
+def anchor_offset_x(anchor_x, width):
+    """Resolves an anchor_x value (a number, or 'left', 'center', 'right') to an offset"""
+    if anchor_x == 'left':
+        return 0
+    elif anchor_x == 'center':
+        return width * .5
+    elif anchor_x == 'right':
+        return width
+    return anchor_x
+
+
+def anchor_offset_y(anchor_y, height):
+    """Resolves an anchor_y value (a number, or 'bottom', 'center', 'top') to an offset"""
+    if anchor_y == 'bottom':
+        return 0
+    elif anchor_y == 'center':
+        return height * .5
+    elif anchor_y == 'top':
+        return height
+    return anchor_y
+
+
+class NestedSVGHandler(ElementHandler):
+    """Parses a nested <svg> element as an SVGDoc sharing the outer document's resources"""
+
+    # the nested document parses its own children
+    parse_children = False
+
+    @classmethod
+    def parse(cls, svg, element, parent):
+        doc = SVGDoc(element, parent, upload=False, outer=svg)
+        svg._paths.append(doc)
+        return doc
+
+
+register_element_handler('svg', NestedSVGHandler)
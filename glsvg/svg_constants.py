@@ -8,7 +8,7 @@ CIRCLE_POINTS = 48
 TOLERANCE = 0.1
 
 #: Default fill color (as per svg spec)
-DEFAULT_FILL = [0, 0, 0, 255]
+DEFAULT_FILL = (0, 0, 0, 255)
 
 #: Default fill stroke (as per svg spec)
 DEFAULT_STROKE = None
@@ -0,0 +1,661 @@
+"""Estimates what a document will cost to build and draw, before building it.
+
+A cheap pass over the XML counts the segments of every shape: straight lines,
+bezier curves, and the sweep of arcs, circles and ellipses. Flattening turns
+each curve into `bezier_points` points and each full turn of an arc into
+`circle_points` points, of which those closer than the tolerance merge, so the
+number of points, triangles and vertices for any detail settings follows from
+the counts and the segment lengths without flattening anything. The estimates
+are approximate, and usually a little high.
+
+The same pass counts the features that cost more than their triangles:
+dashed strokes, patterns, gradients with more stops than the gradient shaders
+take, markers and `use` expansions. `estimate_cost` reports all of these for
+a file or XML tree without creating GL resources, and `fit_to_budget` uses the
+estimates to choose the detail settings for a triangle or vertex budget, see
+`SVGConfig.triangle_budget`. From the command line:
+
+    python -m glsvg cost [--json] [--bezier-points N] [--circle-points N] file.svg ...
+"""
+
+import argparse
+import bisect
+import copy
+import json
+import math
+import string
+import sys
+import warnings
+
+from glsvg import svg_style
+from .svg_constants import BEZIER_POINTS, CIRCLE_POINTS, TOLERANCE, PATTERN_TEX_SIZE
+from .svg_parser_utils import parse_float, read_svg
+from .path_geometry import SHAPE_ATTRIBUTES
+from .svg_path import XLINK_NS
+from .svg_path_builder import PATH_CMD_RE, POINT_RE, arc_parameters
+
+#: Stroke triangles per flattened segment, measured over the svgs/ corpus.
+#: Outlines are stroked as one quad per segment, with a joint between each.
+STROKE_TRIANGLES_PER_SEGMENT = 4
+
+#: Triangles in the fan of a round cap, see graphics.round_cap_vertices
+ROUND_CAP_TRIANGLES = 18
+
+#: The least detail `fit_to_budget` goes down to
+MIN_BEZIER_POINTS = 2
+MIN_CIRCLE_POINTS = 8
+#: The farthest apart, in user units, `fit_to_budget` lets flattened points be
+#: and still merge. `tolerance` is the square of this distance.
+MAX_MERGE_DISTANCE = 10.0
+
+#: The most gradient stops the gradient shaders use; further stops are dropped
+GRADIENT_SHADER_STOPS = 5
+
+#: Bytes of the RGBA texture each pattern renders into
+PATTERN_TEXTURE_BYTES = PATTERN_TEX_SIZE * PATTERN_TEX_SIZE * 4
+
+#: Document counts copied into each SVGCost
+_DOCUMENT_COUNTS = ('n_shapes', 'n_line_segments', 'n_curve_segments', 'n_arcs',
+                    'n_dashed_strokes', 'n_dashes', 'n_patterns', 'n_gradients',
+                    'n_gradients_over_stop_limit', 'n_markers', 'n_marker_references',
+                    'n_uses', 'n_use_shapes')
+
+#: Number of arguments taken by each path command
+_ARG_COUNTS = {'m': 2, 'l': 2, 'h': 1, 'v': 1, 'c': 6, 's': 4, 'q': 4, 't': 2, 'a': 7, 'z': 0}
+
+
+class _Lengths(object):
+    """The lengths of one kind of segment, sorted, to count the points left
+    after flattening and merging points closer than the tolerance"""
+    __slots__ = ('lengths', '_sums')
+
+    def __init__(self, lengths):
+        self.lengths = sorted(lengths)
+        self._sums = [0.0]
+        for length in self.lengths:
+            self._sums.append(self._sums[-1] + length)
+
+    def longer_than(self, spacing):
+        """Number of segments longer than `spacing`"""
+        return len(self.lengths) - bisect.bisect_right(self.lengths, spacing)
+
+    def points(self, n_points, spacing):
+        """Number of points left of segments flattened into `n_points` points each,
+        when points closer than `spacing` merge"""
+        # a segment of length l keeps at most l / spacing + 1 points
+        n_short = bisect.bisect_left(self.lengths, (n_points - 1) * spacing)
+        return (int(self._sums[n_short] / spacing) + n_short +
+                (len(self.lengths) - n_short) * n_points)
+
+
+class _Counts(object):
+    """The segments of the shapes that are filled, or stroked"""
+    __slots__ = ('line_lengths', 'curve_lengths', 'arcs', 'circle_lengths',
+                 'n_loops', 'n_open_loops', 'stroke_triangles', '_sorted')
+
+    def __init__(self):
+        #: Lengths of straight segments, each ending in one point
+        self.line_lengths = []
+        #: Lengths of the control polygons of bezier curves, each flattened
+        #: into `bezier_points` points
+        self.curve_lengths = []
+        #: (sweep in full turns, length) of each elliptical arc
+        self.arcs = []
+        #: Circumferences of circles and ellipses, each flattened into
+        #: `circle_points` points
+        self.circle_lengths = []
+        #: Closed and open loops, and open loops alone
+        self.n_loops = 0
+        self.n_open_loops = 0
+        #: Stroke triangles which don't depend on the detail settings: caps and dashes
+        self.stroke_triangles = 0
+        self._sorted = None
+
+    def add(self, other):
+        self.line_lengths.extend(other.line_lengths)
+        self.curve_lengths.extend(other.curve_lengths)
+        self.arcs.extend(other.arcs)
+        self.circle_lengths.extend(other.circle_lengths)
+        self.n_loops += other.n_loops
+        self.n_open_loops += other.n_open_loops
+        self.stroke_triangles += other.stroke_triangles
+        self._sorted = None
+
+    def length(self):
+        """Total length of all segments"""
+        return (sum(self.line_lengths) + sum(self.curve_lengths) +
+                sum(length for turns, length in self.arcs) + sum(self.circle_lengths))
+
+    def points(self, bezier_points, circle_points, tolerance):
+        """Number of points after flattening with the given detail settings"""
+        if self._sorted is None:
+            self._sorted = (_Lengths(self.line_lengths), _Lengths(self.curve_lengths),
+                            _Lengths(self.circle_lengths))
+        lines, curves, circles = self._sorted
+        # SVGPathBuilder.end_path merges points whose squared distance is
+        # within the tolerance
+        spacing = math.sqrt(tolerance) or 1e-9
+        # mirrors SVGPathBuilder.arc_to; the first point of each curve and arc
+        # repeats the current point, and is merged with it
+        arc_points = sum(min(max(int(circle_points * turns), 1), int(length / spacing) + 1)
+                         for turns, length in self.arcs)
+        return (self.n_loops + lines.longer_than(spacing) +
+                curves.points(bezier_points, spacing) + arc_points +
+                circles.points(circle_points, spacing))
+
+
+class SVGCost(object):
+    """The segment counts of a document and the cost they predict for a config"""
+
+    def __init__(self, fill, stroke, bezier_points, circle_points, tolerance, pattern=None):
+        #: The detail settings the estimates are for
+        self.bezier_points = bezier_points
+        self.circle_points = circle_points
+        self.tolerance = tolerance
+
+        #: Number of shape elements (paths, rects, circles, ...)
+        self.n_shapes = 0
+
+        #: Segment counts over all shapes, filled or not
+        self.n_line_segments = 0
+        self.n_curve_segments = 0
+        self.n_arcs = 0
+
+        #: Stroked shapes with a dash array, and the estimated number of dashes,
+        #: each built as a separate polyline
+        self.n_dashed_strokes = 0
+        self.n_dashes = 0
+
+        #: Patterns, each rendered into a texture of PATTERN_TEXTURE_BYTES
+        self.n_patterns = 0
+
+        #: Gradients, and those with more than GRADIENT_SHADER_STOPS stops
+        self.n_gradients = 0
+        self.n_gradients_over_stop_limit = 0
+
+        #: Marker definitions, and the marker-start and marker-end references to
+        #: them, each drawn separately with every render of its path
+        self.n_markers = 0
+        self.n_marker_references = 0
+
+        #: Use elements, and the shapes they draw again
+        self.n_uses = 0
+        self.n_use_shapes = 0
+
+        fill_points = fill.points(bezier_points, circle_points, tolerance)
+        stroke_points = stroke.points(bezier_points, circle_points, tolerance)
+        if pattern:
+            # shapes in patterns are flattened with more detail, see
+            # SVGConfig.super_detailed
+            pattern_fill, pattern_stroke = pattern
+            fill_points += pattern_fill.points(bezier_points * 10, circle_points * 10, tolerance / 100)
+            stroke_points += pattern_stroke.points(bezier_points * 10, circle_points * 10, tolerance / 100)
+            fill_loops = fill.n_loops + pattern_fill.n_loops
+            stroke_loops = stroke.n_loops + pattern_stroke.n_loops
+            fixed_stroke_triangles = stroke.stroke_triangles + pattern_stroke.stroke_triangles
+        else:
+            fill_loops = fill.n_loops
+            stroke_loops = stroke.n_loops
+            fixed_stroke_triangles = stroke.stroke_triangles
+
+        #: Estimated fill triangles, as counted by `SVGDoc.n_tris`
+        self.fill_triangles = max(0, fill_points - 2 * fill_loops)
+
+        #: Estimated stroked segments, as counted by `SVGDoc.n_lines`
+        self.stroke_segments = max(0, stroke_points - stroke_loops)
+
+        #: Estimated stroke triangles
+        self.stroke_triangles = max(0, STROKE_TRIANGLES_PER_SEGMENT * self.stroke_segments
+                                    - 2 * stroke_loops) + fixed_stroke_triangles
+
+        #: Estimated vertices: the distinct fill vertices and the stroke strip vertices
+        self.vertices = fill_points + self.stroke_triangles + 2 * stroke_loops
+
+    @property
+    def triangles(self):
+        """Estimated triangles drawn, fill and stroke"""
+        return self.fill_triangles + self.stroke_triangles
+
+    @property
+    def pattern_texture_bytes(self):
+        """Texture memory taken by the document's patterns"""
+        return self.n_patterns * PATTERN_TEXTURE_BYTES
+
+    def as_dict(self):
+        """Returns the settings, counts and estimates as a dict, e.g. for JSON"""
+        d = dict(vars(self))
+        d['triangles'] = self.triangles
+        d['pattern_texture_bytes'] = self.pattern_texture_bytes
+        return d
+
+    def report(self):
+        """Returns a readable, multi-line summary of the estimates"""
+        lines = [
+            ('shapes', self.n_shapes, 'lines {0}, curves {1}, arcs {2}'.format(
+                self.n_line_segments, self.n_curve_segments, self.n_arcs)),
+            ('triangles', self.triangles, 'fill {0}, stroke {1}'.format(
+                self.fill_triangles, self.stroke_triangles)),
+            ('vertices', self.vertices, 'bezier_points {0}, circle_points {1}'.format(
+                self.bezier_points, self.circle_points)),
+            ('dashed strokes', self.n_dashed_strokes, '{0} dash polylines'.format(self.n_dashes)),
+            ('patterns', self.n_patterns, '{0:.1f} MB of textures'.format(
+                self.pattern_texture_bytes / 1e6)),
+            ('gradients', self.n_gradients, '{0} with more than {1} stops'.format(
+                self.n_gradients_over_stop_limit, GRADIENT_SHADER_STOPS)),
+            ('markers', self.n_markers, '{0} drawn per render'.format(self.n_marker_references)),
+            ('uses', self.n_uses, '{0} shapes drawn again'.format(self.n_use_shapes)),
+        ]
+        return '\n'.join('{0:<16}{1:>8}  ({2})'.format(*line) for line in lines)
+
+    def __repr__(self):
+        return "<SVGCost triangles={0} vertices={1} bezier_points={2} circle_points={3}>".format(
+            self.triangles, self.vertices, self.bezier_points, self.circle_points)
+
+
+class _DocumentCounts(object):
+    """The segment counts of a document, from which SVGCosts are derived"""
+
+    def __init__(self):
+        for name in _DOCUMENT_COUNTS:
+            setattr(self, name, 0)
+
+        #: (fill, stroke) counts for shapes outside and inside patterns
+        self.counts = (_Counts(), _Counts())
+        self.pattern_counts = (_Counts(), _Counts())
+
+    def cost(self, bezier_points, circle_points, tolerance):
+        fill, stroke = self.counts
+        cost = SVGCost(fill, stroke, bezier_points, circle_points, tolerance, self.pattern_counts)
+        for name in _DOCUMENT_COUNTS:
+            setattr(cost, name, getattr(self, name))
+        return cost
+
+
+def _local_name(tag):
+    if not isinstance(tag, str):
+        return None
+    return tag.rsplit('}', 1)[-1]
+
+
+def _distance(x1, y1, x2, y2):
+    return math.sqrt((x2 - x1) ** 2 + (y2 - y1) ** 2)
+
+
+def _ellipse_circumference(rx, ry):
+    # Ramanujan's approximation
+    return math.pi * (3 * (rx + ry) - math.sqrt((3 * rx + ry) * (rx + 3 * ry)))
+
+
+def _count_path_data(d, counts):
+    """Adds the segments of path data `d` to counts, tracking the current point
+    and control points. Returns (line segments, curve segments, arcs)."""
+    tokens = PATH_CMD_RE.findall(d)
+    n_lines = n_curves = n_arcs = 0
+    x = y = 0.0
+    start_x = start_y = 0.0
+    # the last control point, for reflecting in s and t commands
+    control_x = control_y = 0.0
+    opcode = ''
+    loop_open = False
+    i = 0
+    while i < len(tokens):
+        if tokens[i] in string.ascii_letters:
+            opcode = tokens[i]
+            i += 1
+        elif not opcode:
+            break
+        op = opcode.lower()
+        n_args = _ARG_COUNTS.get(op)
+        if n_args is None:
+            break
+        args = [float(a) for a in tokens[i:i + n_args]]
+        if len(args) < n_args:
+            break
+        i += n_args
+        if opcode.islower() and op not in ('h', 'v', 'a'):
+            # make the coordinate pairs absolute
+            args = [a + (x if j % 2 == 0 else y) for j, a in enumerate(args)]
+
+        if op == 'z':
+            counts.line_lengths.append(_distance(x, y, start_x, start_y))
+            counts.n_loops += 1
+            loop_open = False
+            x, y = start_x, start_y
+            # z takes no arguments, so it doesn't repeat
+            opcode = ''
+            continue
+
+        if op == 'm':
+            if loop_open:
+                counts.n_loops += 1
+                if (x, y) != (start_x, start_y):
+                    counts.n_open_loops += 1
+            loop_open = True
+            x, y = start_x, start_y = args
+            # further pairs are implicit line_tos
+            opcode = 'l' if opcode == 'm' else 'L'
+            continue
+
+        loop_open = True
+        if op in ('l', 'h', 'v'):
+            end_x, end_y = x, y
+            if op == 'h':
+                end_x = x + args[0] if opcode == 'h' else args[0]
+            elif op == 'v':
+                end_y = y + args[0] if opcode == 'v' else args[0]
+            else:
+                end_x, end_y = args
+            counts.line_lengths.append(_distance(x, y, end_x, end_y))
+            x, y = end_x, end_y
+            n_lines += 1
+        elif op == 'a':
+            rx, ry, phi, large_arc, sweep, end_x, end_y = args
+            if opcode == 'a':
+                end_x, end_y = x + end_x, y + end_y
+            chord = _distance(x, y, end_x, end_y)
+            if rx and ry and chord:
+                delta = abs(arc_parameters(x, y, rx, ry, phi, int(large_arc), int(sweep), end_x, end_y)[3])
+                counts.arcs.append((delta / (2 * math.pi),
+                                    max(chord, delta * (abs(rx) + abs(ry)) / 2)))
+            else:
+                counts.line_lengths.append(chord)
+            x, y = end_x, end_y
+            n_arcs += 1
+        else:
+            # the length of the control polygon bounds the length of the curve
+            if op == 'c':
+                points = args
+            elif op == 's':
+                points = [2 * x - control_x, 2 * y - control_y] + args
+            elif op == 'q':
+                points = args
+            else:
+                points = [2 * x - control_x, 2 * y - control_y] + args
+            length = 0.0
+            previous_x, previous_y = x, y
+            for j in range(0, len(points), 2):
+                length += _distance(previous_x, previous_y, points[j], points[j + 1])
+                previous_x, previous_y = points[j], points[j + 1]
+            counts.curve_lengths.append(length)
+            control_x, control_y = points[-4], points[-3]
+            x, y = points[-2], points[-1]
+            n_curves += 1
+            continue
+        control_x, control_y = x, y
+    if loop_open:
+        counts.n_loops += 1
+        if (x, y) != (start_x, start_y):
+            counts.n_open_loops += 1
+    return n_lines, n_curves, n_arcs
+
+
+def _count_shape(element, tag, counts):
+    """Adds the segments of a shape element to counts. Mirrors SVGPathBuilder."""
+    if tag == 'path':
+        return _count_path_data(element.get('d', ''), counts)
+
+    counts.n_loops += 1
+    if tag == 'rect':
+        w = parse_float(element.get('width', '0'))
+        h = parse_float(element.get('height', '0'))
+        rx = parse_float(element.get('rx', '0'))
+        ry = parse_float(element.get('ry', str(rx)))
+        if rx == 0 and ry == 0:
+            counts.line_lengths.extend((w, h, w, h))
+            return 4, 0, 0
+        counts.line_lengths.extend((w - 2 * rx, h - 2 * ry, w - 2 * rx, h - 2 * ry))
+        counts.arcs.extend([(0.25, _ellipse_circumference(rx, ry) / 4)] * 4)
+        return 4, 0, 4
+    elif tag in ('polyline', 'polygon'):
+        coordinates = [float(c) for c in POINT_RE.findall(element.get('points', ''))]
+        points = list(zip(coordinates[0::2], coordinates[1::2]))
+        if tag == 'polygon' and points:
+            points.append(points[0])
+        elif len(points) > 1 and points[0] != points[-1]:
+            counts.n_open_loops += 1
+        for (x1, y1), (x2, y2) in zip(points, points[1:]):
+            counts.line_lengths.append(_distance(x1, y1, x2, y2))
+        return max(0, len(points) - 1), 0, 0
+    elif tag == 'line':
+        counts.line_lengths.append(_distance(
+            parse_float(element.get('x1', '0')), parse_float(element.get('y1', '0')),
+            parse_float(element.get('x2', '0')), parse_float(element.get('y2', '0'))))
+        counts.n_open_loops += 1
+        return 1, 0, 0
+    elif tag == 'circle':
+        r = parse_float(element.get('r', '0'))
+        counts.circle_lengths.append(2 * math.pi * r)
+        return 0, 0, 1
+    elif tag == 'ellipse':
+        counts.circle_lengths.append(_ellipse_circumference(
+            parse_float(element.get('rx', '0')), parse_float(element.get('ry', '0'))))
+        return 0, 0, 1
+    return 0, 0, 0
+
+
+def _dashes(counts, style):
+    """Estimated number of dashes a shape's dash array splits its stroke into"""
+    pattern = list(style.stroke_dasharray)
+    if len(pattern) % 2 == 1:
+        pattern *= 2
+    period = sum(pattern)
+    if not pattern or period <= 0:
+        return 0
+    return int(counts.length() / period * len(pattern) / 2)
+
+
+def _stroke_triangles(counts, style, n_dashes):
+    """Stroke triangles of a shape which don't depend on the detail settings:
+    the round caps of its open loops and its dashes"""
+    # each dash is stroked as an open polyline of its own
+    n_triangles = 2 * n_dashes
+    if style.stroke_linecap == 'round':
+        n_triangles += 2 * ROUND_CAP_TRIANGLES * (counts.n_open_loops + n_dashes)
+    return n_triangles
+
+
+def _count_use_shapes(elements_by_id, target_id, memo, expanding=()):
+    """Number of shapes drawn by using the element `target_id`, including the
+    shapes drawn by uses within it"""
+    if target_id in memo:
+        return memo[target_id]
+    target = elements_by_id.get(target_id)
+    if target is None or target_id in expanding:
+        return 0
+    n_shapes = 0
+    for element in target.iter():
+        tag = _local_name(element.tag)
+        if tag in SHAPE_ATTRIBUTES:
+            n_shapes += 1
+        elif tag == 'use':
+            n_shapes += _count_use_shapes(elements_by_id, _use_target(element), memo,
+                                          expanding + (target_id,))
+    memo[target_id] = n_shapes
+    return n_shapes
+
+
+def _use_target(element):
+    return element.get(XLINK_NS + 'href', element.get('href', ''))[1:]
+
+
+def count_segments(root):
+    """Walks the XML tree of a document and counts the segments of its shapes,
+    and the features that add to their cost"""
+    document = _DocumentCounts()
+    elements_by_id = {}
+    use_targets = []
+    stack = [(c, None, False) for c in reversed(root)]
+    while stack:
+        element, parent_style, in_pattern = stack.pop()
+        tag = _local_name(element.tag)
+        if tag is None:
+            continue
+
+        element_id = element.get('id')
+        if element_id:
+            elements_by_id[element_id] = element
+
+        style = svg_style.resolve_style(element, parent_style)
+        if tag in SHAPE_ATTRIBUTES:
+            counts = _Counts()
+            n_lines, n_curves, n_arcs = _count_shape(element, tag, counts)
+            document.n_shapes += 1
+            document.n_line_segments += n_lines
+            document.n_curve_segments += n_curves
+            document.n_arcs += n_arcs
+            if tag == 'path':
+                # SVGPath only draws the start and end markers
+                document.n_marker_references += (bool(element.get('marker-start')) +
+                                                 bool(element.get('marker-end')))
+
+            fill_counts, stroke_counts = document.pattern_counts if in_pattern else document.counts
+            if style.fill and tag != 'line':
+                fill_counts.add(counts)
+            if style.stroke:
+                n_dashes = _dashes(counts, style)
+                if n_dashes:
+                    document.n_dashed_strokes += 1
+                    document.n_dashes += n_dashes
+                counts.stroke_triangles = _stroke_triangles(counts, style, n_dashes)
+                stroke_counts.add(counts)
+        elif tag == 'pattern':
+            document.n_patterns += 1
+        elif tag in ('linearGradient', 'radialGradient'):
+            document.n_gradients += 1
+            n_stops = sum(1 for c in element if _local_name(c.tag) == 'stop')
+            if n_stops > GRADIENT_SHADER_STOPS:
+                document.n_gradients_over_stop_limit += 1
+        elif tag == 'marker':
+            document.n_markers += 1
+        elif tag == 'use':
+            document.n_uses += 1
+            use_targets.append(_use_target(element))
+
+        in_pattern = in_pattern or tag == 'pattern'
+        stack.extend((c, style, in_pattern) for c in reversed(element))
+
+    memo = {}
+    document.n_use_shapes = sum(_count_use_shapes(elements_by_id, target, memo)
+                                for target in use_targets)
+    return document
+
+
+def estimate_cost(filename_or_element, config=None):
+    """Estimates the cost of a document without flattening or tesselating
+    anything, or creating any GL resources.
+
+    Args:
+        `filename_or_element`: str or Element
+            The filename of a .svg or .svgz file, or the root of its XML tree.
+        `config`: SVGConfig
+            The detail settings to estimate for. By default the defaults of SVGConfig.
+
+    Returns:
+        An SVGCost.
+    """
+    if isinstance(filename_or_element, str):
+        root = read_svg(filename_or_element)
+    else:
+        root = filename_or_element
+    if config is None:
+        detail = BEZIER_POINTS, CIRCLE_POINTS, TOLERANCE
+    else:
+        detail = config.bezier_points, config.circle_points, config.tolerance
+    return count_segments(root).cost(*detail)
+
+
+def fit_to_budget(root, config):
+    """Returns (config, cost, fits): a copy of `config` with the largest detail
+    settings, at most the configured ones, whose estimated cost is within
+    `config.triangle_budget` and `config.vertex_budget`, that cost, and whether
+    it is within budget.
+
+    The point counts are lowered first. If even the fewest points are over
+    budget, the tolerance is raised until neighboring points merge enough. If
+    the least detail is still over budget, it is used, a warning is issued and
+    `fits` is False."""
+    document = count_segments(root)
+
+    def fits(cost):
+        return ((not config.triangle_budget or cost.triangles <= config.triangle_budget) and
+                (not config.vertex_budget or cost.vertices <= config.vertex_budget))
+
+    def detail(scale):
+        return (max(MIN_BEZIER_POINTS, int(config.bezier_points * scale)),
+                max(MIN_CIRCLE_POINTS, int(config.circle_points * scale)),
+                config.tolerance)
+
+    def loosened(exponent):
+        return detail(0.0)[:2] + (config.tolerance * 2 ** exponent,)
+
+    cost = document.cost(config.bezier_points, config.circle_points, config.tolerance)
+    if not fits(cost):
+        # the cost grows with the detail, so bisect on a common scale for both settings
+        low, high = 0.0, 1.0
+        for i in range(16):
+            middle = (low + high) / 2
+            if fits(document.cost(*detail(middle))):
+                low = middle
+            else:
+                high = middle
+        cost = document.cost(*detail(low))
+
+    if not fits(cost):
+        # raise the tolerance, a squared distance, up to MAX_MERGE_DISTANCE squared,
+        # bisecting on its exponent
+        max_tolerance = MAX_MERGE_DISTANCE ** 2
+        low, high = 0.0, max(0.0, math.log(max_tolerance / (config.tolerance or 1e-9), 2))
+        if fits(document.cost(*loosened(high))):
+            for i in range(16):
+                middle = (low + high) / 2
+                if fits(document.cost(*loosened(middle))):
+                    high = middle
+                else:
+                    low = middle
+        cost = document.cost(*loosened(high))
+
+    within_budget = fits(cost)
+    if not within_budget:
+        warnings.warn("Estimated at {0} triangles and {1} vertices with the least detail, over the "
+                      "budget of {2} triangles and {3} vertices".format(
+                          cost.triangles, cost.vertices, config.triangle_budget or 'any',
+                          config.vertex_budget or 'any'), RuntimeWarning, stacklevel=3)
+
+    tuned = copy.copy(config)
+    tuned._super_detailed = None
+    tuned.bezier_points = cost.bezier_points
+    tuned.circle_points = cost.circle_points
+    tuned.tolerance = cost.tolerance
+    return tuned, cost, within_budget
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m glsvg cost',
+        description='Estimates what SVG files will cost to build and draw, without a GL context.')
+    parser.add_argument('files', nargs='+', help='.svg or .svgz files')
+    parser.add_argument('--bezier-points', type=int, default=BEZIER_POINTS)
+    parser.add_argument('--circle-points', type=int, default=CIRCLE_POINTS)
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE)
+    parser.add_argument('--json', action='store_true', help='print a JSON list instead of a report')
+    args = parser.parse_args(argv)
+
+    results = []
+    failed = False
+    for filename in args.files:
+        try:
+            cost = count_segments(read_svg(filename)).cost(
+                args.bezier_points, args.circle_points, args.tolerance)
+        except Exception as ex:
+            sys.stderr.write('{0}: {1!r}\n'.format(filename, ex))
+            failed = True
+            continue
+        if args.json:
+            results.append(dict(cost.as_dict(), filename=filename))
+        else:
+            print(filename)
+            print(cost.report())
+            print('')
+    if args.json:
+        print(json.dumps(results, indent=2))
+    return 1 if failed else 0
@@ -0,0 +1,141 @@
+"""Maps SVG element names to the handlers that parse them.
+
+SVGDoc looks up the handler for each element by its local name, the tag
+without its namespace. Elements without a handler are skipped, but their
+children are still parsed. Applications can add handlers for their own
+elements, or replace the built in ones, with `register_element_handler`.
+"""
+
+from .svg_path import SVGPath, SVGGroup, SVGDefs, SVGUse, SVGMarker
+from .svg_pattern import SVGPattern
+from .gradient import LinearGradient, RadialGradient
+
+#: Handlers by local element name
+_element_handlers = {}
+
+
+def local_name(tag):
+    """Returns `tag` without its namespace, or None for comments and
+    processing instructions"""
+    if not isinstance(tag, str):
+        return None
+    return tag.rsplit('}', 1)[-1]
+
+
+def register_element_handler(name, handler):
+    """Registers `handler` for elements with the local name `name`, replacing
+    any existing handler for it.
+
+    Args:
+        `name`: str
+            The local name of the element, e.g. 'path' or 'spawnpoint'.
+        `handler`: ElementHandler
+            A class (or any object) with a `parse(svg, element, parent)` method
+            and a `parse_children` attribute, such as an ElementHandler subclass.
+    """
+    _element_handlers[name] = handler
+
+
+def element_handler(name):
+    """Returns the handler registered for the local name `name`, or None"""
+    return _element_handlers.get(name)
+
+
+class ElementHandler(object):
+    """Parses one kind of element. Handlers aren't instantiated; SVGDoc calls
+    the `parse` classmethod for each matching element."""
+
+    #: Whether the children of the element are parsed after it
+    parse_children = True
+
+    @classmethod
+    def parse(cls, svg, element, parent):
+        """Parses `element`, a child of the renderable `parent` (None at the top
+        level) of the document `svg`. Returns the renderable that becomes the
+        parent of the element's children, or None."""
+        return None
+
+
+class PathHandler(ElementHandler):
+    @classmethod
+    def parse(cls, svg, element, parent):
+        path = SVGPath(svg, element, parent)
+        svg._geometry_paths.append(path)
+        if not parent:
+            svg._paths.append(path)
+        if path.id:
+            svg.path_lookup[path.id] = path
+        return path
+
+
+class GroupHandler(ElementHandler):
+    @classmethod
+    def parse(cls, svg, element, parent):
+        group = SVGGroup(svg, element, parent)
+        if group.id:
+            svg.path_lookup[group.id] = group
+            svg.defs[group.id] = group
+        if not parent and not group.is_def:
+            svg._paths.append(group)
+        return group
+
+
+class MarkerHandler(ElementHandler):
+    @classmethod
+    def parse(cls, svg, element, parent):
+        return SVGMarker(svg, element, parent)
+
+
+class TextHandler(ElementHandler):
+    @classmethod
+    def parse(cls, svg, element, parent):
+        svg._warn("Text tag not supported")
+        return None
+
+
+class LinearGradientHandler(ElementHandler):
+    @classmethod
+    def parse(cls, svg, element, parent):
+        svg._gradients[element.get('id')] = LinearGradient(element, svg)
+        return None
+
+
+class RadialGradientHandler(ElementHandler):
+    @classmethod
+    def parse(cls, svg, element, parent):
+        svg._gradients[element.get('id')] = RadialGradient(element, svg)
+        return None
+
+
+class PatternHandler(ElementHandler):
+    @classmethod
+    def parse(cls, svg, element, parent):
+        pattern = SVGPattern(svg, element, parent)
+        svg.patterns[element.get('id')] = pattern
+        return pattern
+
+
+class DefsHandler(ElementHandler):
+    @classmethod
+    def parse(cls, svg, element, parent):
+        return SVGDefs(svg, element, parent)
+
+
+class UseHandler(ElementHandler):
+    @classmethod
+    def parse(cls, svg, element, parent):
+        use = SVGUse(svg, element, parent)
+        svg._paths.append(use)
+        return use
+
+
+for _name in ('path', 'rect', 'polyline', 'polygon', 'line', 'circle', 'ellipse'):
+    register_element_handler(_name, PathHandler)
+register_element_handler('g', GroupHandler)
+register_element_handler('marker', MarkerHandler)
+register_element_handler('text', TextHandler)
+register_element_handler('linearGradient', LinearGradientHandler)
+register_element_handler('radialGradient', RadialGradientHandler)
+register_element_handler('pattern', PatternHandler)
+register_element_handler('defs', DefsHandler)
+register_element_handler('use', UseHandler)
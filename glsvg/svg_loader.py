@@ -0,0 +1,224 @@
+"""Helpers for loading many SVG documents at once.
+
+Parsing, flattening and tesselation are plain CPU-bound python, so they are run
+in worker processes. The vertex arrays come back through shared memory and only
+the GL upload happens on the calling thread.
+"""
+
+import os
+import copy
+import time
+import queue
+import itertools
+import collections
+from concurrent.futures import Future, ProcessPoolExecutor
+
+from .svg import SVGDoc, SVGConfig
+from .shared_geometry import prepare_pool
+
+
+def _parse_in_worker(filename, config, anchor_x, anchor_y):
+    """Parses a document without touching GL. Runs in a worker process."""
+    # documents are already spread over the pool, don't start another one per document
+    config = copy.copy(config)
+    config.tessellation_workers = 0
+    doc = SVGDoc(filename, anchor_x=anchor_x, anchor_y=anchor_y, config=config, upload=False)
+
+    # the xml tree is not needed for rendering, so don't send it back
+    doc.root = None
+
+    # the vertex arrays go back through shared memory rather than the pickle
+    return doc, doc._share_geometry()
+
+
+def load_many(filenames, workers=None, config=None, anchor_x=0, anchor_y=0):
+    """Loads a list of .svg or .svgz files, parsing them in parallel.
+
+    The documents are parsed and tesselated in a pool of worker processes and
+    then uploaded to GL on the calling thread, which must own the GL context.
+    On platforms that spawn worker processes (Windows) this must be called
+    from under an ``if __name__ == '__main__'`` guard.
+
+    Args:
+        `filenames`: list of str
+            The files to load.
+        `workers`: int
+            The number of worker processes. Defaults to the number of cores.
+        `config`: SVGConfig
+            The config shared by all documents. Defaults to a new SVGConfig.
+        `anchor_x`, `anchor_y`:
+            The anchor for every document, as in SVGDoc.
+
+    Returns:
+        A list of uploaded SVGDoc objects, in the same order as `filenames`.
+    """
+    filenames = list(filenames)
+    if not config:
+        config = SVGConfig()
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = min(workers, len(filenames))
+
+    if workers <= 1:
+        return [SVGDoc(f, anchor_x=anchor_x, anchor_y=anchor_y, config=config) for f in filenames]
+
+    prepare_pool()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        loaded = list(pool.map(_parse_in_worker,
+                             filenames,
+                             itertools.repeat(config),
+                             itertools.repeat(anchor_x),
+                             itertools.repeat(anchor_y)))
+
+    docs = []
+    for doc, shared_name in loaded:
+        doc._attach_geometry(shared_name)
+        # the callback isn't pickled, so it's set again where the document is uploaded
+        doc.config.timings_callback = config.timings_callback
+        doc.upload()
+        docs.append(doc)
+    return docs
+
+
+#: Executor used by load_async when none is given, created on first use
+_default_executor = None
+
+#: (parse future, result future) pairs whose parsing has finished
+_finished_parses = queue.Queue()
+
+
+def _get_default_executor():
+    global _default_executor
+    if _default_executor is None:
+        prepare_pool()
+        _default_executor = ProcessPoolExecutor()
+    return _default_executor
+
+
+def load_async(filename, anchor_x=0, anchor_y=0, config=None, executor=None):
+    """Starts loading a .svg or .svgz file in the background.
+
+    Parsing and tesselation run in `executor` (by default a shared process
+    pool). The GL upload has to happen on the GL thread, so it is done by the
+    next call to `poll_uploads` after parsing finishes.
+
+    Returns:
+        A concurrent.futures.Future which resolves to the uploaded SVGDoc.
+    """
+    if not config:
+        config = SVGConfig()
+
+    if not executor:
+        executor = _get_default_executor()
+
+    result = Future()
+    parse = executor.submit(_parse_in_worker, filename, config, anchor_x, anchor_y)
+    parse.add_done_callback(lambda f: _finished_parses.put((f, result, config.timings_callback)))
+    return result
+
+
+class UploadScheduler(object):
+    """Spreads the GL upload of documents over several frames.
+
+    Each call to `run` works through the upload steps of the queued documents
+    (see SVGDoc.upload_steps) until `budget_ms` milliseconds have been used. At
+    least one step runs per call, so uploads always make progress. Call it from
+    the GL thread, once per frame. Queued documents can be drawn meanwhile;
+    depending on `config.draw_partial_uploads` they draw their finished chunks
+    or nothing.
+    """
+
+    def __init__(self, budget_ms=4.0):
+        #: Milliseconds of upload work done per call to `run`
+        self.budget_ms = budget_ms
+        self._pending = collections.deque()
+
+    def __len__(self):
+        return len(self._pending)
+
+    def add(self, doc, on_done=None):
+        """Queues a parsed document for upload. `on_done(doc, error)` is called
+        once it is uploaded, with error set to the exception if the upload failed.
+        Without `on_done` the exception propagates out of `run`."""
+        self._pending.append((doc, doc.upload_steps(), on_done))
+
+    def run(self, budget_ms=None):
+        """Runs upload steps until the budget is used up or nothing is left.
+
+        Returns:
+            The number of documents whose upload finished.
+        """
+        if budget_ms is None:
+            budget_ms = self.budget_ms
+        deadline = time.perf_counter() + budget_ms / 1000.0
+
+        n_done = 0
+        ran = False
+        while self._pending and not (ran and time.perf_counter() >= deadline):
+            doc, steps, on_done = self._pending[0]
+            try:
+                next(steps)
+                ran = True
+            except StopIteration:
+                self._pending.popleft()
+                n_done += 1
+                if on_done:
+                    on_done(doc, None)
+            except Exception as ex:
+                self._pending.popleft()
+                n_done += 1
+                if not on_done:
+                    raise
+                on_done(doc, ex)
+        return n_done
+
+
+#: Scheduler which uploads the documents loaded with load_async
+upload_scheduler = UploadScheduler()
+
+
+def _resolve(result, doc, error):
+    if error is not None:
+        result.set_exception(error)
+    else:
+        result.set_result(doc)
+
+
+def poll_uploads(budget_ms=None):
+    """Uploads the documents started with `load_async` whose parsing has
+    finished, and resolves their futures. Call this from the GL thread,
+    for example once per frame.
+
+    Args:
+        `budget_ms`: float
+            If given, at most about this many milliseconds are spent uploading;
+            the rest carries over to the next call. By default every finished
+            document is uploaded completely.
+
+    Returns:
+        The number of futures resolved.
+    """
+    n_resolved = 0
+    while True:
+        try:
+            parse, result, timings_callback = _finished_parses.get_nowait()
+        except queue.Empty:
+            break
+
+        if not result.set_running_or_notify_cancel():
+            continue
+
+        try:
+            doc, shared_name = parse.result()
+            doc._attach_geometry(shared_name)
+            doc.config.timings_callback = timings_callback
+        except BaseException as ex:
+            result.set_exception(ex)
+            n_resolved += 1
+        else:
+            upload_scheduler.add(doc, lambda doc, error, result=result: _resolve(result, doc, error))
+
+    if budget_ms is None:
+        budget_ms = float('inf')
+    return n_resolved + upload_scheduler.run(budget_ms)
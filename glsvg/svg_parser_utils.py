@@ -1,10 +1,32 @@
 import re
+import gzip
+import functools
+from types import MappingProxyType
 from glsvg import svg_constants
 
+try:
+    from xml.etree.cElementTree import parse
+except:
+    from elementtree.ElementTree import parse
+
+#: Number of distinct strings remembered by each of the memoized parsers
+PARSE_CACHE_SIZE = 4096
+
 re_list_parser = re.compile("([A-Za-z]|-?[0-9]+\.?[0-9]*(?:e-?[0-9]*)?)")
 
 re_func_parser = re.compile('\w+\((?:\-?[0-9]+(?:\.[0-9]*)?\w*\s*)?(?:\s*,\s*\-?\s*[0-9]*(?:\.[0-9]+)?\w*\s*)*\)')
 
+def read_svg(filename):
+    """Reads a .svg or .svgz file and returns the root element of its XML tree"""
+    with open(filename, 'rb') as f:
+        is_gzipped = (f.read(3) == b'\x1f\x8b\x08')
+
+    if is_gzipped:  # gzip magic numbers
+        with gzip.open(filename, 'rb') as f:
+            return parse(f)._root
+    with open(filename, 'rb') as f:
+        return parse(f)._root
+
 def get_fns(string):
     string = string.strip()
     return re_func_parser.findall(string)
@@ -15,14 +37,17 @@ def parse_list(string):
 def parse_float_list(string):
     return [parse_float(x.strip()) for x in string.split(',')]
 
+@functools.lru_cache(maxsize=PARSE_CACHE_SIZE)
 def parse_style(string):
+    """Parses a style attribute into a read-only mapping. Memoized."""
     s_dict = {}
     for item in string.split(';'):
         if ':' in item:
             key, value = item.split(':')
             s_dict[key.strip()] = value.strip()
-    return s_dict
+    return MappingProxyType(s_dict)
 
+@functools.lru_cache(maxsize=PARSE_CACHE_SIZE)
 def parse_float(txt):
     #assume 90 dpi
     if txt.endswith('%'):
@@ -45,12 +70,15 @@ def parse_float(txt):
     else:
         return float(txt)
 
-def parse_transform(txt):
-    pass
-
 def parse_color(c, default=None):
+    """Parses a color into an (r, g, b, a) tuple, or returns the id of a
+    url(#id) reference. Memoized."""
     if not c:
         return default
+    return _parse_color(c)
+
+@functools.lru_cache(maxsize=PARSE_CACHE_SIZE)
+def _parse_color(c):
     if c == 'none':
         return None
 
@@ -64,7 +92,7 @@ def parse_color(c, default=None):
         end = c.index(')')
         parts = c[start+1:end].split(',')
         r, g, b = tuple(int(p.strip()) for p in parts)
-        return [r,g,b,255]
+        return (r, g, b, 255)
 
     if c[0] == '#': c = c[1:]
     if c.startswith('url(#'):
@@ -86,7 +114,7 @@ def parse_color(c, default=None):
             b = int(c[2], 16) * 17
         else:
             raise Exception("Incorrect length for color " + str(c) + " length " + str(len(c)))
-        return [r,g,b,a]
+        return (r, g, b, a)
     except Exception as ex:
         print('Exception parsing color ' + str(ex))
         return None
@@ -1,24 +1,30 @@
 import math
 import re
 import string
+from array import array
 
 from glsvg import graphics
+from glsvg import render_stats
 from glsvg import lines
 import traceback
 
 import OpenGL.GL as gl
 
-from .svg_parser_utils import parse_float, parse_list, get_fns
-from .svg_path_builder import SVGPathBuilder
+from .svg_parser_utils import parse_float, parse_list
+from .svg_path_builder import SVGPathBuilder, triangulate
+from .path_geometry import PathGeometry, geometry_key, cached_geometry, intern_geometry
 
 from .glutils import DisplayListGenerator
 from glsvg import svg_style
-from .vector_math import Matrix, BoundingBox, vec2
+from glsvg import svg_timing
+from glsvg import gpu_timing
+from .vector_math import Matrix, vec2, vertex_pairs, parse_transform
 from .svg_constants import XMLNS
 from .render_target import CanvasManager
 
 
 class SVGContainer(object):
+    __slots__ = ('parent', 'children', 'is_def')
 
     def __init__(self, parent):
 
@@ -36,6 +42,8 @@ class SVGContainer(object):
 
 
 class SVGRenderableElement(SVGContainer):
+    __slots__ = ('id', 'svg', 'is_pattern', 'is_pattern_part', 'style', 'title', 'description',
+                 '_transform', '_absolute_transform', 'tag_type')
 
     def __init__(self, svg, element, parent):
 
@@ -49,16 +57,20 @@ class SVGRenderableElement(SVGContainer):
         #: Is this element a pattern?
         self.is_pattern = element.tag.endswith('pattern')
 
+        #: Is this element a pattern, or inside one?
+        self.is_pattern_part = self.is_pattern or getattr(parent, 'is_pattern_part', False)
+
         #: Is this element a definition?
         self.is_def = False
 
         if parent:
             self.is_def = parent.is_def
 
-        #: The element style (possibly with inherited traits from parent style)
-        self.style = svg_style.SVGStyle(
-            parent.style if isinstance(parent, SVGRenderableElement) else None)
-        self.style.from_element(element)
+        #: The element style (possibly with inherited traits from parent style). Interned,
+        #: so elements with equal styles share the same immutable SVGStyle.
+        with svg_timing.phase('style'):
+            self.style = svg_style.resolve_style(
+                element, parent.style if isinstance(parent, SVGRenderableElement) else None)
 
         #: Optional element title
         self.title = element.findtext('{%s}title' % (XMLNS,))
@@ -66,18 +78,8 @@ class SVGRenderableElement(SVGContainer):
         #: Optional element description. Useful for embedding metadata.
         self.description = element.findtext('{%s}desc' % (XMLNS,))
 
-        #construct a matrix for each transform
-        t_acc = Matrix.identity()
-
-        transform_str = element.get('transform', None)
-        if transform_str:
-            transforms = get_fns(transform_str)
-
-            for tstring in transforms:
-                t_acc = t_acc * Matrix(tstring)
-
-        #: Element transforms
-        self.transform = t_acc
+        self._transform = parse_transform(element.get('transform', ''))
+        self._absolute_transform = None
 
         #: Children elements
         self.children = []
@@ -89,39 +91,93 @@ class SVGRenderableElement(SVGContainer):
         """Add a child to this element class (usually children register with parent)"""
         self.children.append(child)
 
-    @property
-    def is_pattern_part(self):
-        part = self
-        while part:
-            if isinstance(part, SVGRenderableElement) and part.is_pattern:
-                return True
-            part = part.parent
-        return False
+    def _get_transform(self):
+        return self._transform
+
+    def _set_transform(self, transform):
+        self._transform = transform
+
+        # cached absolute transforms below this element are now stale. A child is
+        # only cached if its parent is, so stop at the first uncached element.
+        stack = [self]
+        while stack:
+            element = stack.pop()
+            if getattr(element, '_absolute_transform', None) is not None:
+                element._absolute_transform = None
+                stack.extend(element.children)
+
+    #: Element transforms
+    transform = property(_get_transform, _set_transform)
 
     @property
     def absolute_transform(self):
-        """Return this transform, multiplied by chain of parents"""
-        if self.parent:
-            return self.parent.absolute_transform * self.transform
-        return self.transform
+        """Return this transform, multiplied by chain of parents. Computed once from
+        the parent's cached matrix, until a transform in the chain changes."""
+        if self._absolute_transform is None:
+            # walk up to the nearest cached ancestor, then fill in the chain below it
+            chain = []
+            element = self
+            while isinstance(element, SVGRenderableElement) and element._absolute_transform is None:
+                chain.append(element)
+                element = element.parent
+
+            matrix = element._absolute_transform if isinstance(element, SVGRenderableElement) else None
+            for element in reversed(chain):
+                matrix = element._transform if matrix is None else matrix * element._transform
+                element._absolute_transform = matrix
+        return self._absolute_transform
 
     def on_render(self):
         pass
 
+    def _expand(self, matrix, draw_list, stack):
+        """Adds what this element draws itself to `draw_list` and pushes its
+        children onto `stack`, both under `matrix`, the transform of its parent."""
+        matrix = matrix * self._transform
+        if type(self).on_render is not SVGRenderableElement.on_render:
+            draw_list.append((matrix, self))
+        stack.extend((matrix, c) for c in reversed(self.children))
+
+    def draw_list(self, matrix=None):
+        """Returns what this element and its descendants draw, in order, as a flat
+        list of (matrix, element) pairs. Each element's `on_render` draws it with
+        its matrix multiplied onto the current one, or as it is if the matrix is
+        None. Built with an explicit stack, so deep nesting doesn't hit the
+        recursion limit."""
+        return flatten([self], matrix or Matrix.identity())
+
     def render(self):
-        #with CanvasManager.inst().temp():
-            with self.transform:
-                self.on_render()
+        render_draw_list(self.draw_list())
 
-                for c in self.children:
-                    c.render()
+
+def flatten(elements, matrix):
+    """Returns the draw list of `elements` under `matrix`. See SVGRenderableElement.draw_list."""
+    draw_list = []
+    stack = [(matrix, e) for e in reversed(elements)]
+    while stack:
+        matrix, element = stack.pop()
+        element._expand(matrix, draw_list, stack)
+    return draw_list
+
+
+def render_draw_list(draw_list):
+    """Renders a draw list immediately (no display list). Elements whose matrix
+    is None have their transform baked into their vertices."""
+    for matrix, element in draw_list:
+        if matrix is None:
+            element.on_render()
+        else:
+            with matrix:
+                element.on_render()
 
 
 class SVGGroup(SVGRenderableElement):
-    pass
+    __slots__ = ()
 
 
 class SVGMarker(SVGRenderableElement):
+    __slots__ = ('units', 'marker_width', 'marker_height', 'orient', 'ref_x', 'ref_y',
+                 'vb_x', 'vb_y', 'vb_w', 'vb_h')
 
     def __init__(self, svg, element, parent):
         SVGRenderableElement.__init__(self, svg, element, parent)
@@ -150,6 +206,7 @@ XLINK_NS = "{http://www.w3.org/1999/xlink}"
 
 class SVGUse(SVGRenderableElement):
     """Represents an SVG "use" directive, to reuse a predefined path"""
+    __slots__ = ('target', 'x', 'y')
 
     def __init__(self, svg, element, parent):
         SVGRenderableElement.__init__(self, svg, element, parent)
@@ -164,14 +221,13 @@ class SVGUse(SVGRenderableElement):
         if self.target:
             self.target = self.target[1:]
 
-    def render(self):
-        with self.transform:
-            defn = self.svg.defs[self.target]
-            defn.render()
+    def _expand(self, matrix, draw_list, stack):
+        stack.append((matrix * self._transform, self.svg.defs[self.target]))
 
 
 class SVGDefs(SVGRenderableElement):
     """Represents an SVG "defs" directive, to define paths without drawing them"""
+    __slots__ = ()
 
     def __init__(self, svg, element, parent):
         SVGRenderableElement.__init__(self, svg, element, parent)
@@ -184,19 +240,14 @@ class SVGDefs(SVGRenderableElement):
         self.children.append(child)
 
 
-def flatten_list(l):
-    new_list = []
-    for x in l:
-        new_list.extend(x)
-    return new_list
-
-
 class SVGPath(SVGRenderableElement):
     """
     Represents a single SVG path. This is usually
     a distinct shape with a fill pattern,
     an outline, or both.
     """
+    __slots__ = ('config', 'marker_start', 'marker_mid', 'marker_end', 'geometry', 'display_list',
+                 'is_baked')
 
     def __init__(self, svg, element, parent):
 
@@ -210,18 +261,6 @@ class SVGPath(SVGRenderableElement):
         else:
             self.config = svg.config.super_detailed()
 
-        #: The actual path elements, as a list of vertices
-        self.outlines = None
-
-        #: The triangles that comprise the inner fill
-        self.triangles = None
-
-        #: The base shape. Possible values: path, rect, circle, ellipse, line, polygon, polyline
-        self.shape = None
-
-        #: The bounding box
-        self._bounding_box = None
-
         self.marker_start = element.get('marker-start', None)
         self.marker_mid = element.get('marker-mid', None)
         self.marker_end = element.get('marker-end', None)
@@ -230,92 +269,143 @@ class SVGPath(SVGRenderableElement):
         if self.marker_mid: self.marker_mid = self.marker_mid[5:-1]
         if self.marker_end: self.marker_end = self.marker_end[5:-1]
 
-        path_builder = SVGPathBuilder()
+        fill_rule = self.style.fill_rule if self.style.fill else None
+        stroke_style = self.style if self.style.stroke else None
+        key = geometry_key(element, self.config, fill_rule, stroke_style)
+
+        #: The outlines and triangles, shared with every path of the same shape
+        self.geometry = None
+        if self.config.deduplicate_geometry:
+            self.geometry = cached_geometry(key)
+
+        if self.geometry is None:
+            path_builder = SVGPathBuilder()
+
+            with svg_timing.phase('flatten'):
+                path_builder.read_xml_svg_element(
+                                self,
+                                element,
+                                self.config,
+                                triangulate=False)
+
+            self.geometry = PathGeometry(key,
+                                         path_builder.shape,
+                                         path_builder.shape_attrs,
+                                         path_builder.path,
+                                         path_builder.fill_rule,
+                                         stroke_style)
+            if self.config.deduplicate_geometry:
+                intern_geometry(self.geometry)
 
-        path_builder.read_xml_svg_element(
-                        self,
-                        element,
-                        self.config)
+        self.display_list = None
 
-        self.outlines = path_builder.path
+        #: Whether the absolute transform has been applied to the geometry, see
+        #: `SVGConfig.bake_transforms`
+        self.is_baked = False
 
-        self.triangles = path_builder.polygon
+    @property
+    def outlines(self):
+        """The actual path elements, as a list of vertices"""
+        return self.geometry.outlines
 
-        self.display_list = None
+    @property
+    def triangles(self):
+        """The triangles that comprise the inner fill, as a flat array of x, y coordinates.
+        Expanded from the indexed `PathGeometry.fill` on each access."""
+        return self.geometry.triangles
 
-    def _render_stroke(self):
-        stroke = self.style.stroke
-        stroke_width = self.style.stroke_width
+    @property
+    def stroke_geometry(self):
+        """The stroke triangles, as a list of (outline index, [(GL primitive, vertices)])"""
+        return self.geometry.stroke_geometry
 
-        is_miter = self.style.stroke_linejoin == 'miter'
+    @property
+    def shape(self):
+        """The base shape. Possible values: path, rect, circle, ellipse, line, polygon, polyline"""
+        return self.geometry.shape
+
+    @property
+    def shape_attrs(self):
+        """The numeric attributes of the base shape, such as cx, cy and r for a circle"""
+        return self.geometry.shape_attrs
 
-        miter_limit = self.style.stroke_miterlimit if is_miter else 0
+    @property
+    def fill_rule(self):
+        """The rule used to tesselate the fill, or None when the path has no fill"""
+        return self.geometry.fill_rule
+
+    def can_bake_transform(self, dynamic_ids=()):
+        """Whether the path's transform can be applied to its vertices: it has no
+        gradient or pattern paint, no markers, isn't a definition or pattern content,
+        and neither it nor an ancestor has an id in `dynamic_ids`."""
+        if self.is_def or self.is_pattern_part:
+            return False
+        if isinstance(self.style.fill, str) or isinstance(self.style.stroke, str):
+            return False
+        if self.marker_start or self.marker_mid or self.marker_end:
+            return False
+
+        element = self
+        while isinstance(element, SVGRenderableElement):
+            if element.id and element.id in dynamic_ids:
+                return False
+            element = element.parent
+        return True
+
+    def bake_transform(self, matrix):
+        """Replaces the geometry with a copy transformed by `matrix`, the path's
+        matrix in the document, so the path is drawn without a transform"""
+        self.geometry = self.geometry.transformed(matrix, self.config.deduplicate_geometry)
+        self.is_baked = True
+
+    def _expand(self, matrix, draw_list, stack):
+        if not self.is_baked:
+            SVGRenderableElement._expand(self, matrix, draw_list, stack)
+            return
+        draw_list.append((None, self))
+        matrix = matrix * self._transform
+        stack.extend((matrix, c) for c in reversed(self.children))
+
+    def compile_geometry(self):
+        """Compiles the parts of the shared geometry this path draws with a single
+        color. Called by SVGDoc.upload_steps before its own display lists."""
+        has_markers = self.marker_start or self.marker_end
+        self.geometry.compile(fill=not isinstance(self.style.fill, str),
+                              stroke=not isinstance(self.style.stroke, str) and not has_markers)
+
+    def _render_stroke(self):
+        stroke = self.style.stroke
 
         for loop in self.outlines:
             self.svg.n_lines += len(loop) - 1
-            loop_plus = []
 
-            for i in range(len(loop) - 1):
-                loop_plus += [loop[i], loop[i+1]]
+        if not isinstance(stroke, str) and not (self.marker_start or self.marker_end):
+            gl.glColor4ub(*stroke)
+            if self.geometry.draw_stroke():
+                return
 
+        for loop_index, primitives in self.stroke_geometry:
+            loop = self.outlines[loop_index]
             if isinstance(stroke, str):
                 g = self.svg._gradients[stroke]
-                strokes = [g.sample(x, self) for x in loop_plus]
+                with svg_timing.phase('gradient'):
+                    color = g.sample(loop[0], self)
             else:
-                strokes = [stroke for x in loop_plus]
-
-            if len(loop_plus) == 0:
-                continue
-
-            if len(self.style.stroke_dasharray):
-                ls = lines.split_line_by_pattern(loop_plus, self.style.stroke_dasharray)
-
-                if ls[0][0] == ls[-1][-1]:
-                    #if the last line end point equals the first line start point,
-                    #this is a "closed" line, so combine the first and the last line
-                    combined_line = ls[-1] + ls[0]
-                    ls[0] = combined_line
-                    del ls[-1]
-
-                for l in ls:
-                    lines.draw_polyline(
-                        l,
-                        stroke_width,
-                        color=strokes[0],
-                        line_cap=self.style.stroke_linecap,
-                        join_type=self.style.stroke_linejoin,
-                        miter_limit=miter_limit)
-
-                if self.marker_start:
-                    end_point = vec2(loop_plus[0])
-                    almost_end_point = vec2(loop_plus[1])
-                    marker = self.svg.defs[self.marker_start]
-                    self._render_marker(end_point, almost_end_point, marker, True)
-                if self.marker_end:
-                    end_point = vec2(loop_plus[-1])
-                    almost_end_point = vec2(loop_plus[-2])
-                    marker = self.svg.defs[self.marker_end]
-                    self._render_marker(end_point, almost_end_point, marker)
-
-            else:
-                lines.draw_polyline(
-                    loop_plus,
-                    stroke_width,
-                    color=strokes[0],
-                    line_cap=self.style.stroke_linecap,
-                    join_type=self.style.stroke_linejoin,
-                    miter_limit=miter_limit)
-
-                if self.marker_start:
-                    end_point = vec2(loop_plus[0])
-                    almost_end_point = vec2(loop_plus[1])
-                    marker = self.svg.defs[self.marker_start]
-                    self._render_marker(end_point, almost_end_point, marker, True)
-                if self.marker_end:
-                    end_point = vec2(loop_plus[-1])
-                    almost_end_point = vec2(loop_plus[-2])
-                    marker = self.svg.defs[self.marker_end]
-                    self._render_marker(end_point, almost_end_point, marker)
+                color = stroke
+
+            for mode, vertices in primitives:
+                graphics.draw_primitive(mode, self.geometry.positions(vertices), color)
+
+            if self.marker_start:
+                end_point = vec2(loop[0])
+                almost_end_point = vec2(loop[1])
+                marker = self.svg.defs[self.marker_start]
+                self._render_marker(end_point, almost_end_point, marker, True)
+            if self.marker_end:
+                end_point = vec2(loop[-1])
+                almost_end_point = vec2(loop[-2])
+                marker = self.svg.defs[self.marker_end]
+                self._render_marker(end_point, almost_end_point, marker)
 
     def _render_marker(self, a, b, marker, reverse=False):
         if marker.orient == 'auto':
@@ -339,24 +429,26 @@ class SVGPath(SVGRenderableElement):
 
     def _render_gradient_fill(self):
         fill = self.style.fill
-        tris = self.triangles
-        self.svg.n_tris += len(tris) / 3
-        g = None
-        if isinstance(fill, str):
-            g = self.svg._gradients[fill]
-            fills = [g.sample(x, self) for x in tris]
-        else:
-            fills = [fill] * len(tris)  # for x in tris]
-
-        if g:
+        vertices, indices = self.geometry.fill
+        self.svg.n_tris += self.geometry.n_fill_triangles
+
+        # solid fills are drawn with a single color rather than one per vertex
+        if not isinstance(fill, str):
+            gl.glColor4ub(*fill)
+            if not self.geometry.draw_fill():
+                graphics.draw_indexed(gl.GL_TRIANGLES, self.geometry.positions(vertices), indices)
+            return
+
+        vertices = self.geometry.positions(vertices)
+        g = self.svg._gradients[fill]
+        fills = array('B')
+        with svg_timing.phase('gradient'):
+            for x in vertex_pairs(vertices):
+                fills.extend(g.sample(x, self))
+
+        with gpu_timing.timed_pass('gradient'):
             g.apply_shader(self, self.transform, self.style.opacity * self.style.fill_opacity)
-
-        graphics.draw_colored_triangles(
-            flatten_list(tris),
-            flatten_list(fills)
-        )
-
-        if g:
+            graphics.draw_colored_triangles(vertices, fills, indices)
             g.unapply_shader()
 
     def bounding_box(self):
@@ -365,19 +457,12 @@ class SVGPath(SVGRenderableElement):
 
         (min_x, min_y, max_x, max_y)
         '''
-        if not self._bounding_box:
-            self._bounding_box = BoundingBox()
-
-            if self.triangles:
-                self._bounding_box.expand(self.triangles)
-            if self.outlines:
-                for o in self.outlines:
-                    self._bounding_box.expand(o)
-        return self._bounding_box.extents()
+        return self.geometry.bounding_box()
 
     def _render_pattern_fill(self):
         fill = self.style.fill
-        tris = self.triangles
+        vertices, indices = self.geometry.fill
+        vertices = self.geometry.positions(vertices)
         pattern = None
         if fill in self.svg.patterns:
             pattern = self.svg.patterns[fill]
@@ -387,14 +472,11 @@ class SVGPath(SVGRenderableElement):
 
         tex_coords = []
 
-        for vtx in tris:
+        for vtx in vertex_pairs(vertices):
             tex_coords.append((vtx[0]-min_x)/(max_x-min_x)/pattern.width)
             tex_coords.append((vtx[1]-min_y)/(max_y-min_y)/pattern.width)
 
-        graphics.draw_textured_triangles(
-            flatten_list(tris),
-            tex_coords
-        )
+        graphics.draw_textured_triangles(vertices, tex_coords, indices)
 
         if pattern:
             pattern.unbind_texture()
@@ -406,18 +488,22 @@ class SVGPath(SVGRenderableElement):
         gl.glClear(gl.GL_DEPTH_BUFFER_BIT)
 
         gl.glEnable(gl.GL_DEPTH_TEST)
+        render_stats.count_state_changes(2)
 
-        if self.style.stroke and self.outlines:
-            self._render_stroke()
+        if self.stroke_geometry:
+            with gpu_timing.timed_pass('stroke'):
+                self._render_stroke()
 
         gl.glPushMatrix()
         gl.glTranslatef(0, 0, -0.1)
-        if self.triangles:
+        if self.geometry.fill_indices:
             try:
                 if isinstance(self.style.fill, str) and self.style.fill in self.svg.patterns:
-                    self._render_pattern_fill()
+                    with gpu_timing.timed_pass('pattern'):
+                        self._render_pattern_fill()
                 else:
-                    self._render_gradient_fill()
+                    with gpu_timing.timed_pass('fill'):
+                        self._render_gradient_fill()
             except Exception as exception:
                 traceback.print_exc(exception)
         gl.glPopMatrix()
@@ -431,6 +517,64 @@ class SVGPath(SVGRenderableElement):
         )
 
 
+def build_stroke(outlines, style):
+    """Splits the outlines into dashes and builds the triangles that stroke them"""
+    stroke_width = style.stroke_width
+
+    is_miter = style.stroke_linejoin == 'miter'
+
+    miter_limit = style.stroke_miterlimit if is_miter else 0
+
+    stroke_geometry = []
+    for loop_index, loop in enumerate(outlines):
+        loop_plus = []
+
+        for i in range(len(loop) - 1):
+            loop_plus += [loop[i], loop[i+1]]
+
+        if len(loop_plus) == 0:
+            continue
+
+        if len(style.stroke_dasharray):
+            ls = lines.split_line_by_pattern(loop_plus, style.stroke_dasharray)
+
+            if ls[0][0] == ls[-1][-1]:
+                #if the last line end point equals the first line start point,
+                #this is a "closed" line, so combine the first and the last line
+                combined_line = ls[-1] + ls[0]
+                ls[0] = combined_line
+                del ls[-1]
+        else:
+            ls = [loop_plus]
+
+        primitives = []
+        for l in ls:
+            primitives.extend(lines.polyline_geometry(
+                l,
+                stroke_width,
+                line_cap=style.stroke_linecap,
+                join_type=style.stroke_linejoin,
+                miter_limit=miter_limit))
+
+        stroke_geometry.append((loop_index, primitives))
+    return stroke_geometry
+
+
+def build_path_geometry(job):
+    """Builds the fill, as (vertices, indices), and the stroke triangles for an
+    PathGeometry.job(). Needs no GL context, so it can run in a worker process."""
+    outlines, shape, fill_rule, stroke_style = job
+    fill = None
+    stroke_geometry = None
+    if fill_rule and outlines:
+        with svg_timing.phase('tessellate'):
+            fill = triangulate(outlines, fill_rule, shape)
+    if stroke_style and outlines:
+        with svg_timing.phase('stroke'):
+            stroke_geometry = build_stroke(outlines, stroke_style)
+    return fill, stroke_geometry
+
+
 class SVGViewBox:
 
     def __init__(self, x, y, w, h):
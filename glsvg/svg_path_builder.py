@@ -1,14 +1,16 @@
 import math
 import re
 import string
+from array import array
 
 import OpenGL.GL as gl
 import OpenGL.GLU as glu
 from .svg_constants import *
 from .svg_parser_utils import *
-from .vector_math import Matrix
+from .vector_math import Matrix, simplify_polyline
 from glsvg import svg_style
 from glsvg import svg_constants
+from glsvg import svg_timing
 
 POINT_RE = re.compile("(-?[0-9]+\.?[0-9]*(?:e-?[0-9]*)?)")
 PATH_CMD_RE = re.compile("([A-Za-z]|-?[0-9]+\.?[0-9]*(?:e-?[0-9]*)?)")
@@ -24,13 +26,19 @@ class SVGPathBuilder(object):
         self.ctx_path = []
         self.ctx_loop = []
         self.shape = None
+        self.shape_attrs = {}
         self.fill_rule = fill_rule
         self.n_bezier_points = svg_constants.BEZIER_POINTS
         self.n_circle_points = svg_constants.CIRCLE_POINTS
         self.tolerance = svg_constants.TOLERANCE
+        self.simplify_tolerance = 0
         self.fill_rule = fill_rule
+        self.triangulate = True
 
-    def read_xml_svg_element(self, path, element, config):
+    def read_xml_svg_element(self, path, element, config, triangulate=True):
+        """Flattens the shape described by `element` into `self.path`. Unless
+        `triangulate` is False, also tesselates its fill into `self.polygon`, as
+        (vertices, indices) like `triangulate`."""
         self._bezier_coefficients = []
         self.cursor_x = 0
         self.cursor_y = 0
@@ -38,19 +46,23 @@ class SVGPathBuilder(object):
         self.ctx_path = []
         self.ctx_loop = []
         self.shape = None
+        self.shape_attrs = {}
         self.n_bezier_points = config.bezier_points
         self.n_circle_points = config.circle_points
         self.tolerance = config.tolerance
+        self.simplify_tolerance = config.simplify_tolerance
+        self.triangulate = triangulate
+        self.polygon = None
         self.fill_rule = None
         if path.style.fill:
             self.fill_rule = path.style.fill_rule
 
         e = element
         if e.tag.endswith('path'):
-            self.shape = path.shape = 'path'
+            self.shape = 'path'
             self._read_path_commands(e)
         elif e.tag.endswith('rect'):
-            self.shape = path.shape = 'rect'
+            self.shape = 'rect'
             x = parse_float(e.get('x', '0'))
             y = parse_float(e.get('y', '0'))
             h = parse_float(e.get('height'))
@@ -58,7 +70,7 @@ class SVGPathBuilder(object):
 
             rx = parse_float(e.get('rx', '0'))
             ry = parse_float(e.get('ry', str(rx)))
-            path.x, path.y, path.w, path.h = x, y, w, h
+            self.shape_attrs = {'x': x, 'y': y, 'w': w, 'h': h}
 
             if rx == 0 and ry == 0:
                 # no rounding, so just draw a simple rectangle
@@ -83,9 +95,9 @@ class SVGPathBuilder(object):
 
         elif e.tag.endswith('polyline') or e.tag.endswith('polygon'):
             if e.tag.endswith('polyline'):
-                self.shape = path.shape = 'polyline'
+                self.shape = 'polyline'
             else:
-                self.shape = path.shape = 'polygon'
+                self.shape = 'polygon'
             path_data = e.get('points')
             path_data = POINT_RE.findall(path_data)
 
@@ -97,33 +109,33 @@ class SVGPathBuilder(object):
                 self.close_path()
             self.end_path()
         elif e.tag.endswith('line'):
-            self.shape = path.shape = 'line'
+            self.shape = 'line'
             x1 = float(e.get('x1'))
             y1 = float(e.get('y1'))
             x2 = float(e.get('x2'))
             y2 = float(e.get('y2'))
-            path.x1, path.x1, path.x2, path.y2 = x1, y1, x2, y2
+            self.shape_attrs = {'x1': x1, 'y1': y1, 'x2': x2, 'y2': y2}
             self.set_cursor_position(x1, y1)
             self.line_to(x2, y2)
             self.end_path()
         elif e.tag.endswith('circle'):
-            self.shape = path.shape = 'circle'
+            self.shape = 'circle'
             cx = float(e.get('cx', 0))
             cy = float(e.get('cy', 0))
             r = float(e.get('r'))
-            path.cx, path.cy, path.r = cx, cy, r
+            self.shape_attrs = {'cx': cx, 'cy': cy, 'r': r}
             for i in range(config.circle_points):
                 theta = 2 * i * math.pi / config.circle_points
                 self.line_to(cx + r * math.cos(theta), cy + r * math.sin(theta))
             self.close_path()
             self.end_path()
         elif e.tag.endswith('ellipse'):
-            self.shape = path.shape = 'ellipse'
+            self.shape = 'ellipse'
             cx = float(e.get('cx', 0))
             cy = float(e.get('cy', 0))
             rx = float(e.get('rx'))
             ry = float(e.get('ry'))
-            path.cx, path.cy, path.rx, path.ry = cx, cy, rx, ry
+            self.shape_attrs = {'cx': cx, 'cy': cy, 'rx': rx, 'ry': ry}
             for i in range(config.circle_points):
                 theta = 2 * i * math.pi / config.circle_points
                 self.line_to(cx + rx * math.cos(theta), cy + ry * math.sin(theta))
@@ -142,7 +154,8 @@ class SVGPathBuilder(object):
 
     def _read_path_commands(self, e):
         path_data = e.get('d', '')
-        path_data = PATH_CMD_RE.findall(path_data)
+        with svg_timing.phase('tokenize'):
+            path_data = PATH_CMD_RE.findall(path_data)
 
         def next_point():
             return float(path_data.pop(0)), float(path_data.pop(0))
@@ -246,41 +259,9 @@ class SVGPathBuilder(object):
         self.end_path()
 
     def arc_to(self, rx, ry, phi, large_arc, sweep, x, y):
-        # This function is made out of magical fairy dust
-        # http://www.w3.org/TR/2003/REC-SVG11-20030114/implnote.html#ArcImplementationNotes
-        x1 = self.cursor_x
-        y1 = self.cursor_y
-        x2 = x
-        y2 = y
+        cx, cy, psi, delta = arc_parameters(self.cursor_x, self.cursor_y, rx, ry, phi, large_arc, sweep, x, y)
         cp = math.cos(phi)
         sp = math.sin(phi)
-        dx = .5 * (x1 - x2)
-        dy = .5 * (y1 - y2)
-        x_ = cp * dx + sp * dy
-        y_ = -sp * dx + cp * dy
-        r2 = (((rx * ry) ** 2 - (rx * y_) ** 2 - (ry * x_) ** 2) /
-              ((rx * y_) ** 2 + (ry * x_) ** 2))
-        if r2 < 0: r2 = 0
-        r = math.sqrt(r2)
-        if large_arc == sweep:
-            r = -r
-        cx_ = r * rx * y_ / ry
-        cy_ = -r * ry * x_ / rx
-        cx = cp * cx_ - sp * cy_ + .5 * (x1 + x2)
-        cy = sp * cx_ + cp * cy_ + .5 * (y1 + y2)
-
-        def angle(u, v):
-            a = math.acos((u[0] * v[0] + u[1] * v[1]) / math.sqrt((u[0] ** 2 + u[1] ** 2) * (v[0] ** 2 + v[1] ** 2)))
-            sgn = 1 if u[0] * v[1] > u[1] * v[0] else -1
-            return sgn * a
-
-        psi = angle((1, 0), ((x_ - cx_) / rx, (y_ - cy_) / ry))
-        delta = angle(((x_ - cx_) / rx, (y_ - cy_) / ry),
-                      ((-x_ - cx_) / rx, (-y_ - cy_) / ry))
-        if sweep and delta < 0:
-            delta += math.pi * 2
-        if not sweep and delta > 0:
-            delta -= math.pi * 2
         n_points = max(int(abs(self.n_circle_points * delta / (2 * math.pi))), 1)
 
         for i in range(n_points + 1):
@@ -342,10 +323,16 @@ class SVGPathBuilder(object):
                 for pt in orig_loop:
                     if (pt[0] - loop[-1][0]) ** 2 + (pt[1] - loop[-1][1])**2 > self.tolerance:
                         loop.append(pt)
+                if self.simplify_tolerance:
+                    loop = simplify_polyline(loop, self.simplify_tolerance)
                 path.append(loop)
 
             self.path = path
-            self.polygon = self._triangulate(path, self.fill_rule) if self.fill_rule else None
+            if self.fill_rule and self.triangulate:
+                with svg_timing.phase('tessellate'):
+                    self.polygon = self._triangulate(path, self.fill_rule)
+            else:
+                self.polygon = None
         self.ctx_path = []
 
         return self.path, self.polygon
@@ -365,9 +352,19 @@ class SVGPathBuilder(object):
                 glu.gluTessCallback(tess, which, func)
             return set_call
 
+        # vertices are welded: each distinct point is stored once, and the
+        # triangles refer to it by index
+        vertex_indices = {}
+        vertices = array('f')
+
         @set_tess_callback(glu.GLU_TESS_VERTEX)
         def vertex_callback(vertex):
-            self.ctx_curr_shape.append(list(vertex[0:2]))
+            point = (vertex[0], vertex[1])
+            index = vertex_indices.get(point)
+            if index is None:
+                index = vertex_indices[point] = len(vertex_indices)
+                vertices.extend(point)
+            self.ctx_curr_shape.append(index)
 
         @set_tess_callback(glu.GLU_TESS_BEGIN)
         def begin_callback(which):
@@ -434,10 +431,61 @@ class SVGPathBuilder(object):
                 glu.gluTessVertex(tess, v_data, v_data)
             glu.gluTessEndContour(tess)
         glu.gluTessEndPolygon(tess)
-        return t_list
+        return vertices, array(index_typecode(len(vertices) // 2), t_list)
 
     def _warn(self, message):
         print("Warning: SVG Parser - %s" % (message,))
 
 
+def arc_parameters(x1, y1, rx, ry, phi, large_arc, sweep, x2, y2):
+    """Converts an SVG arc from (x1, y1) to (x2, y2) to center parameterization.
+    Returns (cx, cy, psi, delta): the center, the start angle and the sweep."""
+    # This function is made out of magical fairy dust
+    # http://www.w3.org/TR/2003/REC-SVG11-20030114/implnote.html#ArcImplementationNotes
+    cp = math.cos(phi)
+    sp = math.sin(phi)
+    dx = .5 * (x1 - x2)
+    dy = .5 * (y1 - y2)
+    x_ = cp * dx + sp * dy
+    y_ = -sp * dx + cp * dy
+    r2 = (((rx * ry) ** 2 - (rx * y_) ** 2 - (ry * x_) ** 2) /
+          ((rx * y_) ** 2 + (ry * x_) ** 2))
+    if r2 < 0: r2 = 0
+    r = math.sqrt(r2)
+    if large_arc == sweep:
+        r = -r
+    cx_ = r * rx * y_ / ry
+    cy_ = -r * ry * x_ / rx
+    cx = cp * cx_ - sp * cy_ + .5 * (x1 + x2)
+    cy = sp * cx_ + cp * cy_ + .5 * (y1 + y2)
+
+    def angle(u, v):
+        a = math.acos((u[0] * v[0] + u[1] * v[1]) / math.sqrt((u[0] ** 2 + u[1] ** 2) * (v[0] ** 2 + v[1] ** 2)))
+        sgn = 1 if u[0] * v[1] > u[1] * v[0] else -1
+        return sgn * a
+
+    psi = angle((1, 0), ((x_ - cx_) / rx, (y_ - cy_) / ry))
+    delta = angle(((x_ - cx_) / rx, (y_ - cy_) / ry),
+                  ((-x_ - cx_) / rx, (-y_ - cy_) / ry))
+    if sweep and delta < 0:
+        delta += math.pi * 2
+    if not sweep and delta > 0:
+        delta -= math.pi * 2
+    return cx, cy, psi, delta
+
+
+def index_typecode(n_vertices):
+    """The array typecode of the smallest index type that can address `n_vertices`"""
+    return 'H' if n_vertices <= 0x10000 else 'I'
+
+
+def triangulate(looplist, fill_rule, shape=None):
+    """Tesselates already flattened loops into (vertices, indices): a flat array of
+    the distinct x, y vertices and an array of three vertex indices per triangle.
+    Uses only the GLU tesselator, so it needs no GL context."""
+    builder = SVGPathBuilder(fill_rule)
+    builder.shape = shape
+    return builder._triangulate(looplist, fill_rule)
+
+
 
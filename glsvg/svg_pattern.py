@@ -3,13 +3,18 @@ import OpenGL.GL as gl
 from .glutils import ViewportAs
 
 from glsvg import render_target
+from glsvg import svg_timing
+from glsvg import gpu_timing
 
 from .svg_parser_utils import *
 from .svg_constants import *
-from .svg_path import SVGRenderableElement
+from .vector_math import Matrix
+from .svg_path import SVGRenderableElement, flatten, render_draw_list
 
 
 class SVGPattern(SVGRenderableElement):
+    __slots__ = ('units', 'x', 'y', 'width', 'height', 'render_texture')
+
     def __init__(self, svg, element, parent):
         SVGRenderableElement.__init__(self, svg, element, parent)
 
@@ -19,8 +24,9 @@ class SVGPattern(SVGRenderableElement):
         self.y = parse_float(element.get('y', '0.0'))
         self.width = parse_float(element.get('width', '1.0'))
         self.height = parse_float(element.get('height', '1.0'))
+
+        #: Created on first render, so patterns can be parsed without a GL context
         self.render_texture = None
-        self.render_texture = render_target.RenderTarget(PATTERN_TEX_SIZE, PATTERN_TEX_SIZE)
 
     def bind_texture(self):
         if not self.render_texture:
@@ -32,6 +38,11 @@ class SVGPattern(SVGRenderableElement):
             return
         self.render_texture.texture.unbind()
 
+    def release(self):
+        if self.render_texture:
+            self.render_texture.delete()
+            self.render_texture = None
+
     def extents(self):
         min_x, min_y, max_x, max_y = 0, 0, 1, 1
 
@@ -44,15 +55,25 @@ class SVGPattern(SVGRenderableElement):
 
         return min_x, min_y, max_x, max_y
 
-    def render(self):
+    def _expand(self, matrix, draw_list, stack):
+        # the pattern draws its children into its texture, not in place
+        draw_list.append((matrix, self))
+
+    def on_render(self):
+        with svg_timing.phase('pattern'):
+            self._render_texture()
+
+    def _render_texture(self):
         #setup projection matrix..
         min_x, min_y, max_x, max_y = self.extents()
 
-        with self.render_texture:
+        if not self.render_texture:
+            self.render_texture = render_target.RenderTarget(PATTERN_TEX_SIZE, PATTERN_TEX_SIZE)
+
+        with self.render_texture, gpu_timing.timed_pass('render_target'):
             with ViewportAs(min_x * self.x, min_y * self.y, max_x * self.width, max_y * self.height, PATTERN_TEX_SIZE,
                             PATTERN_TEX_SIZE):
                 gl.glClearColor(0.0, 0.5, 1.0, 1.0)
                 gl.glClear(gl.GL_COLOR_BUFFER_BIT | gl.GL_DEPTH_BUFFER_BIT)
-                for c in self.children:
-                    c.render()
+                render_draw_list(flatten(self.children, Matrix.identity()))
 
@@ -0,0 +1,206 @@
+"""Finds the elements of a document that cost the most to build and draw.
+
+With `SVGConfig.profile_elements` set, a document records every path, group,
+use and other element it parses into an ElementProfile, `SVGDoc.element_profile`,
+and times its loading per element (see svg_timing). When the upload finishes,
+the profile counts what drawing each element takes, by compiling it into a
+display list which is thrown away. This leaves the document as it was: its
+counters are restored afterwards, and pattern textures are not rendered
+again, so patterns count what their content draws into the texture and the
+render target pass itself isn't counted. `report` then lists the most expensive:
+
+    config = glsvg.SVGConfig()
+    config.profile_elements = True
+    doc = glsvg.SVGDoc('level.svg', config=config)
+    print(doc.element_profile.report(10, key='triangles'))
+
+Drawing a group or a use draws everything in it, so their draw counts include
+their contents. Their build times are their own; `total_build_time` adds the
+build times of their descendants.
+"""
+
+import copy
+import json
+
+from .glutils import DisplayListGenerator
+from .render_stats import RenderStats, collecting
+from .vector_math import Matrix
+from .svg_path import flatten
+
+#: The costs elements can be ranked by
+KEYS = ('build_time', 'total_build_time', 'draw_calls', 'triangles', 'vertices', 'bytes_uploaded')
+
+
+class ElementCost(object):
+    """What one element costs to build and draw"""
+    __slots__ = ('label', 'kind', 'phases', 'build_time', 'total_build_time', 'draw_calls',
+                 'triangles', 'vertices', 'bytes_uploaded')
+
+    def __init__(self, label, kind):
+        #: The id of the element, or its tag and position in the document
+        self.label = label
+        #: The tag of the element, e.g. 'path', 'circle' or 'g'
+        self.kind = kind
+        #: Seconds spent on the element in each load phase, by phase name
+        self.phases = {}
+        #: Seconds spent loading the element itself
+        self.build_time = 0.0
+        #: Seconds spent loading the element and its descendants
+        self.total_build_time = 0.0
+        #: Draw calls made to draw the element once
+        self.draw_calls = 0
+        #: Triangles drawn to draw the element once
+        self.triangles = 0
+        #: Vertices drawn to draw the element once
+        self.vertices = 0
+        #: Bytes of vertex data sent to GL to draw the element once
+        self.bytes_uploaded = 0
+
+    def as_dict(self):
+        return dict((name, getattr(self, name)) for name in self.__slots__)
+
+    def __repr__(self):
+        return "<ElementCost {0} ({1}) build_time={2:.2f}ms draw_calls={3} triangles={4}>".format(
+            self.label, self.kind, self.build_time * 1000, self.draw_calls, self.triangles)
+
+
+class ElementProfile(object):
+    """The costs of the elements of a document"""
+
+    def __init__(self, timings):
+        #: The LoadTimings the build times come from
+        self.timings = timings
+
+        #: ElementCosts in document order, once measured
+        self.costs = []
+
+        # (element, label, kind) in document order
+        self._elements = []
+
+    def add(self, element, label, kind):
+        """Records the renderable `element`, labelled `label` in the load timings"""
+        self._elements.append((element, label, kind))
+
+    def measure(self):
+        """Counts what drawing each element takes, and collects the build times
+        from the load timings. Must be called from the thread that owns the GL
+        context; SVGDoc does so when its upload finishes."""
+        draw_stats = {}
+        costs = {}
+        self.costs = []
+
+        # rendering adds to the counters of the documents drawn from
+        documents = dict((id(svg), svg) for svg in _documents(self._elements))
+        counters = [(svg, svg.n_tris, svg.n_lines) for svg in documents.values()]
+        try:
+            for element, label, kind in self._elements:
+                cost = ElementCost(label, kind)
+                cost.phases = dict(self.timings.elements.get(label, {})) if self.timings else {}
+                cost.build_time = sum(cost.phases.values())
+                stats = self._draw_stats(element, draw_stats)
+                cost.draw_calls = stats.draw_calls
+                cost.triangles = stats.triangles
+                cost.vertices = stats.vertices
+                cost.bytes_uploaded = stats.bytes_uploaded
+                costs[id(element)] = cost
+                self.costs.append(cost)
+        finally:
+            for svg, n_tris, n_lines in counters:
+                svg.n_tris = n_tris
+                svg.n_lines = n_lines
+
+        # add each element's own build time to it and its recorded ancestors
+        for element, label, kind in self._elements:
+            build_time = costs[id(element)].build_time
+            while element is not None:
+                cost = costs.get(id(element))
+                if cost is not None:
+                    cost.total_build_time += build_time
+                element = _parent(element)
+        return self
+
+    @staticmethod
+    def _draw_stats(element, draw_stats):
+        """Returns the RenderStats of drawing `element` once. Each element drawn is
+        only compiled once; `draw_stats` holds their stats by id. A pattern counts
+        its content; patterns met while drawing would render their texture, and
+        are skipped."""
+        stats = RenderStats()
+        if getattr(element, 'is_pattern', False):
+            draw_list = flatten(element.children, Matrix.identity())
+        else:
+            draw_list = element.draw_list()
+        for matrix, drawn in draw_list:
+            if getattr(drawn, 'is_pattern', False):
+                continue
+            drawn_stats = draw_stats.get(id(drawn))
+            if drawn_stats is None:
+                drawn_stats = draw_stats[id(drawn)] = RenderStats()
+                with collecting(drawn_stats), DisplayListGenerator() as display_list:
+                    drawn.on_render()
+                display_list.delete()
+            stats.add(drawn_stats)
+        return stats
+
+    def most_expensive(self, n=10, key='build_time', kinds=None):
+        """Returns the `n` ElementCosts with the highest `key`, one of KEYS. With
+        `kinds`, only elements with those tags are ranked."""
+        if key not in KEYS:
+            raise ValueError("Unknown key %r, expected one of %s" % (key, ', '.join(KEYS)))
+        costs = [c for c in self.costs if kinds is None or c.kind in kinds]
+        costs.sort(key=lambda c: getattr(c, key), reverse=True)
+        return costs[:n]
+
+    def report(self, n=20, key='build_time', kinds=None):
+        """Returns a table of the `n` most expensive elements, see `most_expensive`"""
+        lines = ["{0:<32} {1:<10} {2:>10} {3:>10} {4:>6} {5:>9} {6:>9}  slowest phase".format(
+            'element', 'kind', 'build ms', 'total ms', 'draws', 'triangles', 'vertices')]
+        for cost in self.most_expensive(n, key, kinds):
+            slowest = max(cost.phases, key=cost.phases.get) if cost.phases else '-'
+            lines.append("{0:<32} {1:<10} {2:>10.3f} {3:>10.3f} {4:>6} {5:>9} {6:>9}  {7}".format(
+                cost.label[:32], cost.kind, cost.build_time * 1000, cost.total_build_time * 1000,
+                cost.draw_calls, cost.triangles, cost.vertices, slowest))
+        return '\n'.join(lines)
+
+    def as_dict(self):
+        """Returns the costs as a dict, e.g. for JSON"""
+        return {'filename': self.timings.filename if self.timings else None,
+                'elements': [c.as_dict() for c in self.costs]}
+
+    def to_json(self, **kwargs):
+        """Returns the costs as a JSON string. `kwargs` go to json.dumps."""
+        return json.dumps(self.as_dict(), **kwargs)
+
+    def __repr__(self):
+        return "<ElementProfile elements={0}>".format(len(self._elements))
+
+
+def _documents(elements):
+    for element, label, kind in elements:
+        svg = getattr(element, 'svg', None)
+        if svg is not None:
+            yield svg
+        if hasattr(element, 'n_tris'):
+            yield element
+
+
+def _parent(element):
+    parent = getattr(element, 'parent', None)
+    if parent is None:
+        # top level elements of a nested <svg> belong to the nested document
+        svg = getattr(element, 'svg', None)
+        if svg is not None and svg.outer is not None:
+            return svg
+    return parent
+
+
+def profile(filename, config=None):
+    """Loads `filename` with `config` (a default SVGConfig if None) and element
+    profiling on, and returns its ElementProfile. Needs a current GL context."""
+    from .svg import SVGDoc, SVGConfig
+    config = copy.copy(config) if config else SVGConfig()
+    config.profile_elements = True
+    doc = SVGDoc(filename, config=config)
+    profile = doc.element_profile
+    doc.release()
+    return profile
@@ -0,0 +1,163 @@
+"""Shares loaded documents between the parts of a program that draw the same file.
+
+`get` loads each (file, config) pair once and hands out SVGInstance objects,
+which carry their own anchor and transform but share the document's geometry
+and display lists. When the last instance of a document is garbage collected
+the document moves to a least recently used cache of unused documents, which is
+trimmed to `memory_cap` bytes by releasing their GL resources.
+
+Instances should be dropped on the GL thread, since that is where released
+documents delete their display lists and textures.
+"""
+
+import os
+import weakref
+import collections
+
+from .svg import SVGDoc, SVGConfig, anchor_offset_x, anchor_offset_y
+
+
+class SVGInstance(object):
+    """A lightweight handle to a shared SVGDoc with its own anchor and transform."""
+
+    def __init__(self, doc, anchor_x=0, anchor_y=0):
+        #: The shared document. Must not be modified.
+        self.doc = doc
+
+        #: Position at which the instance is drawn
+        self.x = 0
+        self.y = 0
+        self.z = 0
+
+        #: Rotation in degrees
+        self.angle = 0
+
+        #: Scale, either a float or a tuple of two floats (xscale, yscale)
+        self.scale = 1
+
+        self.anchor_x = anchor_x
+        self.anchor_y = anchor_y
+
+    @property
+    def width(self):
+        return self.doc.width
+
+    @property
+    def height(self):
+        return self.doc.height
+
+    def _set_anchor_x(self, anchor_x):
+        self._anchor_x = anchor_x
+        self._a_x = anchor_offset_x(anchor_x, self.doc.width)
+
+    def _get_anchor_x(self):
+        return self._anchor_x
+
+    #: Where the instance is anchored. Valid values are numerical, or 'left', 'right', 'center'
+    anchor_x = property(_get_anchor_x, _set_anchor_x)
+
+    def _set_anchor_y(self, anchor_y):
+        self._anchor_y = anchor_y
+        self._a_y = anchor_offset_y(anchor_y, self.doc.height)
+
+    def _get_anchor_y(self):
+        return self._anchor_y
+
+    #: Where the instance is anchored. Valid values are numerical, or 'top', 'bottom', 'center'
+    anchor_y = property(_get_anchor_y, _set_anchor_y)
+
+    def draw(self):
+        """Draws the shared document with this instance's anchor and transform"""
+        self.doc._draw(self.x, self.y, self.z, self.angle, self.scale, self._a_x, self._a_y)
+
+
+class _Entry(object):
+    def __init__(self, doc):
+        self.doc = doc
+        self.n_refs = 0
+        self.size = 0
+
+
+class SVGRegistry(object):
+    """Loads each (file, config) pair once and shares it between instances."""
+
+    def __init__(self, memory_cap=32 * 1024 * 1024):
+        #: Bytes of unused documents kept for reuse. Beyond this the least
+        #: recently used ones are released.
+        self.memory_cap = memory_cap
+
+        self._entries = {}
+        self._unused = collections.OrderedDict()
+        self._unused_size = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, filename, config=None, anchor_x=0, anchor_y=0):
+        """Returns a new SVGInstance of `filename`, loading the document if it
+        isn't loaded with an equal config yet. Must be called from the GL thread.
+
+        Args:
+            `filename`: str
+                The .svg or .svgz file.
+            `config`: SVGConfig
+                The render configuration. Defaults to a new SVGConfig.
+            `anchor_x`, `anchor_y`:
+                The anchor of the instance, as in SVGDoc.
+        """
+        if not config:
+            config = SVGConfig()
+
+        key = (os.path.abspath(filename), config.cache_key())
+        entry = self._entries.get(key)
+        if entry is None:
+            entry = self._entries[key] = _Entry(SVGDoc(filename, config=config))
+        elif key in self._unused:
+            del self._unused[key]
+            self._unused_size -= entry.size
+
+        instance = SVGInstance(entry.doc, anchor_x, anchor_y)
+        entry.n_refs += 1
+        weakref.finalize(instance, self._drop_ref, key)
+        return instance
+
+    def _drop_ref(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return
+
+        entry.n_refs -= 1
+        if entry.n_refs == 0:
+            entry.size = entry.doc.memory_size()
+            self._unused[key] = entry
+            self._unused_size += entry.size
+            self.trim()
+
+    def trim(self, memory_cap=None):
+        """Releases the least recently used unused documents until the unused ones
+        take at most `memory_cap` bytes (by default `self.memory_cap`)."""
+        if memory_cap is None:
+            memory_cap = self.memory_cap
+
+        while self._unused and self._unused_size > memory_cap:
+            key, entry = self._unused.popitem(last=False)
+            self._unused_size -= entry.size
+            del self._entries[key]
+            entry.doc.release()
+
+    def clear(self):
+        """Releases every document that has no instances left"""
+        self.trim(-1)
+
+
+#: The registry used by `get`
+default_registry = SVGRegistry()
+
+
+def get(filename, config=None, anchor_x=0, anchor_y=0):
+    """Returns an SVGInstance of `filename` from the shared registry.
+
+    Each (file, config) pair is parsed, tesselated and uploaded only once; the
+    instances share it and carry their own anchor and transform. See SVGRegistry.
+    """
+    return default_registry.get(filename, config, anchor_x, anchor_y)
@@ -1,10 +1,37 @@
+import weakref
+import operator
+import functools
+
 from .svg_constants import DEFAULT_FILL, DEFAULT_STROKE
 from .svg_parser_utils import *
 
+#: The style properties, which make up the identity of an SVGStyle
+STYLE_FIELDS = ('fill', 'fill_rule', 'fill_opacity', 'stroke', 'stroke_width', 'stroke_opacity',
+                'stroke_dasharray', 'stroke_miterlimit', 'stroke_linecap', 'stroke_linejoin',
+                'opacity', 'font_family', 'font_size')
+
+#: The element attributes that from_element reads
+STYLE_ATTRIBUTES = ('fill', 'fill-rule', 'stroke', 'stroke-width', 'opacity', 'fill-opacity',
+                    'stroke-opacity', 'stroke-linejoin', 'stroke-miterlimit', 'stroke-linecap',
+                    'font-family', 'font-size', 'stroke-dasharray', 'style')
+
+_style_values = operator.attrgetter(*STYLE_FIELDS)
+
+#: Interned styles by value, for as long as some element uses them
+_interned_styles = weakref.WeakValueDictionary()
+
 
 class SVGStyle(object):
+    """The resolved presentation attributes of an element.
+
+    Styles are mutable while being built with `from_element`. `intern` freezes
+    them and returns the shared instance with the same values, so interned
+    styles that are equal are also identical, and can be hashed."""
+    __slots__ = STYLE_FIELDS + ('_frozen', '_hash', '__weakref__')
 
     def __init__(self, inherit_from=None):
+        object.__setattr__(self, '_frozen', False)
+
         #: The internal color
         self.fill = DEFAULT_FILL
 
@@ -22,9 +49,16 @@ class SVGStyle(object):
         #: Overall opacity (multiplied by other elements)
         self.opacity = 1.0
 
-        #: Controls the pattern of dashes and gaps used to stroke path. List
+        #: Opacity of the fill and of the outline
+        self.fill_opacity = 1.0
+        self.stroke_opacity = 1.0
+
+        #: The line join, possible values are 'miter', 'round', 'bevel'
+        self.stroke_linejoin = 'miter'
+
+        #: Controls the pattern of dashes and gaps used to stroke path. Tuple
         #: of alternating dashes and gaps.
-        self.stroke_dasharray = []
+        self.stroke_dasharray = ()
 
         #: The maximum ratio of the distance between a line joints inner
         #: connection and outer miter edge vs the line width
@@ -67,7 +101,7 @@ class SVGStyle(object):
 
         dash_array = element.get('stroke-dasharray', None)
         if dash_array:
-            self.stroke_dasharray = [float(x.strip()) for x in dash_array.split(',')]
+            self.stroke_dasharray = tuple(float(x.strip()) for x in dash_array.split(','))
 
         style = element.get('style')
         if style:
@@ -90,7 +124,7 @@ class SVGStyle(object):
             if 'stroke-dasharray' in style_dict:
                 dash_array = style_dict['stroke-dasharray']
                 if dash_array and dash_array != 'none':
-                    self.stroke_dasharray = [float(x.strip()) for x in dash_array.split(',')]
+                    self.stroke_dasharray = tuple(float(x.strip()) for x in dash_array.split(','))
             if 'stroke-linejoin' in style_dict:
                 self.stroke_linejoin = style_dict['stroke-linejoin']
             if 'stroke-linecap' in style_dict:
@@ -100,10 +134,47 @@ class SVGStyle(object):
                 self.stroke_opacity *= float(style_dict['opacity'])
             if 'fill-rule' in style_dict:
                 self.fill_rule = style_dict['fill-rule']
-        if isinstance(self.stroke, list):
-            self.stroke[3] = int(self.opacity * self.stroke_opacity * self.stroke[3])
-        if isinstance(self.fill, list):
-            self.fill[3] = int(self.opacity * self.fill_opacity * self.fill[3])
+        if isinstance(self.stroke, tuple):
+            self.stroke = self.stroke[:3] + (int(self.opacity * self.stroke_opacity * self.stroke[3]),)
+        if isinstance(self.fill, tuple):
+            self.fill = self.fill[:3] + (int(self.opacity * self.fill_opacity * self.fill[3]),)
+
+    def __setattr__(self, name, value):
+        if self._frozen:
+            raise AttributeError('interned SVGStyle objects are immutable')
+        object.__setattr__(self, name, value)
+
+    def _values(self):
+        return _style_values(self)
+
+    def __eq__(self, other):
+        if self is other:
+            return True
+        if not isinstance(other, SVGStyle):
+            return NotImplemented
+        return self._values() == other._values()
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        return result if result is NotImplemented else not result
+
+    def __hash__(self):
+        if not self._frozen:
+            raise TypeError('only interned SVGStyle objects are hashable')
+        return self._hash
+
+    def __reduce__(self):
+        return _unpickle_style, (self._values(),)
+
+    def intern(self):
+        """Freezes the style and returns the shared style with the same values"""
+        values = self._values()
+        style = _interned_styles.get(values)
+        if style is None:
+            object.__setattr__(self, '_hash', hash(values))
+            object.__setattr__(self, '_frozen', True)
+            style = _interned_styles.setdefault(values, self)
+        return style
 
     def parse_style_attribute(self, attr):
         pass
@@ -121,4 +192,27 @@ class SVGStyle(object):
         pass
 
     def parse_stroke_dasharray(self, attr):
-        pass
\ No newline at end of file
+        pass
+
+
+def _unpickle_style(values):
+    style = SVGStyle()
+    for field, value in zip(STYLE_FIELDS, values):
+        setattr(style, field, value)
+    return style.intern()
+
+
+@functools.lru_cache(maxsize=4096)
+def _resolve_style(parent_style, attributes):
+    style = SVGStyle(parent_style)
+    style.from_element(dict((name, value) for name, value in zip(STYLE_ATTRIBUTES, attributes)
+                            if value is not None))
+    return style.intern()
+
+
+def resolve_style(element, parent_style=None):
+    """Returns the interned style of an XML element whose parent has the
+    interned style `parent_style`. Elements with the same presentation
+    attributes under equal parent styles share the result without reparsing."""
+    attrib = element.attrib
+    return _resolve_style(parent_style, tuple(attrib.get(name) for name in STYLE_ATTRIBUTES))
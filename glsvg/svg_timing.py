@@ -0,0 +1,209 @@
+"""Times the phases of loading a document.
+
+With `SVGConfig.collect_timings` set, each SVGDoc records how long it spends in
+every phase of loading into a LoadTimings, `SVGDoc.load_timings`. Phases nest
+(gradient sampling happens while display lists compile, tesselation while
+geometry is built), and each phase only counts its own time, so the phase
+totals add up to the time spent loading.
+
+Code deep in the pipeline, which doesn't know its document, times itself with
+`phase`, which records into the LoadTimings that is being recorded into on the
+current thread, if any:
+
+    with svg_timing.phase('tokenize'):
+        ...
+"""
+
+import json
+import threading
+import time
+
+#: The phases of loading a document, in pipeline order:
+#:
+#: - xml_parse: reading the XML tree
+#: - parse: creating the elements, except for the phases below
+#: - style: resolving styles
+#: - tokenize: splitting path data into commands
+#: - flatten: turning commands and shapes into outlines
+#: - tessellate: triangulating fills
+#: - stroke: building stroke triangles
+#: - gradient: sampling gradient colors
+#: - pattern: rendering patterns into their textures
+#: - compile: compiling geometry and display lists
+PHASES = ('xml_parse', 'parse', 'style', 'tokenize', 'flatten', 'tessellate', 'stroke',
+          'gradient', 'pattern', 'compile')
+
+_state = threading.local()
+
+
+class LoadTimings(object):
+    """The seconds spent in each phase of loading a document, in total and,
+    optionally, per element."""
+
+    def __init__(self, filename=None, per_element=False):
+        #: Filename of the document, if it was loaded from a file
+        self.filename = filename
+
+        #: Seconds spent in each phase, by phase name
+        self.totals = dict.fromkeys(PHASES, 0.0)
+
+        #: Whether to break the timings down per element
+        self.per_element = per_element
+
+        #: Seconds spent in each phase, by element label and phase name. Elements
+        #: are labelled with their id, or their tag and position in the document.
+        self.elements = {}
+
+        #: Labels of the elements which geometries were first parsed for, by id(geometry)
+        self.geometry_labels = {}
+
+        self._n_elements = 0
+        # [phase, label, start] of the phases being timed, innermost last
+        self._stack = []
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        # ids only mean something in the process that took them
+        state['geometry_labels'] = {}
+        state['_stack'] = []
+        return state
+
+    @property
+    def total(self):
+        """Seconds spent in all phases"""
+        return sum(self.totals.values())
+
+    def element_label(self, element):
+        """Returns the label of an XML element, or None if timings aren't kept
+        per element"""
+        if not self.per_element:
+            return None
+        self._n_elements += 1
+        label = element.get('id')
+        if not label:
+            tag = element.tag if isinstance(element.tag, str) else 'node'
+            label = '{0}[{1}]'.format(tag.rsplit('}', 1)[-1], self._n_elements)
+        return label
+
+    def phase(self, name, label=None):
+        """Returns a context manager which records the time spent in it under the
+        phase `name` and the element `label`. Without a label, the time counts for
+        the element of the enclosing phase. A name of None only sets the label."""
+        return _Phase(self, name, label)
+
+    def add(self, name, seconds, label=None):
+        """Adds `seconds` to the phase `name`, and to the element `label`"""
+        self.totals[name] = self.totals.get(name, 0.0) + seconds
+        if label is not None and self.per_element:
+            element = self.elements.setdefault(label, {})
+            element[name] = element.get(name, 0.0) + seconds
+
+    def merge(self, other):
+        """Adds the timings of `other`, for example from a worker process, to these"""
+        for name, seconds in other.totals.items():
+            self.add(name, seconds)
+        if self.per_element:
+            for label, phases in other.elements.items():
+                for name, seconds in phases.items():
+                    self.add(name, seconds, label)
+
+    def _enter(self, name, label):
+        now = time.perf_counter()
+        if self._stack:
+            outer = self._stack[-1]
+            if label is None:
+                label = outer[1]
+            if outer[0] is not None:
+                self.add(outer[0], now - outer[2], outer[1])
+        self._stack.append([name, label, now])
+
+    def _exit(self):
+        now = time.perf_counter()
+        name, label, start = self._stack.pop()
+        if name is not None:
+            self.add(name, now - start, label)
+        if self._stack:
+            # the enclosing phase carries on from here
+            self._stack[-1][2] = now
+
+    def as_dict(self):
+        """Returns the timings as a dict, e.g. for JSON"""
+        d = {'filename': self.filename,
+             'total': self.total,
+             'phases': dict(self.totals)}
+        if self.per_element:
+            d['elements'] = self.elements
+        return d
+
+    def to_json(self, **kwargs):
+        """Returns the timings as a JSON string. `kwargs` go to json.dumps."""
+        return json.dumps(self.as_dict(), **kwargs)
+
+    def __repr__(self):
+        return "<LoadTimings filename={0} total={1:.3f}s slowest={2}>".format(
+            self.filename, self.total, max(self.totals, key=self.totals.get))
+
+
+class _Phase(object):
+    __slots__ = ('timings', 'name', 'label', 'previous')
+
+    def __init__(self, timings, name, label):
+        self.timings = timings
+        self.name = name
+        self.label = label
+
+    def __enter__(self):
+        # deeper code records into these timings too, until the phase ends
+        self.previous = getattr(_state, 'timings', None)
+        _state.timings = self.timings
+        self.timings._enter(self.name, self.label)
+        return self
+
+    def __exit__(self, *exc_info):
+        self.timings._exit()
+        _state.timings = self.previous
+        return False
+
+
+class _NoPhase(object):
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+_no_phase = _NoPhase()
+
+
+def timed(timings, name, label=None):
+    """Like `timings.phase(name, label)`, but does nothing if `timings` is None"""
+    if timings is None:
+        return _no_phase
+    return _Phase(timings, name, label)
+
+
+def phase(name):
+    """Returns a context manager which records the time spent in it under the
+    phase `name` of the LoadTimings being recorded into on this thread. Does
+    nothing when no timings are recorded."""
+    timings = getattr(_state, 'timings', None)
+    if timings is None:
+        return _no_phase
+    return _Phase(timings, name, None)
+
+
+def recording(timings):
+    """Returns a context manager under which `phase` records into `timings`,
+    without timing anything itself. Does nothing if `timings` is None."""
+    return timed(timings, None)
+
+
+def json_lines_writer(filename):
+    """Returns a `SVGConfig.timings_callback` which appends the timings of every
+    document to `filename`, one JSON object per line."""
+    def write(doc, timings):
+        with open(filename, 'a') as f:
+            f.write(timings.to_json() + '\n')
+    return write
@@ -1,11 +1,15 @@
 from .svg_parser_utils import *
 import OpenGL.GL as gl
 import math
+import functools
+from array import array
 
 EPSILON = 0.001
 
 
 class vec2(object):
+    __slots__ = ('x', 'y')
+
     def __init__(self, *args):
         if isinstance(args[0], vec2):
             self.x = args[0].x
@@ -111,35 +115,40 @@ ninety_degrees = radian(90)
 
 
 class Matrix(object):
+    """A 2d affine transform, stored as an immutable tuple of the six values
+    (a, b, c, d, e, f) of an SVG matrix() transform"""
+    __slots__ = ('values',)
+
     def __init__(self, string=None):
-        self.values = [1, 0, 0, 1, 0, 0]
+        values = (1, 0, 0, 1, 0, 0)
         if isinstance(string, str):
             string = string.strip()
             if string.startswith('matrix('):
-                self.values = [float(x) for x in parse_list(string[7:-1])]
+                values = tuple(float(x) for x in parse_list(string[7:-1]))
             elif string.startswith('translate('):
                 args = [float(x) for x in parse_list(string[10:-1])]
 
                 #if len(args) == 2:
-                self.values = [1, 0, 0, 1, args[0], args[1]]
+                values = (1, 0, 0, 1, args[0], args[1])
                 #else:
-                #    self.values = [1, 0, 0, 1, args[0], 0]
+                #    values = (1, 0, 0, 1, args[0], 0)
             elif string.startswith('scale('):
                 inside = string[6:-1]
                 scale_vars = [float(x) for x in parse_float_list(inside)]
 
                 if len(scale_vars) == 1:
-                    self.values = [scale_vars[0], 0, 0, scale_vars[0], 0, 0]
+                    values = (scale_vars[0], 0, 0, scale_vars[0], 0, 0)
                 else:
-                    self.values = [scale_vars[0], 0, 0, scale_vars[1], 0, 0]
+                    values = (scale_vars[0], 0, 0, scale_vars[1], 0, 0)
             elif string.startswith('rotate('):
                 angle = float(string[7:-1])
                 theta = radian(angle)
 
                 #where does angle go in here?
-                self.values = [math.cos(theta), math.sin(theta), -math.sin(theta), math.cos(theta), 0, 0]
+                values = (math.cos(theta), math.sin(theta), -math.sin(theta), math.cos(theta), 0, 0)
         elif string is not None:
-            self.values = list(string)
+            values = tuple(string)
+        self.values = values
 
     def __enter__(self):
         gl.glPushMatrix()
@@ -154,7 +163,7 @@ class Matrix(object):
                 self.values[1] * other[0] + self.values[3] * other[1] + self.values[5])
     
     def __str__(self):
-        return str(self.values)
+        return str(list(self.values))
     
     def to_mat4(self):
         v = self.values
@@ -203,12 +212,113 @@ class Matrix(object):
             b * y + d * z + f])
 
 
+@functools.lru_cache(maxsize=PARSE_CACHE_SIZE)
+def parse_transform(transform_str):
+    """Parses a transform attribute into a single Matrix. Memoized, so equal
+    strings share one (immutable) matrix."""
+    matrix = Matrix.identity()
+    for tstring in get_fns(transform_str):
+        matrix = matrix * Matrix(tstring)
+    return matrix
+
+
+def simplify_polyline(points, tolerance):
+    """Ramer-Douglas-Peucker simplification. Returns the points of the polyline
+    which keep every dropped point within `tolerance` of the simplified line. The
+    end points are always kept, so closed loops stay closed."""
+    n = len(points)
+    if n < 3 or tolerance <= 0:
+        return points
+
+    keep = [False] * n
+    keep[0] = keep[-1] = True
+    tolerance_sq = tolerance * tolerance
+
+    # split at the point farthest from each chord until all are within tolerance
+    stack = [(0, n - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+        ax, ay = points[first][0], points[first][1]
+        dx = points[last][0] - ax
+        dy = points[last][1] - ay
+        length_sq = dx * dx + dy * dy
+
+        if length_sq:
+            distances = [(dx * (p[1] - ay) - dy * (p[0] - ax)) ** 2 / length_sq
+                         for p in points[first + 1:last]]
+        else:
+            distances = [(p[0] - ax) ** 2 + (p[1] - ay) ** 2 for p in points[first + 1:last]]
+        max_distance = max(distances)
+        if max_distance > tolerance_sq:
+            index = first + 1 + distances.index(max_distance)
+            keep[index] = True
+            stack.append((first, index))
+            stack.append((index, last))
+
+    return [p for p, kept in zip(points, keep) if kept]
+
+
+def vertex_pairs(vertices):
+    """Iterates a flat [x0, y0, x1, y1, ...] vertex array as (x, y) pairs"""
+    return zip(vertices[0::2], vertices[1::2])
+
+
+def transform_vertices(matrix, vertices):
+    """Returns a new float array of the flat [x0, y0, x1, y1, ...] `vertices`
+    transformed by `matrix`"""
+    a, b, c, d, e, f = matrix.values
+    xs = vertices[0::2]
+    ys = vertices[1::2]
+    result = array('f', bytes(4 * len(vertices)))
+    result[0::2] = array('f', [a * x + c * y + e for x, y in zip(xs, ys)])
+    result[1::2] = array('f', [b * x + d * y + f for x, y in zip(xs, ys)])
+    return result
+
+
+def quantization_frame(vertex_arrays):
+    """Returns (scale_x, scale_y, offset_x, offset_y) mapping the int16 range onto the
+    bounding box of the flat vertex arrays, for `quantize_vertices`"""
+    box = BoundingBox()
+    for vertices in vertex_arrays:
+        box.expand(vertex_pairs(vertices))
+    min_x, min_y, max_x, max_y = box.extents()
+    if min_x is None:
+        return 1.0, 1.0, 0.0, 0.0
+    scale_x = (max_x - min_x) / 65535.0 or 1.0
+    scale_y = (max_y - min_y) / 65535.0 or 1.0
+    return scale_x, scale_y, min_x + 32768 * scale_x, min_y + 32768 * scale_y
+
+
+def quantize_vertices(vertices, frame):
+    """Returns the flat float `vertices` as an int16 array in `frame`. A quantized
+    vertex q maps back to q * scale + offset."""
+    scale_x, scale_y, offset_x, offset_y = frame
+    result = array('h', bytes(2 * len(vertices)))
+    result[0::2] = array('h', [max(-32768, min(32767, int(round((x - offset_x) / scale_x))))
+                               for x in vertices[0::2]])
+    result[1::2] = array('h', [max(-32768, min(32767, int(round((y - offset_y) / scale_y))))
+                               for y in vertices[1::2]])
+    return result
+
+
+def dequantize_vertices(vertices, frame):
+    """Returns int16 vertices quantized in `frame` as a new float array"""
+    scale_x, scale_y, offset_x, offset_y = frame
+    result = array('f', bytes(4 * len(vertices)))
+    result[0::2] = array('f', [x * scale_x + offset_x for x in vertices[0::2]])
+    result[1::2] = array('f', [y * scale_y + offset_y for y in vertices[1::2]])
+    return result
+
+
 def svg_matrix_to_gl_matrix(matrix):
     v = matrix.values
     return [v[0], v[1], 0.0, v[2], v[3], 0.0, v[4], v[5], 1.0]
 
 
-class BoundingBox:
+class BoundingBox(object):
+    __slots__ = ('min_x', 'max_x', 'min_y', 'max_y')
 
     def __init__(self, point_cloud=None):
         self.min_x = None
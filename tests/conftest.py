@@ -0,0 +1,54 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+if not os.environ.get('DISPLAY'):
+    # PyOpenGL picks its platform when it is first imported
+    os.environ.setdefault('PYOPENGL_PLATFORM', 'egl')
+    os.environ.setdefault('EGL_PLATFORM', 'surfaceless')
+
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+import OpenGL.GL as gl
+
+#: Size of the framebuffer documents are rendered into
+RENDER_SIZE = 256
+
+
+def svg_file(name):
+    """Returns the path of a file in svgs/"""
+    return os.path.join(ROOT, 'svgs', name)
+
+
+@pytest.fixture(scope='session')
+def gl_context():
+    """A headless GL context, made current for the whole session. Tests using it
+    are skipped where none can be created."""
+    from corpus import headless_context
+    try:
+        context = headless_context(RENDER_SIZE, RENDER_SIZE)
+    except Exception as ex:
+        pytest.skip('no headless GL context: {0!r}'.format(ex))
+    return context
+
+
+@pytest.fixture
+def render(gl_context):
+    """Returns a function which draws a document at the origin, scaled to fit the
+    framebuffer, and returns the RGBA pixels"""
+    def render(doc):
+        size = max(doc.width, doc.height) or 1
+        gl.glViewport(0, 0, RENDER_SIZE, RENDER_SIZE)
+        gl.glMatrixMode(gl.GL_PROJECTION)
+        gl.glLoadIdentity()
+        gl.glOrtho(0, size, size, 0, -1, 1)
+        gl.glMatrixMode(gl.GL_MODELVIEW)
+        gl.glLoadIdentity()
+        gl.glClearColor(1.0, 1.0, 1.0, 1.0)
+        gl.glClear(gl.GL_COLOR_BUFFER_BIT | gl.GL_STENCIL_BUFFER_BIT)
+        doc.draw(0, 0)
+        return bytes(gl.glReadPixels(0, 0, RENDER_SIZE, RENDER_SIZE, gl.GL_RGBA, gl.GL_UNSIGNED_BYTE))
+    return render
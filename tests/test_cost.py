@@ -0,0 +1,47 @@
+import warnings
+
+import pytest
+
+import glsvg
+from glsvg.svg_cost import fit_to_budget
+from glsvg.svg_parser_utils import read_svg
+
+from conftest import svg_file
+
+
+def n_triangles(doc):
+    return sum(element.geometry.n_fill_triangles + element.geometry.n_stroke_triangles
+               for matrix, element in doc.draw_list() if getattr(element, 'geometry', None))
+
+
+def load_with_budget(filename, triangle_budget):
+    config = glsvg.SVGConfig()
+    config.deduplicate_geometry = False
+    config.triangle_budget = triangle_budget
+    return glsvg.SVGDoc(svg_file(filename), config=config, upload=False)
+
+
+def test_document_fits_a_reachable_budget():
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        doc = load_with_budget('Giza_pyramid_complex.svg', 20000)
+    assert not doc.over_budget
+    assert doc.estimated_cost.triangles <= 20000
+    assert doc.config.bezier_points < glsvg.SVGConfig().bezier_points
+    assert n_triangles(doc) <= 20000
+
+
+def test_document_over_an_unreachable_budget_warns():
+    with pytest.warns(RuntimeWarning):
+        doc = load_with_budget('Giza_pyramid_complex.svg', 100)
+    assert doc.over_budget
+    assert doc.estimated_cost.triangles > 100
+
+
+def test_fit_to_budget_keeps_a_config_within_budget():
+    config = glsvg.SVGConfig()
+    config.triangle_budget = 10 ** 9
+    tuned, cost, fits = fit_to_budget(read_svg(svg_file('atiger.svg')), config)
+    assert fits
+    assert (tuned.bezier_points, tuned.circle_points, tuned.tolerance) == \
+        (config.bezier_points, config.circle_points, config.tolerance)
@@ -0,0 +1,201 @@
+import math
+from array import array
+
+import OpenGL.GL as gl
+
+import glsvg
+from glsvg import graphics
+from glsvg.svg_path_builder import triangulate
+from glsvg.vector_math import quantization_frame, quantize_vertices, dequantize_vertices, simplify_polyline
+
+from conftest import svg_file, RENDER_SIZE
+
+
+def geometries(doc):
+    return [path.geometry for path in doc._all_geometry_paths()]
+
+
+def load(filename, **settings):
+    """Loads `filename` with geometry of its own and the given SVGConfig settings"""
+    config = glsvg.SVGConfig()
+    config.deduplicate_geometry = False
+    for name, value in settings.items():
+        setattr(config, name, value)
+    return glsvg.SVGDoc(svg_file(filename), config=config)
+
+
+def n_differences(pixels, expected):
+    return sum(1 for a, b in zip(pixels, expected) if a != b)
+
+
+def test_documents_share_geometry(render):
+    first = glsvg.SVGDoc(svg_file('atiger.svg'))
+    second = glsvg.SVGDoc(svg_file('atiger.svg'))
+    assert all(a is b for a, b in zip(geometries(first), geometries(second)))
+
+    config = glsvg.SVGConfig()
+    config.deduplicate_geometry = False
+    unshared = glsvg.SVGDoc(svg_file('atiger.svg'), config=config)
+    assert not any(a is b for a, b in zip(geometries(first), geometries(unshared)))
+    assert render(first) == render(unshared)
+    for doc in (first, second, unshared):
+        doc.release()
+
+
+def test_shared_display_lists_are_deleted_with_the_last_document(gl_context):
+    first = glsvg.SVGDoc(svg_file('sun.svg'))
+    second = glsvg.SVGDoc(svg_file('sun.svg'))
+    geometry = geometries(first)[0]
+    display_list = geometry._fill_list or geometry._stroke_list
+    list_id = display_list.display_list_id
+
+    first.release()
+    assert gl.glIsList(list_id)
+    second.draw(0, 0)
+
+    second.release()
+    assert not gl.glIsList(list_id)
+
+    # uploading again compiles them again
+    second.upload()
+    assert geometry._fill_list or geometry._stroke_list
+    second.release()
+
+
+def test_baked_transforms_render_the_same(render):
+    for filename in ('atiger.svg', 'sun.svg', 'primitives.svg'):
+        doc = load(filename, bake_transforms=True)
+        expected = load(filename)
+        assert any(path.is_baked for path in doc._all_geometry_paths())
+        pixels = render(expected)
+        # vertices transformed on the CPU may round differently at edges
+        assert n_differences(render(doc), pixels) <= len(pixels) // 1000
+        doc.release()
+        expected.release()
+
+
+def test_dynamic_ids_keep_their_transform(gl_context):
+    doc = load('circle.svg', bake_transforms=True)
+    assert doc.path_lookup['path2985'].is_baked
+    doc.release()
+
+    doc = load('circle.svg', bake_transforms=True, dynamic_ids=frozenset(['path2985']))
+    assert not doc.path_lookup['path2985'].is_baked
+    doc.release()
+
+
+def triangle_area(vertices, indices):
+    area = 0.0
+    for i in range(0, len(indices), 3):
+        (ax, ay), (bx, by), (cx, cy) = [(vertices[2 * j], vertices[2 * j + 1]) for j in indices[i:i + 3]]
+        area += abs((bx - ax) * (cy - ay) - (cx - ax) * (by - ay)) / 2
+    return area
+
+
+def test_welded_fill_of_a_convex_polygon():
+    n = 12
+    loop = [[math.cos(2 * math.pi * i / n), math.sin(2 * math.pi * i / n)] for i in range(n)]
+    vertices, indices = triangulate([loop], 'nonzero')
+    # each point is stored once, and a convex polygon takes n - 2 triangles
+    assert len(vertices) // 2 == n
+    assert len(indices) // 3 == n - 2
+    assert abs(triangle_area(vertices, indices) - n / 2 * math.sin(2 * math.pi / n)) < 1e-5
+
+
+def test_welded_fill_of_a_square_with_a_hole():
+    loops = [[[0, 0], [10, 0], [10, 10], [0, 10]], [[3, 3], [3, 7], [7, 7], [7, 3]]]
+    vertices, indices = triangulate(loops, 'evenodd')
+    assert len(vertices) // 2 == 8
+    assert len(indices) // 3 == 8
+    assert indices.typecode == 'H'
+    assert abs(triangle_area(vertices, indices) - 84) < 1e-5
+
+
+def draw_fills(doc, indexed):
+    """Draws the fill of every geometry of `doc` in black, either indexed or as
+    the expanded triangles"""
+    gl.glColor4ub(0, 0, 0, 255)
+    for geometry in geometries(doc):
+        if geometry.fill_indices is None:
+            continue
+        if indexed:
+            graphics.draw_indexed(gl.GL_TRIANGLES, geometry.fill_vertices, geometry.fill_indices)
+        else:
+            graphics.draw_vertices(gl.GL_TRIANGLES, geometry.triangles)
+
+
+def test_indexed_fills_draw_the_expanded_triangles(render):
+    doc = load('atiger.svg')
+    render(doc)  # sets up the projection
+    pixels = []
+    for indexed in (True, False):
+        gl.glClear(gl.GL_COLOR_BUFFER_BIT)
+        draw_fills(doc, indexed)
+        pixels.append(bytes(gl.glReadPixels(0, 0, RENDER_SIZE, RENDER_SIZE, gl.GL_RGBA, gl.GL_UNSIGNED_BYTE)))
+    assert pixels[0] == pixels[1]
+    assert pixels[0] != b'\xff' * len(pixels[0])
+    for geometry in geometries(doc):
+        if geometry.fill_indices is not None:
+            assert len(geometry.triangles) // 6 == geometry.n_fill_triangles
+            assert len(geometry.fill_vertices) // 2 <= 3 * geometry.n_fill_triangles
+    doc.release()
+
+
+def test_quantized_vertices_stay_within_the_frame_precision():
+    vertices = array('f', [-160.833, 39.962, -122.304, 86.16, -140.5, 50.25, -122.304, 39.962])
+    frame = quantization_frame([vertices])
+    quantized = quantize_vertices(vertices, frame)
+    assert quantized.typecode == 'h'
+    restored = dequantize_vertices(quantized, frame)
+    width, height = 160.833 - 122.304, 86.16 - 39.962
+    for i, (original, value) in enumerate(zip(vertices, restored)):
+        size = width if i % 2 == 0 else height
+        assert abs(original - value) <= size / 65535 + 1e-5
+
+
+def test_quantized_documents_render_nearly_the_same(render):
+    doc = load('atiger.svg', quantize_vertices=True)
+    expected = load('atiger.svg')
+    assert any(geometry.quantization for geometry in geometries(doc))
+    assert doc.memory_size() < expected.memory_size()
+    pixels = render(expected)
+    # an edge may move across a pixel center
+    assert n_differences(render(doc), pixels) <= len(pixels) // 1000
+    doc.release()
+    expected.release()
+
+
+def segment_distance(p, a, b):
+    dx, dy = b[0] - a[0], b[1] - a[1]
+    length_sq = dx * dx + dy * dy
+    t = 0.0
+    if length_sq:
+        t = max(0.0, min(1.0, ((p[0] - a[0]) * dx + (p[1] - a[1]) * dy) / length_sq))
+    return math.hypot(p[0] - a[0] - t * dx, p[1] - a[1] - t * dy)
+
+
+def test_simplified_polyline_stays_within_tolerance():
+    # a densely sampled, slightly noisy closed circle
+    points = [[100 * math.cos(2 * math.pi * i / 720) + 0.05 * (-1) ** i,
+               100 * math.sin(2 * math.pi * i / 720)] for i in range(720)]
+    points.append(points[0])
+    simplified = simplify_polyline(points, 0.1)
+    assert simplified[0] is points[0] and simplified[-1] is points[-1]
+    assert len(simplified) < len(points) // 5
+    for p in points:
+        assert min(segment_distance(p, a, b) for a, b in zip(simplified, simplified[1:])) <= 0.1 + 1e-9
+
+    assert simplify_polyline(points, 0) is points
+    assert simplify_polyline(points[:2], 1.0) == points[:2]
+
+
+def test_simplified_documents_have_fewer_points(render):
+    doc = load('atiger.svg', simplify_tolerance=0.1)
+    expected = load('atiger.svg')
+
+    def n_points(doc):
+        return sum(len(loop) for geometry in geometries(doc) for loop in geometry.outlines)
+    assert n_points(doc) < n_points(expected)
+    assert render(doc) != b'\xff' * RENDER_SIZE * RENDER_SIZE * 4
+    doc.release()
+    expected.release()
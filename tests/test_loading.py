@@ -0,0 +1,47 @@
+import glsvg
+
+from conftest import svg_file
+
+FILES = [svg_file(name) for name in ('atiger.svg', 'sun.svg', 'pattern.svg')]
+
+
+def load_unshared(filename):
+    """Loads `filename` with geometry of its own, not shared with documents
+    loaded before"""
+    config = glsvg.SVGConfig()
+    config.deduplicate_geometry = False
+    return glsvg.SVGDoc(filename, config=config)
+
+
+def geometry_counts(doc):
+    """The triangles of the fill and stroke of every path the document draws"""
+    counts = []
+    for matrix, element in doc.draw_list():
+        geometry = getattr(element, 'geometry', None)
+        if geometry is not None:
+            counts.append((geometry.n_fill_triangles, geometry.n_stroke_triangles))
+    return counts
+
+
+def test_load_many_matches_serial_loading(render):
+    docs = glsvg.load_many(FILES, workers=2)
+    assert [doc.filename for doc in docs] == FILES
+    for filename, doc in zip(FILES, docs):
+        expected = load_unshared(filename)
+        assert doc.is_uploaded
+        assert geometry_counts(doc) == geometry_counts(expected)
+        assert render(doc) == render(expected)
+        doc.release()
+        expected.release()
+
+
+def test_tessellation_workers_build_the_same_geometry(render):
+    config = glsvg.SVGConfig()
+    config.tessellation_workers = 2
+    for filename in FILES:
+        doc = glsvg.SVGDoc(filename, config=config)
+        expected = load_unshared(filename)
+        assert geometry_counts(doc) == geometry_counts(expected)
+        assert render(doc) == render(expected)
+        doc.release()
+        expected.release()
@@ -0,0 +1,47 @@
+import gc
+
+import glsvg
+
+from conftest import svg_file
+
+
+def test_instances_share_one_document(gl_context):
+    registry = glsvg.SVGRegistry()
+    first = registry.get(svg_file('atiger.svg'))
+    second = registry.get(svg_file('atiger.svg'), anchor_x='center')
+    assert first.doc is second.doc
+    assert len(registry) == 1
+
+
+def test_document_is_released_after_its_last_instance(gl_context):
+    registry = glsvg.SVGRegistry(memory_cap=0)
+    first = registry.get(svg_file('atiger.svg'))
+    second = registry.get(svg_file('atiger.svg'))
+    doc = first.doc
+    assert doc.is_uploaded
+
+    del first
+    gc.collect()
+    assert doc.is_uploaded
+    assert len(registry) == 1
+
+    del second
+    gc.collect()
+    assert not doc.is_uploaded
+    assert len(registry) == 0
+
+
+def test_unused_documents_are_kept_within_the_memory_cap(gl_context):
+    registry = glsvg.SVGRegistry()
+    instance = registry.get(svg_file('sun.svg'))
+    doc = instance.doc
+
+    del instance
+    gc.collect()
+    assert doc.is_uploaded
+    # reused, not loaded again
+    assert registry.get(svg_file('sun.svg')).doc is doc
+
+    registry.clear()
+    assert not doc.is_uploaded
+    assert len(registry) == 0
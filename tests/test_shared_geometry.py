@@ -0,0 +1,38 @@
+from array import array
+
+from glsvg.shared_geometry import share_geometry, attach_geometry
+
+
+def test_attach_geometry_round_trips_shared_geometry():
+    results = [
+        ((array('f', [0, 0, 10, 0, 10, 10.5]), array('H', [0, 1, 2])),
+         [(0, [(5, array('f', [0, 0, 1, 1, 2, 0, 3, 1]))])]),
+        (None, None),
+        ((array('f', [1.25, 2.5, 3, 4, 5, 6]), array('I', [2, 1, 0])), [(0, [(4, array('f'))])]),
+    ]
+    placeholders, name = share_geometry(results)
+    assert name is not None
+
+    attached = attach_geometry(placeholders, name)
+    assert len(attached) == len(results)
+    # views into the block, not copies
+    assert isinstance(attached[0][0][0], memoryview)
+    for (fill, stroke_geometry), (expected_fill, expected_stroke) in zip(attached, results):
+        if expected_fill is None:
+            assert fill is None
+        else:
+            assert [list(data) for data in fill] == [list(data) for data in expected_fill]
+        if expected_stroke is None:
+            assert stroke_geometry is None
+        else:
+            assert [(i, [(mode, list(vertices)) for mode, vertices in primitives])
+                    for i, primitives in stroke_geometry] == \
+                [(i, [(mode, list(vertices)) for mode, vertices in primitives])
+                 for i, primitives in expected_stroke]
+
+
+def test_share_geometry_without_arrays_makes_no_block():
+    results = [(None, None)]
+    placeholders, name = share_geometry(results)
+    assert name is None
+    assert attach_geometry(placeholders, name) == results